@@ -0,0 +1,72 @@
+# benchmarks/bench_json_response.py
+#
+# Serialization cost of an admin user-list page (200 role documents):
+#
+#   before   stringify _id by hand, then jsonable_encoder + JSONResponse
+#   dict     plain dict return under MongoJSONResponse (jsonable_encoder still runs)
+#   direct   return MongoJSONResponse(raw documents): one orjson pass
+#
+# Usage: python benchmarks/bench_json_response.py [--docs 200] [--rounds 300]
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.json_response import MongoJSONResponse
+
+
+def user_doc(n: int) -> dict:
+    now = datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=n)
+    return {
+        "_id": ObjectId(),
+        "full_name": f"Garage {n}",
+        "phone": f"98{n:08d}",
+        "role": "garage",
+        "referral_code": f"REF{n:05d}",
+        "brands_served": ["Maruti", "Hyundai", "Tata"],
+        "location": {"addressLine": "MG Road", "city": "Pune", "state": "Maharashtra", "pincode": "411001", "lat": 18.52, "lng": 73.85},
+        "geo": {"type": "Point", "coordinates": [73.85, 18.52]},
+        "addresses": [],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def before(docs):
+    docs = [{**doc, "_id": str(doc["_id"])} for doc in docs]
+    return JSONResponse(jsonable_encoder({"users": docs})).body
+
+
+def as_dict(docs):
+    return MongoJSONResponse(jsonable_encoder({"users": docs})).body
+
+
+def direct(docs):
+    return MongoJSONResponse({"users": docs}).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+    docs = [user_doc(n) for n in range(args.docs)]
+    for name, fn in (("before", before), ("dict", as_dict), ("direct", direct)):
+        fn(docs)
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            body = fn(docs)
+        per_page = (time.perf_counter() - started) / args.rounds * 1000
+        print(f"{name:>7}: {per_page:7.3f} ms/page  ({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
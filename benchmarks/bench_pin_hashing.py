@@ -0,0 +1,74 @@
+# benchmarks/bench_pin_hashing.py
+#
+# Event-loop latency seen by other requests while a burst of PIN logins is
+# verified (scrypt with the PIN_HASH_* settings):
+#
+#   idle       no logins, the baseline
+#   inline     verify_pin_sync called on the event loop
+#   executor   verify_pin: scrypt on the bounded PIN_HASH_WORKERS pool
+#
+# A probe task stands in for the other requests: it sleeps 1 ms in a loop
+# and records how late it wakes up.
+#
+# Usage: python benchmarks/bench_pin_hashing.py [--logins 300]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PIN_HASH_N, PIN_HASH_R, PIN_HASH_P, PIN_HASH_WORKERS
+from utils.password_utils import hash_pin_sync, shutdown_executor, verify_pin, verify_pin_sync
+
+PROBE_INTERVAL = 0.001
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def inline(pin: str, stored: str):
+    return verify_pin_sync(pin, stored)
+
+
+async def run(mode: str, logins: int, stored: str):
+    lags, stop = [], asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    if mode == "idle":
+        await asyncio.sleep(0.5)
+    else:
+        login = inline if mode == "inline" else verify_pin
+        results = await asyncio.gather(*(login("1234", stored) for _ in range(logins)))
+        assert all(matches for matches, _ in results)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    lags.sort()
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=300)
+    args = parser.parse_args()
+    stored = hash_pin_sync("1234")
+    print(f"scrypt n={PIN_HASH_N} r={PIN_HASH_R} p={PIN_HASH_P}, {PIN_HASH_WORKERS} workers, {args.logins} concurrent logins")
+    print(f"{'mode':>9}  {'logins/s':>9}  {'loop lag p50':>12}  {'p99':>8}  {'max':>8}")
+    for mode in ("idle", "inline", "executor"):
+        elapsed, lags = asyncio.run(run(mode, args.logins, stored))
+        rate = "-" if mode == "idle" else f"{args.logins / elapsed:9.0f}"
+        p50, p99 = lags[len(lags) // 2], lags[int(len(lags) * 0.99)]
+        print(f"{mode:>9}  {rate:>9}  {p50:9.2f} ms  {p99:5.2f} ms  {lags[-1]:5.0f} ms")
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
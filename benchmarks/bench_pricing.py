@@ -0,0 +1,83 @@
+# benchmarks/bench_pricing.py
+#
+# Cost of pricing one invoice by line-item count:
+#
+#   before   the old float loop from build_invoice_document (no discountPercent,
+#            no slab breakdown, float drift)
+#   cold     price_invoice with the conversion and line caches cleared first
+#   warm     price_invoice with warm caches (steady state in a worker)
+#
+# Items are drawn from a catalogue of --catalogue distinct prices, like real
+# fleet-garage invoices that repeat the same parts.
+#
+# Usage: python benchmarks/bench_pricing.py [--rounds 200] [--catalogue 300]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pricing import _amounts, price_invoice, to_basis_points, to_paise
+
+SIZES = (1, 10, 50, 100, 250, 500)
+GST_RATES = (0, 5, 12, 18, 28)
+
+
+def make_invoice(lines: int, catalogue: list, rng: random.Random) -> dict:
+    items = []
+    for _ in range(lines):
+        price, gst = rng.choice(catalogue)
+        item = {"unitPrice": price, "quantity": rng.randint(1, 20), "gst": gst, "discountAmount": 0}
+        if rng.random() < 0.3:
+            item["discountAmount"] = round(price * 0.05, 2)
+        items.append(item)
+    return {"items": items, "deliveryCharge": 49.0, "platformFee": 10.0}
+
+
+def before(data: dict) -> dict:
+    sub_total = 0
+    total_tax = 0
+    for item in data["items"]:
+        base = item["unitPrice"] * item["quantity"]
+        discounted = base - item["discountAmount"]
+        gst_amount = (discounted * item["gst"]) / 100
+        sub_total += discounted
+        total_tax += gst_amount
+    total_amount = sub_total + total_tax + data.get("deliveryCharge", 0) + data.get("platformFee", 0) + data.get("logisticsFee", 0)
+    return {"subTotal": round(sub_total, 2), "totalTax": round(total_tax, 2), "totalAmount": round(total_amount, 2)}
+
+
+def cold(data: dict) -> dict:
+    to_paise.cache_clear()
+    to_basis_points.cache_clear()
+    _amounts.cache_clear()
+    return price_invoice(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--catalogue", type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    catalogue = [(round(rng.uniform(20, 25000), 2), rng.choice(GST_RATES)) for _ in range(args.catalogue)]
+
+    print(f"{'lines':>6}  {'before':>10}  {'cold':>10}  {'warm':>10}   (us per invoice)")
+    for lines in SIZES:
+        invoices = [make_invoice(lines, catalogue, rng) for _ in range(20)]
+        row = []
+        for fn in (before, cold, price_invoice):
+            for data in invoices:
+                fn(data)
+            started = time.perf_counter()
+            for n in range(args.rounds):
+                fn(invoices[n % len(invoices)])
+            row.append((time.perf_counter() - started) / args.rounds * 1e6)
+        print(f"{lines:>6}  " + "  ".join(f"{us:10.1f}" for us in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_user_lookup.py
+#
+# Login lookup latency against a real mongod, per role of the user logging in:
+#
+#   before   probe admin_users, vendor_users, garage_users, delivery_users in turn
+#   after    find_user_by_phone: user_directory, then the one role collection
+#
+# Both run with the indexes from indexes.py. Round trips are counted with a
+# command listener, so the numbers also show what a remote cluster would pay
+# per lookup. Seeds a scratch database and drops it afterwards.
+#
+# Usage: python benchmarks/bench_user_lookup.py [--mongo-uri mongodb://localhost:27017]
+#        [--users 20000] [--logins 2000]
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import database
+from indexes import ROLE_COLLECTIONS, ensure_indexes
+from services.user_directory import DIRECTORY_COLLECTION, ROLES, find_user_by_phone
+
+
+class RoundTrips(monitoring.CommandListener):
+    count = 0
+
+    def started(self, event):
+        RoundTrips.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def before(phone: str):
+    db = database.get_database()
+    for role in ROLES:
+        user = await db[f"{role}_users"].find_one({"phone": phone})
+        if user:
+            return user, role
+    return None, None
+
+
+async def seed(db, users: int) -> dict:
+    """users per role; returns sample phones per role plus unregistered ones."""
+    samples = {}
+    for r, role in enumerate(ROLES):
+        docs, entries = [], []
+        for n in range(users):
+            oid, phone = ObjectId(), f"{6 + r}{n:09d}"
+            docs.append({"_id": oid, "phone": phone, "full_name": f"{role} {n}", "role": role})
+            entries.append({"_id": oid, "phone": phone, "role": role})
+        await db[f"{role}_users"].insert_many(docs, ordered=False)
+        await db[DIRECTORY_COLLECTION].insert_many(entries, ordered=False)
+        samples[role] = [d["phone"] for d in random.sample(docs, min(500, users))]
+    samples["unregistered"] = [f"5{n:09d}" for n in range(500)]
+    await ensure_indexes(db, ROLE_COLLECTIONS + [DIRECTORY_COLLECTION])
+    return samples
+
+
+async def measure(lookup, phones, logins: int):
+    for phone in phones[:50]:
+        await lookup(phone)
+    timings = []
+    RoundTrips.count = 0
+    for n in range(logins):
+        started = time.perf_counter()
+        await lookup(phones[n % len(phones)])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)], RoundTrips.count / logins
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongo_uri, event_listeners=[RoundTrips()])
+    db = client[args.db]
+    database.db = db
+    await client.drop_database(args.db)
+    try:
+        samples = await seed(db, args.users)
+        print(f"{'login as':>13}  {'before p50/p95 ms':>18}  {'after p50/p95 ms':>17}  round trips")
+        for role, phones in samples.items():
+            b50, b95, b_trips = await measure(before, phones, args.logins)
+            a50, a95, a_trips = await measure(find_user_by_phone, phones, args.logins)
+            print(f"{role:>13}  {b50:8.3f} / {b95:7.3f}  {a50:8.3f} / {a95:6.3f}  {b_trips:.0f} -> {a_trips:.0f}")
+    finally:
+        if not args.keep:
+            await client.drop_database(args.db)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="qikspare_bench_lookup")
+    parser.add_argument("--users", type=int, default=20000, help="users per role")
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
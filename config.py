@@ -7,3 +7,86 @@ load_dotenv()  # Load .env only for local development
 MONGO_URI = os.getenv("MONGO_URI")
 JWT_SECRET = os.getenv("JWT_SECRET", "supersecretjwtkey")
 JWT_ALGORITHM = "HS256"
+
+# Verified JWTs kept in memory so repeat requests skip signature checks
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# OTP gateway ("2factor" in production, "stub" for local/offline load tests)
+OTP_PROVIDER = os.getenv("OTP_PROVIDER", "2factor")
+TWOFACTOR_API_KEY = os.getenv("TWOFACTOR_API_KEY", "acd01d56-2fbd-11f0-8b17-0200cd936042")
+OTP_TEMPLATE_NAME = os.getenv("OTP_TEMPLATE_NAME", "QIKSPARE")
+OTP_TIMEOUT_SECONDS = float(os.getenv("OTP_TIMEOUT_SECONDS", "5"))
+OTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OTP_CONNECT_TIMEOUT_SECONDS", "3"))
+OTP_MAX_IN_FLIGHT = int(os.getenv("OTP_MAX_IN_FLIGHT", "50"))
+OTP_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OTP_QUEUE_TIMEOUT_SECONDS", "2"))
+OTP_BREAKER_FAILURES = int(os.getenv("OTP_BREAKER_FAILURES", "5"))
+OTP_BREAKER_RESET_SECONDS = float(os.getenv("OTP_BREAKER_RESET_SECONDS", "30"))
+OTP_COALESCE_SECONDS = float(os.getenv("OTP_COALESCE_SECONDS", "30"))
+OTP_STUB_CODE = os.getenv("OTP_STUB_CODE", "123456")
+OTP_STUB_LATENCY_MS = int(os.getenv("OTP_STUB_LATENCY_MS", "0"))
+
+# PIN hashing (scrypt) cost parameters and worker pool size
+PIN_HASH_N = int(os.getenv("PIN_HASH_N", str(2 ** 14)))
+PIN_HASH_R = int(os.getenv("PIN_HASH_R", "8"))
+PIN_HASH_P = int(os.getenv("PIN_HASH_P", "1"))
+PIN_HASH_WORKERS = int(os.getenv("PIN_HASH_WORKERS", "4"))
+
+# Token lifetimes and how often each worker pulls new revocations from Mongo
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+
+# Apply the index registry (indexes.py) when the API starts
+ENSURE_INDEXES_ON_STARTUP = os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
+
+# How long admin user-list totals are cached
+USER_COUNT_CACHE_SECONDS = float(os.getenv("USER_COUNT_CACHE_SECONDS", "60"))
+
+# Sequence numbers each worker reserves per counter round trip (1 = no gaps)
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "20"))
+
+# Upper bound on invoices accepted by one bulk ingestion request
+BULK_INVOICE_MAX_ITEMS = int(os.getenv("BULK_INVOICE_MAX_ITEMS", "1000"))
+
+# Printable invoice cache: in-memory byte budget and optional on-disk tier
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or None
+
+# Upper bound on rows accepted by one bulk user import, and rows per insert_many
+USER_IMPORT_MAX_ROWS = int(os.getenv("USER_IMPORT_MAX_ROWS", "50000"))
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "1000"))
+
+# Nearby-vendor cache: geohash precision of the cache cell, TTL and size
+GEO_CACHE_PRECISION = int(os.getenv("GEO_CACHE_PRECISION", "6"))
+GEO_CACHE_SECONDS = float(os.getenv("GEO_CACHE_SECONDS", "60"))
+GEO_CACHE_MAX_ENTRIES = int(os.getenv("GEO_CACHE_MAX_ENTRIES", "2048"))
+# Vendors cached per cell; denser cells are queried from the exact point, uncached
+GEO_CACHE_CANDIDATES = int(os.getenv("GEO_CACHE_CANDIDATES", "500"))
+
+# Bundled pincode table and how often workers check it for a newer file
+PINCODE_FILE = os.getenv("PINCODE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pincodes.bin"))
+PINCODE_RELOAD_SECONDS = float(os.getenv("PINCODE_RELOAD_SECONDS", "30"))
+
+# How often each worker pulls catalog changes into its in-process parts index
+CATALOG_SYNC_SECONDS = float(os.getenv("CATALOG_SYNC_SECONDS", "5"))
+
+# Stock reservations: default hold, expiry sweep cadence and grace, record retention, shard cap
+STOCK_RESERVATION_SECONDS = int(os.getenv("STOCK_RESERVATION_SECONDS", "900"))
+STOCK_SWEEP_SECONDS = float(os.getenv("STOCK_SWEEP_SECONDS", "15"))
+STOCK_SWEEP_GRACE_SECONDS = int(os.getenv("STOCK_SWEEP_GRACE_SECONDS", "30"))
+STOCK_RESERVATION_RETENTION_SECONDS = int(os.getenv("STOCK_RESERVATION_RETENTION_SECONDS", "86400"))
+STOCK_MAX_SHARDS = int(os.getenv("STOCK_MAX_SHARDS", "16"))
+
+# Background job queue: workers per process, idle poll interval, lease length, retry budget and backoff, finished-job retention
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "8"))
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "2"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+
+# Orders: line-item cap, how long placed orders hold stock, delivery partner search radius
+ORDER_MAX_ITEMS = int(os.getenv("ORDER_MAX_ITEMS", "50"))
+ORDER_RESERVATION_SECONDS = int(os.getenv("ORDER_RESERVATION_SECONDS", "3600"))
+DELIVERY_ASSIGN_RADIUS_KM = float(os.getenv("DELIVERY_ASSIGN_RADIUS_KM", "15"))
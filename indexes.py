@@ -0,0 +1,270 @@
+# indexes.py
+#
+# Single registry of the indexes every collection needs, plus the query
+# shapes the routes issue so their plans can be audited with explain().
+# Apply with `python manage.py ensure-indexes` (also run at startup) and
+# audit with `python manage.py audit-queries`.
+
+import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import JOB_RETENTION_SECONDS, STOCK_RESERVATION_RETENTION_SECONDS
+
+ROLE_COLLECTIONS = ["admin_users", "vendor_users", "garage_users", "delivery_users"]
+
+_ROLE_INDEXES = [
+    IndexModel([("phone", ASCENDING)], name="phone"),
+    IndexModel([("referral_code", ASCENDING)], sparse=True, name="referral_code"),
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_recent"),
+    IndexModel([("location.city", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="city_recent"),
+    IndexModel([("kyc_status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="kyc_recent"),
+    IndexModel([("geo", GEOSPHERE)], name="geo_2dsphere"),
+]
+
+# Invoice list filters; each gets a (field, createdAt, _id) index.
+_INVOICE_FILTERS = [
+    ("seller.userId", "seller"),
+    ("buyer.userId", "buyer"),
+    ("invoiceType", "type"),
+    ("status", "status"),
+    ("paymentMode", "payment_mode"),
+]
+
+INDEXES = {
+    **{name: list(_ROLE_INDEXES) for name in ROLE_COLLECTIONS},
+    "user_directory": [
+        IndexModel([("phone", ASCENDING)], unique=True, name="phone_unique"),
+        IndexModel(
+            [("referral_code", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"referral_code": {"$type": "string"}},
+            name="referral_code_unique",
+        ),
+    ],
+    "referrals": [
+        IndexModel([("referrer_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="referrer_recent"),
+    ],
+    "referral_counters": [
+        IndexModel([("count", DESCENDING), ("_id", ASCENDING)], name="leaderboard"),
+    ],
+    "revoked_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ],
+    "invoices": [
+        IndexModel(
+            [("invoiceNumber", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"invoiceNumber": {"$type": "string"}},
+            name="invoice_number_unique",
+        ),
+        IndexModel([("orderId", ASCENDING)], name="order_id"),
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_recent"),
+        *[
+            IndexModel([(field, ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name=f"{name}_recent")
+            for field, name in _INVOICE_FILTERS
+        ],
+    ],
+    "invoice_rollups": [
+        IndexModel([("day", ASCENDING)], name="day"),
+        IndexModel([("sellerId", ASCENDING), ("day", ASCENDING)], name="seller_day"),
+        IndexModel([("paymentMode", ASCENDING), ("day", ASCENDING)], name="payment_mode_day"),
+    ],
+    "parts": [
+        # Soft-deleted parts drop out, so their SKU can be reused.
+        IndexModel([("sku", ASCENDING)], unique=True, partialFilterExpression={"deleted": False}, name="sku_unique"),
+        IndexModel([("updatedAt", ASCENDING)], name="updated"),
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_recent"),
+        IndexModel([("category", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name="category_recent"),
+        IndexModel([("brand", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name="brand_recent"),
+    ],
+    "stock_shards": [
+        IndexModel([("vendorId", ASCENDING), ("sku", ASCENDING), ("shard", ASCENDING)], name="vendor_sku_shard"),
+        IndexModel([("holds.expires_at", ASCENDING)], name="hold_expiry"),
+    ],
+    "stock_reservations": [
+        # Records only; expired holds are returned to stock by the sweeper, not by this TTL.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=STOCK_RESERVATION_RETENTION_SECONDS, name="expires_at_ttl"),
+        IndexModel([("ref", ASCENDING)], sparse=True, name="ref"),
+    ],
+    "orders": [
+        IndexModel([("buyerId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name="buyer_recent"),
+        IndexModel([("vendorId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name="vendor_recent"),
+        IndexModel([("deliveryPartnerId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], sparse=True, name="delivery_recent"),
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_recent"),
+    ],
+    "notifications": [
+        IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)], name="user_recent"),
+    ],
+    "jobs": [
+        # Leasing: due queued jobs and running jobs whose lease (run_at) ran out.
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+        IndexModel([("key", ASCENDING)], unique=True, sparse=True, name="key_unique"),
+        IndexModel(
+            [("finishedAt", ASCENDING)],
+            expireAfterSeconds=JOB_RETENTION_SECONDS,
+            partialFilterExpression={"status": "done"},
+            name="done_ttl",
+        ),
+    ],
+    # `counters` and `stock_items` are only ever addressed by _id, which MongoDB always indexes.
+}
+
+
+# -------- Query shapes (for the plan audit) --------
+# Sample values only need the right types; the audit looks at the plan, not results.
+
+_SAMPLE_ID = ObjectId()
+_SAMPLE_PHONE = "9999999999"
+_SAMPLE_TIME = datetime.datetime(2025, 1, 1)
+
+QUERY_SHAPES = [
+    *[
+        {"name": f"{c}.by_id", "collection": c, "filter": {"_id": _SAMPLE_ID}}
+        for c in ROLE_COLLECTIONS
+    ],
+    *[
+        {"name": f"{c}.by_phone", "collection": c, "filter": {"phone": _SAMPLE_PHONE}}
+        for c in ROLE_COLLECTIONS
+    ],
+    *[
+        {
+            "name": f"{c}.list_by_{field}",
+            "collection": c,
+            "filter": {field: value},
+            "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        }
+        for c in ROLE_COLLECTIONS
+        for field, value in (("location.city", "Pune"), ("kyc_status", "pending"))
+    ],
+    {
+        "name": "vendor_users.nearby_by_brand",
+        "collection": "vendor_users",
+        "filter": {
+            "geo": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [73.85, 18.52]}, "$maxDistance": 10000}},
+            "brands_carried": "Bosch",
+        },
+    },
+    {"name": "user_directory.by_phone", "collection": "user_directory", "filter": {"phone": _SAMPLE_PHONE}},
+    {"name": "user_directory.by_referral_code", "collection": "user_directory", "filter": {"referral_code": "ABCD1234"}},
+    {
+        "name": "referrals.by_referrer",
+        "collection": "referrals",
+        "filter": {"referrer_id": _SAMPLE_ID},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "name": "referral_counters.leaderboard",
+        "collection": "referral_counters",
+        "filter": {},
+        "sort": [("count", DESCENDING), ("_id", ASCENDING)],
+    },
+    {
+        "name": "revoked_tokens.since",
+        "collection": "revoked_tokens",
+        "filter": {"expires_at": {"$gt": _SAMPLE_TIME}, "revoked_at": {"$gte": _SAMPLE_TIME}},
+    },
+    {"name": "invoices.by_id", "collection": "invoices", "filter": {"_id": _SAMPLE_ID}},
+    {"name": "invoices.by_number", "collection": "invoices", "filter": {"invoiceNumber": "QIK-INV-00001"}},
+    {"name": "invoices.by_order", "collection": "invoices", "filter": {"orderId": "ORDER-00001"}},
+    {
+        "name": "invoices.list_recent",
+        "collection": "invoices",
+        "filter": {},
+        "sort": [("createdAt", DESCENDING), ("_id", DESCENDING)],
+    },
+    *[
+        {
+            "name": f"invoices.list_by_{name}",
+            "collection": "invoices",
+            "filter": {field: "sample", "createdAt": {"$gte": _SAMPLE_TIME}},
+            "sort": [("createdAt", DESCENDING), ("_id", DESCENDING)],
+        }
+        for field, name in _INVOICE_FILTERS
+    ],
+    {"name": "invoice_rollups.by_day", "collection": "invoice_rollups", "filter": {"day": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}},
+    {
+        "name": "invoice_rollups.by_seller",
+        "collection": "invoice_rollups",
+        "filter": {"sellerId": "sample", "day": {"$gte": "2025-01-01", "$lte": "2025-01-31"}},
+    },
+    {"name": "parts.changed_since", "collection": "parts", "filter": {"updatedAt": {"$gte": _SAMPLE_TIME}}},
+    *[
+        {
+            "name": f"parts.list_by_{field}",
+            "collection": "parts",
+            "filter": {field: "sample", "deleted": {"$ne": True}},
+            "sort": [("createdAt", DESCENDING), ("_id", DESCENDING)],
+        }
+        for field in ("category", "brand")
+    ],
+    {"name": "stock_shards.by_sku", "collection": "stock_shards", "filter": {"vendorId": "sample", "sku": "SKU-1"}},
+    {"name": "stock_shards.expired_holds", "collection": "stock_shards", "filter": {"holds.expires_at": {"$lt": _SAMPLE_TIME}}},
+    *[
+        {
+            "name": f"orders.list_by_{field}",
+            "collection": "orders",
+            "filter": {field: "sample"},
+            "sort": [("createdAt", DESCENDING), ("_id", DESCENDING)],
+        }
+        for field in ("buyerId", "vendorId", "deliveryPartnerId")
+    ],
+    {
+        "name": "jobs.lease",
+        "collection": "jobs",
+        "filter": {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": _SAMPLE_TIME}, "type": {"$in": ["notify_vendor"]}},
+        "sort": [("run_at", ASCENDING)],
+    },
+    {"name": "jobs.dead", "collection": "jobs", "filter": {"status": "dead"}, "sort": [("finishedAt", DESCENDING)]},
+    {"name": "counters.by_key", "collection": "counters", "filter": {"_id": "invoice"}},
+]
+
+
+async def ensure_indexes(db, collections=None):
+    """Create every registered index; existing identical indexes are a no-op."""
+    report = {}
+    for name, models in INDEXES.items():
+        if collections and name not in collections:
+            continue
+        try:
+            report[name] = await db[name].create_indexes(models)
+        except OperationFailure as e:
+            # Usually an existing index with the same name but different options.
+            report[name] = f"error: {e.details.get('errmsg', str(e)) if e.details else e}"
+    return report
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def audit_query_plans(db, shapes=None):
+    """Explain each registered query shape and flag the ones whose winning plan is a COLLSCAN."""
+    results = []
+    for shape in shapes or QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explain = await cursor.limit(1).explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning))
+        results.append({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return {
+        "collscans": [r["name"] for r in results if r["collscan"]],
+        "shapes": results,
+    }
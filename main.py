@@ -1,11 +1,24 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import connect_to_mongo
+from config import ENSURE_INDEXES_ON_STARTUP
+from database import connect_to_mongo, get_database
+from indexes import ensure_indexes
+from services.otp_provider import close_otp_service
+from utils.password_utils import shutdown_executor
+from services.token_revocation import start_revocation_sync, stop_revocation_sync
+from services.pincodes import load_pincodes
+from services.inventory_service import start_catalog_sync, stop_catalog_sync
+from services.stock_service import start_stock_sweeper, stop_stock_sweeper
+from services.job_queue import start_job_workers, stop_job_workers
+from utils.json_response import MongoJSONResponse
 
 from routes import (
     auth,
     admin,
+    delivery,
+    inventory,
     invoice,
+    order,
     pin_routes,
     profile,
     user_routes
@@ -15,11 +28,28 @@ app = FastAPI(
     title="QikSpare API",
     version="1.0.0",
     description="Backend for QikSpare Garage App & Admin Dashboard",
+    default_response_class=MongoJSONResponse,
 )
 
 @app.on_event("startup")
 async def startup_db():
     await connect_to_mongo()
+    if ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes(get_database())
+    await start_revocation_sync()
+    load_pincodes()
+    await start_catalog_sync()
+    await start_stock_sweeper()
+    await start_job_workers()
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await stop_job_workers()
+    await stop_revocation_sync()
+    await stop_catalog_sync()
+    await stop_stock_sweeper()
+    await close_otp_service()
+    shutdown_executor()
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +62,9 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth & OTP"])
 app.include_router(admin.router, prefix="/api", tags=["Admin APIs"])
 app.include_router(invoice.router, prefix="/api/invoices", tags=["Invoices"])
+app.include_router(inventory.router, prefix="/api/inventory", tags=["Parts Catalog & Stock"])
+app.include_router(order.router, prefix="/api", tags=["Orders"])
 app.include_router(pin_routes.router, prefix="/api", tags=["PIN System"])
 app.include_router(user_routes.router, prefix="/api/user", tags=["User Profile & Address"])
 app.include_router(profile.router, prefix="/api/user", tags=["User Profile & Address"])
+app.include_router(delivery.router, prefix="/api/delivery", tags=["Delivery & Pincodes"])
@@ -0,0 +1,92 @@
+# manage.py
+#
+# Maintenance commands that run against the configured MongoDB.
+# Usage: python manage.py <command> [options]
+
+import argparse
+import asyncio
+import json
+
+from database import connect_to_mongo
+
+COMMANDS = {}
+
+
+def command(name: str, help_text: str, *arguments):
+    """Register an async handler; `arguments` are (flags, kwargs) pairs for argparse."""
+    def register(handler):
+        COMMANDS[name] = (handler, help_text, arguments)
+        return handler
+    return register
+
+
+@command("backfill-user-directory", "Populate user_directory from the role collections")
+async def backfill_user_directory(args):
+    from services.user_directory import backfill_user_directory as backfill
+    return await backfill()
+
+
+@command("migrate-referrals", "Move embedded referral arrays into the referrals edge collection")
+async def migrate_referrals(args):
+    from services.referral_service import migrate_embedded_referrals
+    return await migrate_embedded_referrals()
+
+
+@command("ensure-indexes", "Create every index declared in indexes.py")
+async def ensure_indexes_command(args):
+    from database import get_database
+    from indexes import ensure_indexes
+    return await ensure_indexes(get_database())
+
+
+@command("audit-queries", "Explain every registered query shape and flag collection scans")
+async def audit_queries(args):
+    from database import get_database
+    from indexes import audit_query_plans
+    return await audit_query_plans(get_database())
+
+
+@command("rebuild-invoice-rollups", "Recompute invoice_rollups from the invoices collection")
+async def rebuild_invoice_rollups(args):
+    from services.invoice_rollups import rebuild_invoice_rollups as rebuild
+    return await rebuild()
+
+
+@command("backfill-geo", "Derive GeoJSON `geo` points from location.lat/lng on every user")
+async def backfill_geo(args):
+    from services.geo import backfill_geo as backfill
+    return await backfill()
+
+
+@command(
+    "build-pincodes",
+    "Compile a pincode CSV (pincode,city,state,lat,lng,serviceable) into the binary table",
+    (["--csv"], {"default": "data/pincodes.csv", "help": "Source CSV"}),
+    (["--out"], {"default": None, "help": "Output file (defaults to PINCODE_FILE)"}),
+)
+async def build_pincodes(args):
+    from config import PINCODE_FILE
+    from services.pincodes import build_pincode_file
+    return build_pincode_file(args.csv, args.out or PINCODE_FILE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QikSpare maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, arguments) in COMMANDS.items():
+        cmd = sub.add_parser(name, help=help_text)
+        for flags, kwargs in arguments:
+            cmd.add_argument(*flags, **kwargs)
+    args = parser.parse_args()
+
+    async def run():
+        await connect_to_mongo()
+        handler, _, _ = COMMANDS[args.command]
+        return await handler(args)
+
+    result = asyncio.run(run())
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
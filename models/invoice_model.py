@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -28,4 +28,25 @@ class InvoiceCreate(BaseModel):
     deliveryCharge: Optional[float] = 0.0
     paymentMode: str
     platformFee: Optional[float] = 0.0
+    logisticsFee: Optional[float] = 0.0
     invoiceDate: str  # ISO Date
+
+class InvoiceUpdate(BaseModel):
+    """
+    Partial invoice edit. `version` must echo the version the client last
+    read; the update is rejected with 409 if the invoice changed since.
+    Derived totals are recomputed server-side and cannot be patched.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    version: int = Field(..., ge=0)
+    invoiceType: Optional[str] = None
+    buyer: Optional[PartyInfo] = None
+    seller: Optional[PartyInfo] = None
+    items: Optional[List[InvoiceItem]] = None
+    deliveryCharge: Optional[float] = None
+    paymentMode: Optional[str] = None
+    platformFee: Optional[float] = None
+    logisticsFee: Optional[float] = None
+    invoiceDate: Optional[str] = None
+    status: Optional[str] = None
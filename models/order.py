@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from models.user import Location
+
+ORDER_STATUSES = ("PENDING", "CONFIRMED", "CANCELLED")
+
+class OrderItem(BaseModel):
+    sku: str
+    quantity: int = Field(..., ge=1, le=10000)
+
+class OrderCreate(BaseModel):
+    vendorId: str
+    items: List[OrderItem] = Field(..., min_length=1)
+    deliveryAddress: Location
+    paymentMode: str = "cod"
+    notes: Optional[str] = Field(None, max_length=500)
+
+class OrderCancel(BaseModel):
+    reason: Optional[str] = Field(None, max_length=200)
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+
+class PartCreate(BaseModel):
+    sku: str
+    partName: str
+    modelNo: Optional[str] = None
+    brand: Optional[str] = None
+    category: str
+    description: Optional[str] = None
+    unitPrice: float = Field(..., ge=0)
+    gst: float = Field(18.0, ge=0, le=28)
+    hsnCode: Optional[str] = None
+    compatibleVehicles: List[str] = []
+
+class PartUpdate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    partName: Optional[str] = None
+    modelNo: Optional[str] = None
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    unitPrice: Optional[float] = Field(None, ge=0)
+    gst: Optional[float] = Field(None, ge=0, le=28)
+    hsnCode: Optional[str] = None
+    compatibleVehicles: Optional[List[str]] = None
+
+class StockAdjust(BaseModel):
+    delta: int  # positive restocks, negative removes
+
+class StockReserve(BaseModel):
+    vendorId: str
+    sku: str
+    quantity: int = Field(..., ge=1)
+    ttlSeconds: Optional[int] = Field(None, ge=30, le=86400)
+    ref: Optional[str] = None
+
+class StockSplit(BaseModel):
+    shards: int = Field(..., ge=1, le=64)
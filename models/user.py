@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Literal, Union
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
+from typing import Annotated, Optional, List, Literal, Union
 from datetime import datetime
 
 # ---------------------- COMMON MODELS ----------------------
@@ -30,7 +30,6 @@ class BaseUser(BaseModel):
     referral_code: Optional[str] = None
     referred_by: Optional[str] = None
     referral_count: int = 0
-    referral_users: List[str] = []
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -145,15 +144,14 @@ class UserUpdateModel(
 class UserInDB(BaseUser):
     id: Optional[str] = Field(alias="_id")
 
+AnyUser = Annotated[
+    Union[AdminUser, VendorUser, GarageUser, DeliveryUser],
+    Field(discriminator="role"),
+]
+
+# Built once: the discriminator dispatches on "role" without trying each model.
+USER_ADAPTER = TypeAdapter(AnyUser)
+
 def create_user_model(data: dict) -> Union[AdminUser, VendorUser, GarageUser, DeliveryUser]:
-    role = data.get("role")
-    if role == "admin":
-        return AdminUser(**data)
-    elif role == "vendor":
-        return VendorUser(**data)
-    elif role == "garage":
-        return GarageUser(**data)
-    elif role == "delivery":
-        return DeliveryUser(**data)
-    else:
-        raise ValueError("Invalid user role")
+    """Raises pydantic.ValidationError (a ValueError) for an unknown role or bad fields."""
+    return USER_ADAPTER.validate_python(data)
@@ -1,83 +1,131 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from database import get_database
-from utils.jwt_utils import decode_access_token
+from utils.auth_dependencies import get_admin_user, get_current_user, token_cache
+from services.referral_service import leaderboard
+from services.user_query import (
+    list_users,
+    count_users,
+    iter_users,
+    EXPORT_COLUMNS,
+    DEFAULT_EXPORT_COLUMNS,
+)
+from utils.pagination import decode_cursor
+from utils.streaming import encode_stream, MEDIA_TYPES
+from utils.conditional import conditional_json
+from utils.json_response import MongoJSONResponse
+from services.geo import nearby_cache, set_geo
+from services.user_directory import (
+    ROLES,
+    PhoneAlreadyRegistered,
+    ReferralCodeTaken,
+    insert_user,
+    resolve_role,
+    sync_user_fields,
+    to_object_id,
+)
+from services import job_queue
 from bson import ObjectId
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Union
+from typing import Optional, List, Dict, Union, Literal
 import datetime
 
 router = APIRouter()
 
-# ---------------------------
-# Auth Helper for Admin
-# ---------------------------
-def get_admin_user(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing auth token")
-    token = authorization.split(" ")[1]
-    payload = decode_access_token(token)
-    if payload.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Admin access only")
-    return payload
-
 # ---------------------------
 # Location Model
 # ---------------------------
 class LocationModel(BaseModel):
-    addressLine: Optional[str]
-    city: Optional[str]
-    state: Optional[str]
-    pincode: Optional[str]
-    lat: Optional[float]
-    lng: Optional[float]
+    addressLine: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    pincode: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
 
 # ---------------------------
 # Model for Updating / Creating User
 # ---------------------------
 class AdminUpdateUserModel(BaseModel):
-    full_name: Optional[str]
-    phone: Optional[str]
-    email: Optional[str]
-    password_hash: Optional[str]
-    role: Optional[str]
-
-    garage_name: Optional[str]
-    business_name: Optional[str]
-    business_type: Optional[str]
-    garage_size: Optional[str]
-    distributor_size: Optional[str]
-
-    brands_served: Optional[List[str]]
-    vehicle_types: Optional[List[str]]
-    brands_carried: Optional[List[str]]
-    category_focus: Optional[List[str]]
-
-    pan_number: Optional[str]
-    gstin: Optional[str]
-    kyc_status: Optional[str]
-    documents: Optional[List[str]]
-
-    warehouse_assigned: Optional[str]
-    vehicle_type: Optional[str]
-    vehicle_number: Optional[str]
-
-    location: Optional[LocationModel]
-    referral_code: Optional[str]
-    referred_by: Optional[str]
-    referral_count: Optional[int]
-    referral_users: Optional[List[str]]
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    password_hash: Optional[str] = None
+    role: Optional[str] = None
+
+    garage_name: Optional[str] = None
+    business_name: Optional[str] = None
+    business_type: Optional[str] = None
+    garage_size: Optional[str] = None
+    distributor_size: Optional[str] = None
+
+    brands_served: Optional[List[str]] = None
+    vehicle_types: Optional[List[str]] = None
+    brands_carried: Optional[List[str]] = None
+    category_focus: Optional[List[str]] = None
+
+    pan_number: Optional[str] = None
+    gstin: Optional[str] = None
+    kyc_status: Optional[str] = None
+    documents: Optional[List[str]] = None
+
+    warehouse_assigned: Optional[str] = None
+    vehicle_type: Optional[str] = None
+    vehicle_number: Optional[str] = None
+
+    location: Optional[LocationModel] = None
+    referral_code: Optional[str] = None
+    referred_by: Optional[str] = None
+    referral_count: Optional[int] = None
 
 # ---------------------------
 # Get All Users (Admin only)
 # ---------------------------
 @router.get("/admin/users")
-async def get_all_users(user=Depends(get_admin_user)):
-    db = get_database()
-    users = []
-    async for u in db.users.find():
-        u["_id"] = str(u["_id"])
-        users.append(u)
-    return {"users": users}
+async def get_all_users(
+    request: Request,
+    role: Optional[Literal["admin", "vendor", "garage", "delivery"]] = None,
+    city: Optional[str] = None,
+    kyc_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_admin_user),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    users, next_cursor = await list_users(role, city, kyc_status, after=after, limit=limit)
+    total = await count_users(role, city, kyc_status)
+    return conditional_json(request, {"users": users, "total": total, "next_cursor": next_cursor})
+
+# ---------------------------
+# Export Users as NDJSON / CSV (Admin only)
+# ---------------------------
+@router.get("/admin/users/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    columns: Optional[str] = Query(None, description="Comma-separated field list"),
+    role: Optional[Literal["admin", "vendor", "garage", "delivery"]] = None,
+    city: Optional[str] = None,
+    kyc_status: Optional[str] = None,
+    user=Depends(get_admin_user),
+):
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else DEFAULT_EXPORT_COLUMNS
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+
+    rows = iter_users(selected, role, city, kyc_status)
+    filename = f"users-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        encode_stream(rows, format, selected),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 # ---------------------------
 # Update Any User (Admin only)
@@ -88,16 +136,29 @@ async def update_user_by_admin(
     payload: AdminUpdateUserModel,
     user=Depends(get_admin_user),
 ):
-    db = get_database()
-    update_data = payload.dict(exclude_unset=True)
+    if "phone" in payload.model_fields_set and not payload.phone:
+        raise HTTPException(status_code=400, detail="Phone cannot be empty")
+    update_data = payload.dict(exclude_unset=True, exclude_none=True)
+    update_data.pop("role", None)
 
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
+    role = await resolve_role(user_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="User not found")
 
     update_data["updated_at"] = datetime.datetime.utcnow()
+    set_geo(update_data, clear=True)
+
+    try:
+        await sync_user_fields(user_id, update_data)
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    except ReferralCodeTaken:
+        raise HTTPException(status_code=409, detail="Referral code already in use")
 
-    result = await db.users.update_one(
-        {"_id": ObjectId(user_id)},
+    result = await get_database()[f"{role}_users"].update_one(
+        {"_id": to_object_id(user_id)},
         {"$set": update_data},
     )
 
@@ -108,18 +169,21 @@ async def update_user_by_admin(
         )
     return {"message": "User updated successfully"}
 
-# ---------------------------
-# Create New User (Admin only)
-# ---------------------------
-@router.post("/admin/create-user")
-async def create_user_by_admin(
-    payload: AdminUpdateUserModel, user=Depends(get_admin_user)
-):
-    db = get_database()
+
+# Roles the app may register; admins are only created through /admin/create-user.
+APP_ROLES = [r for r in ROLES if r != "admin"]
+# Fields the app may not set on the accounts it registers.
+APP_PROTECTED_FIELDS = {"password_hash", "referral_count", "referred_by"}
+
+
+async def _insert_new_user(payload: AdminUpdateUserModel, roles=ROLES, exclude=None) -> dict:
+    """Insert into the role collection and the phone directory (409 on a taken phone or code)."""
     if not payload.phone or not payload.role:
         raise HTTPException(status_code=400, detail="Phone and Role are required")
+    if payload.role not in roles:
+        raise HTTPException(status_code=400, detail=f"Unknown role: {payload.role}")
 
-    new_user = payload.dict(exclude_unset=True)
+    new_user = payload.dict(exclude_unset=True, exclude_none=True, exclude=exclude)
     now = datetime.datetime.utcnow()
     new_user["created_at"] = now
     new_user["updated_at"] = now
@@ -127,36 +191,82 @@ async def create_user_by_admin(
     if not new_user.get("referral_code") and payload.full_name:
         new_user["referral_code"] = payload.full_name.replace(" ", "").upper()[:6] + "01"
 
-    result = await db.users.insert_one(new_user)
-    new_user["_id"] = str(result.inserted_id)
-    return {"message": "User created successfully", "user": new_user}
+    try:
+        new_user["_id"] = await insert_user(payload.role, new_user)
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    except ReferralCodeTaken:
+        raise HTTPException(status_code=409, detail="Referral code already in use")
+    new_user.pop("password_hash", None)
+    return new_user
+
+# ---------------------------
+# Create New User (Admin only)
+# ---------------------------
+@router.post("/admin/create-user")
+async def create_user_by_admin(
+    payload: AdminUpdateUserModel, user=Depends(get_admin_user)
+):
+    new_user = await _insert_new_user(payload)
+    return MongoJSONResponse({"message": "User created successfully", "user": new_user})
 
 # ---------------------------
 # Create User from App (Non-admin only)
 # ---------------------------
 @router.post("/auth/register-user")
 async def register_user_from_app(
-    payload: AdminUpdateUserModel, authorization: str = Header(None)
+    payload: AdminUpdateUserModel, user_payload=Depends(get_current_user)
 ):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing auth token")
-    token = authorization.split(" ")[1]
-    user_payload = decode_access_token(token)
     if user_payload.get("role") == "admin":
         raise HTTPException(status_code=403, detail="Admins should use /admin/create-user")
+    if payload.role == "admin":
+        raise HTTPException(status_code=403, detail="Admin accounts can't be registered from the app")
 
-    db = get_database()
-    if not payload.phone or not payload.role:
-        raise HTTPException(status_code=400, detail="Phone and Role are required")
+    new_user = await _insert_new_user(payload, roles=APP_ROLES, exclude=APP_PROTECTED_FIELDS)
+    return MongoJSONResponse({"message": "User registered successfully", "user": new_user})
 
-    new_user = payload.dict(exclude_unset=True)
-    now = datetime.datetime.utcnow()
-    new_user["created_at"] = now
-    new_user["updated_at"] = now
+# ---------------------------
+# Referral Leaderboard (Admin only)
+# ---------------------------
+@router.get("/admin/referrals/leaderboard")
+async def get_referral_leaderboard(
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    user=Depends(get_admin_user),
+):
+    return {"leaders": await leaderboard(limit=limit, skip=skip)}
 
-    if not new_user.get("referral_code") and payload.full_name:
-        new_user["referral_code"] = payload.full_name.replace(" ", "").upper()[:6] + "01"
+# ---------------------------
+# Auth Token Cache Stats (Admin only)
+# ---------------------------
+@router.get("/admin/auth-cache/stats")
+async def get_auth_cache_stats(user=Depends(get_admin_user)):
+    return token_cache.stats()
+
+# ---------------------------
+# Nearby-vendor Cache Stats (Admin only)
+# ---------------------------
+@router.get("/admin/geo-cache/stats")
+async def get_geo_cache_stats(user=Depends(get_admin_user)):
+    return nearby_cache.stats()
+
+# ---------------------------
+# Background Jobs (Admin only)
+# ---------------------------
+@router.get("/admin/jobs/stats")
+async def get_job_stats(user=Depends(get_admin_user)):
+    return await job_queue.queue_stats()
+
+@router.get("/admin/jobs/dead")
+async def get_dead_jobs(
+    type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_admin_user),
+):
+    return MongoJSONResponse({"jobs": await job_queue.list_dead(type, limit=limit)})
 
-    result = await db.users.insert_one(new_user)
-    new_user["_id"] = str(result.inserted_id)
-    return {"message": "User registered successfully", "user": new_user}
+@router.post("/admin/jobs/{job_id}/retry")
+async def retry_dead_job(job_id: str, user=Depends(get_admin_user)):
+    if not ObjectId.is_valid(job_id) or not await job_queue.retry_dead(ObjectId(job_id)):
+        raise HTTPException(status_code=404, detail="Dead job not found")
+    return {"success": True}
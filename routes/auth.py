@@ -1,22 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
 from typing import Optional, Dict
 from database import get_database
-from utils.jwt_utils import create_access_token, decode_access_token
+from utils.jwt_utils import create_token_pair, decode_refresh_token
+from utils.auth_dependencies import get_current_user
 from models.user import create_user_model, Location
+from services.user_directory import (
+    ROLES,
+    PhoneAlreadyRegistered,
+    ReferralCodeTaken,
+    find_user_by_phone,
+    get_user_by_id,
+    insert_user,
+    resolve_referral_code,
+    resolve_role,
+    to_object_id,
+)
+from services.referral_service import record_referral, list_referrals
+from services.token_revocation import is_revoked, revoke_token
+from utils.pagination import decode_cursor
+from utils.conditional import conditional_json, is_not_modified, not_modified, version_etag
+from services.auth_service import send_otp_2factor, verify_otp_2factor
+from services.otp_provider import OtpProviderError, OtpProviderUnavailable
+from services.pincodes import PincodeError, normalize_address
 from bson import ObjectId
 import datetime
 import uuid
-import httpx
 
 router = APIRouter()
 
-# ---- CONFIG ----
-TWOFACTOR_API_KEY = "acd01d56-2fbd-11f0-8b17-0200cd936042"
-OTP_TEMPLATE_NAME = "QIKSPARE"
-TWOFACTOR_BASE = f"https://2factor.in/API/V1/{TWOFACTOR_API_KEY}/SMS"
-ROLES = ["admin", "vendor", "garage", "delivery"]
-
 # -------- MODELS --------
 class RequestOtpModel(BaseModel):
     phone: str
@@ -27,6 +39,12 @@ class VerifyOtpModel(BaseModel):
     role: str
     referral_code: Optional[str] = None
 
+class RefreshTokenModel(BaseModel):
+    refresh_token: str
+
+class LogoutModel(BaseModel):
+    refresh_token: Optional[str] = None
+
 class AddAddressModel(BaseModel):
     tag: Optional[str] = "others"
     address_line: str
@@ -36,41 +54,14 @@ class AddAddressModel(BaseModel):
     location: Optional[Dict[str, float]] = None
     is_default: Optional[bool] = False
 
-# -------- Helpers --------
-def get_current_user(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    try:
-        token = authorization.split(" ")[1]
-        return decode_access_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-async def find_user_by_phone(phone: str):
-    db = get_database()
-    for role in ROLES:
-        user = await db[f"{role}_users"].find_one({"phone": phone})
-        if user:
-            return user, role
-    return None, None
-
-async def get_user_by_id(user_id: str):
-    db = get_database()
-    for role in ROLES:
-        user = await db[f"{role}_users"].find_one({"_id": ObjectId(user_id)})
-        if user:
-            return user, role
-    return None, None
-
 # -------- OTP Request --------
 @router.post("/request-otp")
 async def request_otp(payload: RequestOtpModel):
-    phone = payload.phone
-    url = f"{TWOFACTOR_BASE}/{phone}/AUTOGEN/{OTP_TEMPLATE_NAME}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-    data = response.json()
-    if data["Status"] != "Success":
+    try:
+        await send_otp_2factor(payload.phone)
+    except OtpProviderUnavailable:
+        raise HTTPException(status_code=503, detail="OTP service temporarily unavailable")
+    except OtpProviderError:
         raise HTTPException(status_code=500, detail="Failed to send OTP")
     return {"message": "OTP sent successfully."}
 
@@ -86,10 +77,13 @@ async def verify_otp(payload: VerifyOtpModel):
         raise HTTPException(status_code=400, detail="Invalid role")
 
     # Step 1: Verify OTP
-    url = f"{TWOFACTOR_BASE}/VERIFY3/{phone}/{payload.otp}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-    if response.json().get("Status") != "Success":
+    try:
+        verified = await verify_otp_2factor(phone, payload.otp)
+    except OtpProviderUnavailable:
+        raise HTTPException(status_code=503, detail="OTP service temporarily unavailable")
+    except OtpProviderError:
+        verified = False
+    if not verified:
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
     # Step 2: Login if user exists
@@ -102,9 +96,10 @@ async def verify_otp(payload: VerifyOtpModel):
             "phone": phone,
             "role": found_role
         }
-        return {"access_token": create_access_token(token_data)}
+        return create_token_pair(token_data)
 
     # Step 3: Register new user
+    referrer_id, referrer_role = None, None
     if role == "admin":
         count = await db["admin_users"].count_documents({})
         if count > 0:
@@ -115,17 +110,10 @@ async def verify_otp(payload: VerifyOtpModel):
         new_ref_code = str(uuid.uuid4())[:8].upper()
         referred_by = None
         if referral_code:
-            ref_user, ref_role = await find_user_by_phone(referral_code)
-            if not ref_user:
+            referrer_id, referrer_role = await resolve_referral_code(referral_code)
+            if not referrer_id:
                 raise HTTPException(status_code=400, detail="Invalid referral code")
             referred_by = referral_code
-            await db[f"{ref_role}_users"].update_one(
-                {"referral_code": referral_code},
-                {
-                    "$inc": {"referral_count": 1},
-                    "$push": {"referral_users": str(ref_user["_id"])}
-                }
-            )
 
     # Base payload for new user
     payload_dict = {
@@ -136,7 +124,6 @@ async def verify_otp(payload: VerifyOtpModel):
         "referral_code": new_ref_code,
         "referred_by": referred_by,
         "referral_count": 0,
-        "referral_users": [],
         "created_at": datetime.datetime.utcnow(),
         "updated_at": datetime.datetime.utcnow()
     }
@@ -146,24 +133,103 @@ async def verify_otp(payload: VerifyOtpModel):
         payload_dict["addresses"] = []
 
     user_obj = create_user_model(payload_dict)
-    result = await db[f"{role}_users"].insert_one(user_obj.dict())
+    try:
+        user_id = await insert_user(role, user_obj.dict())
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    except ReferralCodeTaken:
+        raise HTTPException(status_code=409, detail="Please retry registration")
+
+    if referrer_id:
+        await record_referral(referrer_id, referrer_role, user_id, role, referral_code)
 
     token_data = {
-        "user_id": str(result.inserted_id),
+        "user_id": str(user_id),
         "phone": phone,
         "role": role
     }
-    return {"access_token": create_access_token(token_data)}
+    return create_token_pair(token_data)
+
+# -------- Refresh Tokens --------
+@router.post("/refresh")
+async def refresh_tokens(payload: RefreshTokenModel):
+    try:
+        claims = decode_refresh_token(payload.refresh_token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    if is_revoked(claims.get("jti")):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+    user_data, role = await get_user_by_id(claims.get("user_id"), {"phone": 1})
+    if not user_data:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+
+    # Rotate: each refresh token is single-use, even across concurrent calls.
+    if not await revoke_token(claims):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+    token_data = {
+        "user_id": str(user_data["_id"]),
+        "phone": user_data["phone"],
+        "role": role
+    }
+    return create_token_pair(token_data)
+
+# -------- Logout --------
+@router.post("/logout")
+async def logout(payload: LogoutModel, user=Depends(get_current_user)):
+    await revoke_token(user)
+    if payload.refresh_token:
+        try:
+            claims = decode_refresh_token(payload.refresh_token)
+        except Exception:
+            claims = None
+        if claims and claims.get("user_id") == user.get("user_id"):
+            await revoke_token(claims)
+    return {"message": "Logged out"}
 
 # -------- Get Profile --------
 @router.get("/me")
-async def get_profile(user=Depends(get_current_user)):
-    user_data, role = await get_user_by_id(user.get("user_id"))
+async def get_profile(request: Request, user=Depends(get_current_user)):
+    user_id = to_object_id(user.get("user_id"))
+    role = await resolve_role(user_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="User not found")
+    collection = get_database()[f"{role}_users"]
+
+    # Answer polls from a projected read of updated_at before loading the profile.
+    meta = await collection.find_one({"_id": user_id}, {"updated_at": 1})
+    if not meta:
+        raise HTTPException(status_code=404, detail="User not found")
+    if meta.get("updated_at"):
+        etag = version_etag(user_id, role, meta["updated_at"])
+        if is_not_modified(request, etag, meta["updated_at"]):
+            return not_modified(etag, meta["updated_at"])
+
+    user_data = await collection.find_one({"_id": user_id}, {"referral_users": 0, "pin": 0})
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
-    user_data["_id"] = str(user_data["_id"])
     user_data["role"] = role
-    return user_data
+
+    updated_at = user_data.get("updated_at")
+    if not updated_at:
+        return conditional_json(request, user_data)
+    return conditional_json(request, user_data, etag=version_etag(user_id, role, updated_at), last_modified=updated_at)
+
+# -------- My Referrals --------
+@router.get("/referrals")
+async def get_my_referrals(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(get_current_user),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return conditional_json(request, await list_referrals(user.get("user_id"), limit=limit, after=after))
 
 # -------- Add Address --------
 @router.post("/add-address")
@@ -175,9 +241,17 @@ async def add_address(payload: AddAddressModel, user=Depends(get_current_user)):
     if role == "admin":
         raise HTTPException(status_code=403, detail="Admins don't have address")
 
+    try:
+        address = normalize_address(payload.dict(), coords_key="location")
+    except PincodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     result = await db[f"{role}_users"].update_one(
         {"_id": ObjectId(user_id)},
-        {"$push": {"addresses": payload.dict()}}
+        {
+            "$push": {"addresses": address},
+            "$set": {"updated_at": datetime.datetime.utcnow()}
+        }
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to add address")
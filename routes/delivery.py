@@ -1,2 +1,42 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+
+from services.pincodes import PincodeError, pincode_table
+
 router = APIRouter()
+
+
+def _table():
+    table = pincode_table()
+    if table is None:
+        raise HTTPException(status_code=503, detail="Pincode table not loaded")
+    return table
+
+
+# -------- Pincodes --------
+@router.get("/pincodes/nearby")
+async def pincodes_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(50, ge=1, le=500),
+):
+    return {"pincodes": _table().within(lat, lng, radius_km, limit=limit)}
+
+
+@router.get("/pincodes/{pincode}")
+async def get_pincode(pincode: str):
+    try:
+        record = _table().lookup(pincode)
+    except PincodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown pincode")
+    return record
+
+
+@router.get("/serviceability")
+async def check_serviceability(pincode: str):
+    try:
+        return {"pincode": pincode, "serviceable": _table().is_serviceable(pincode)}
+    except PincodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,2 +1,217 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pymongo import DESCENDING
+from pymongo.collection import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from typing import Optional
+from datetime import datetime
+
+from database import get_database
+from models.part import PartCreate, PartUpdate, StockAdjust, StockReserve, StockSplit
+from services import stock_service
+from services.inventory_service import PARTS_COLLECTION, part_index
+from utils.auth_dependencies import get_admin_user, get_current_user
+from utils.conditional import conditional_json, is_not_modified, not_modified, version_etag
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
 router = APIRouter()
+
+LIVE = {"deleted": {"$ne": True}}
+
+
+def _part_id(part_id: str) -> ObjectId:
+    if not ObjectId.is_valid(part_id):
+        raise HTTPException(status_code=404, detail="Part not found")
+    return ObjectId(part_id)
+
+
+def _own_stock(user: dict, vendor_id: str):
+    if user.get("role") != "admin" and not (user.get("role") == "vendor" and user.get("user_id") == vendor_id):
+        raise HTTPException(status_code=403, detail="Not allowed to manage this vendor's stock")
+
+
+async def _reservation(rid: str, user: dict) -> dict:
+    reservation = await stock_service.get_reservation(rid)
+    if not reservation or (user.get("role") != "admin" and reservation.get("reservedBy") != user.get("user_id")):
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return reservation
+
+
+# -------- Create --------
+@router.post("/parts")
+async def create_part(payload: PartCreate, admin=Depends(get_admin_user)):
+    now = datetime.utcnow()
+    doc = {**payload.dict(), "deleted": False, "createdAt": now, "updatedAt": now}
+    try:
+        result = await get_database()[PARTS_COLLECTION].insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="SKU already exists")
+    part_index.upsert(doc)
+    return {"success": True, "partId": str(result.inserted_id), "sku": payload.sku}
+
+
+# -------- Search (in-process index) --------
+@router.get("/parts/search")
+async def search_parts(
+    q: str = Query(..., min_length=1, max_length=100),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(get_current_user),
+):
+    return {"results": part_index.search(q, category=category, brand=brand, limit=limit)}
+
+
+@router.get("/parts/index/stats")
+async def part_index_stats(admin=Depends(get_admin_user)):
+    return part_index.stats()
+
+
+# -------- List --------
+@router.get("/parts")
+async def list_parts(
+    request: Request,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_current_user),
+):
+    query = dict(LIVE)
+    if category:
+        query["category"] = category
+    if brand:
+        query["brand"] = brand
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, keyset_filter("createdAt", *after)]}
+
+    parts = await get_database()[PARTS_COLLECTION].find(query).sort(
+        [("createdAt", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(parts) > limit
+    parts = parts[:limit]
+    next_cursor = encode_cursor(parts[-1].get("createdAt"), parts[-1]["_id"]) if has_more else None
+    return conditional_json(request, {"parts": parts, "next_cursor": next_cursor})
+
+
+# -------- Get --------
+@router.get("/parts/{part_id}")
+async def get_part(part_id: str, request: Request, user=Depends(get_current_user)):
+    collection = get_database()[PARTS_COLLECTION]
+    oid = _part_id(part_id)
+
+    meta = await collection.find_one({"_id": oid, **LIVE}, {"updatedAt": 1})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Part not found")
+    etag = version_etag(part_id, meta["updatedAt"])
+    if is_not_modified(request, etag, meta["updatedAt"]):
+        return not_modified(etag, meta["updatedAt"])
+
+    part = await collection.find_one({"_id": oid, **LIVE})
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    return conditional_json(request, part, etag=version_etag(part_id, part["updatedAt"]), last_modified=part["updatedAt"])
+
+
+# -------- Update --------
+@router.patch("/parts/{part_id}")
+async def update_part(part_id: str, payload: PartUpdate, admin=Depends(get_admin_user)):
+    data = payload.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    data["updatedAt"] = datetime.utcnow()
+
+    part = await get_database()[PARTS_COLLECTION].find_one_and_update(
+        {"_id": _part_id(part_id), **LIVE},
+        {"$set": data},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    part_index.upsert(part)
+    return {"success": True}
+
+
+# -------- Delete (soft, so other workers' indexes see it) --------
+@router.delete("/parts/{part_id}")
+async def delete_part(part_id: str, admin=Depends(get_admin_user)):
+    now = datetime.utcnow()
+    part = await get_database()[PARTS_COLLECTION].find_one_and_update(
+        {"_id": _part_id(part_id), **LIVE},
+        {"$set": {"deleted": True, "deletedAt": now, "updatedAt": now}},
+        projection={"deleted": 1, "updatedAt": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    part_index.upsert(part)
+    return {"success": True}
+
+
+# -------- Stock --------
+@router.get("/stock/{vendor_id}/{sku}")
+async def get_stock(vendor_id: str, sku: str, user=Depends(get_current_user)):
+    return await stock_service.get_stock(vendor_id, sku)
+
+
+@router.post("/stock/{vendor_id}/{sku}/adjust")
+async def adjust_stock(vendor_id: str, sku: str, payload: StockAdjust, user=Depends(get_current_user)):
+    _own_stock(user, vendor_id)
+    if not payload.delta:
+        raise HTTPException(status_code=400, detail="delta must be non-zero")
+    try:
+        return await stock_service.adjust_stock(vendor_id, sku, payload.delta)
+    except stock_service.InsufficientStock:
+        raise HTTPException(status_code=409, detail="Not enough available stock to remove")
+
+
+@router.post("/stock/reserve")
+async def reserve_stock(payload: StockReserve, user=Depends(get_current_user)):
+    # Buyers hold stock by placing orders; direct holds are for admins and the owning vendor.
+    _own_stock(user, payload.vendorId)
+    ttl = payload.ttlSeconds or stock_service.STOCK_RESERVATION_SECONDS
+    try:
+        reservation = await stock_service.reserve_stock(
+            payload.vendorId, payload.sku, payload.quantity,
+            ttl_seconds=ttl, ref=payload.ref, reserved_by=user.get("user_id"),
+        )
+    except stock_service.InsufficientStock:
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    return {"success": True, "reservationId": str(reservation["_id"]), "expiresAt": reservation["expires_at"]}
+
+
+async def _finish_reservation(rid: str, user: dict, finish) -> dict:
+    await _reservation(rid, user)
+    try:
+        reservation = await finish(rid)
+    except stock_service.ReservationNotFound:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    except stock_service.ReservationExpired:
+        raise HTTPException(status_code=410, detail="Reservation has expired")
+    except stock_service.ReservationClosed as e:
+        raise HTTPException(status_code=409, detail=f"Reservation already {e}")
+    return {"success": True, "status": reservation["status"]}
+
+
+@router.post("/stock/reservations/{rid}/release")
+async def release_reservation(rid: str, user=Depends(get_current_user)):
+    return await _finish_reservation(rid, user, stock_service.release_reservation)
+
+
+@router.post("/stock/reservations/{rid}/commit")
+async def commit_reservation(rid: str, user=Depends(get_current_user)):
+    return await _finish_reservation(rid, user, stock_service.commit_reservation)
+
+
+@router.post("/stock/{vendor_id}/{sku}/split")
+async def split_stock(vendor_id: str, sku: str, payload: StockSplit, admin=Depends(get_admin_user)):
+    return await stock_service.split_stock(vendor_id, sku, payload.shards)
+
+
+@router.post("/stock/{vendor_id}/{sku}/rebalance")
+async def rebalance_stock(vendor_id: str, sku: str, admin=Depends(get_admin_user)):
+    return await stock_service.rebalance_stock(vendor_id, sku)
@@ -1,12 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from models.invoice_model import InvoiceCreate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, Response
+from typing import Optional, Literal
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from models.invoice_model import InvoiceCreate, InvoiceUpdate
 from database import get_database
-from utils.id_generator import generate_id
+from utils.auth_dependencies import get_admin_user
+from config import BULK_INVOICE_MAX_ITEMS, RENDER_CACHE_MAX_BYTES, RENDER_CACHE_DIR
+from utils.id_generator import generate_id, allocator, format_id
+from utils.pagination import decode_cursor
+from services.invoice_query import build_invoice_filter, list_invoices as query_invoices
+from services.invoice_export import iter_invoice_rows, EXPORT_COLUMNS
+from services.pricing import price_invoice, price_invoices, PRICING_FIELDS
+from services.invoice_service import build_invoice_document, invoice_prefix
+from services.invoice_render import render_html, render_pdf
+from services.invoice_rollups import (
+    ROLLUP_FIELDS,
+    apply_invoice_change,
+    apply_invoice_changes,
+    query_rollups,
+)
+from utils.streaming import encode_stream, MEDIA_TYPES
+from utils.render_cache import RenderCache
+from utils.conditional import (
+    etag_matches,
+    conditional_json,
+    is_not_modified,
+    not_modified,
+    version_etag,
+)
 from bson import ObjectId
 from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter(prefix="/api/invoices", tags=["invoices"])
 
+render_cache = RenderCache(RENDER_CACHE_MAX_BYTES, RENDER_CACHE_DIR)
+
+RENDERERS = {
+    "html": (lambda invoice: render_html(invoice).encode(), "text/html; charset=utf-8"),
+    "pdf": (render_pdf, "application/pdf"),
+}
+
 
 @router.post("/create")
 async def create_invoice(invoice: InvoiceCreate):
@@ -15,40 +52,14 @@ async def create_invoice(invoice: InvoiceCreate):
     data = invoice.dict()
 
     # Generate IDs
-    invoice_type = data["invoiceType"]
-    invoice_id = await generate_id("invoice", f"QIK-{'INV' if invoice_type == 'customer' else 'REV'}")
-    order_id = await generate_id("order", "ORDER")
-
-    # Calculate subtotal and tax
-    sub_total = 0
-    total_tax = 0
-    for item in data["items"]:
-        base = item["unitPrice"] * item["quantity"]
-        discounted = base - item["discountAmount"]
-        gst_amount = (discounted * item["gst"]) / 100
-        sub_total += discounted
-        total_tax += gst_amount
-
-    # Include extra fees
-    delivery_charge = data.get("deliveryCharge", 0)
-    platform_fee = data.get("platformFee", 0)
-    logistics_fee = data.get("logisticsFee", 0)
-
-    total_amount = sub_total + total_tax + delivery_charge + platform_fee + logistics_fee
-
-    # Final document
-    data.update({
-        "invoiceNumber": invoice_id,
-        "orderId": order_id,
-        "subTotal": round(sub_total, 2),
-        "totalTax": round(total_tax, 2),
-        "totalAmount": round(total_amount, 2),
-        "status": "paid",
-        "createdAt": datetime.utcnow(),
-        "updatedAt": datetime.utcnow()
-    })
+    invoice_id, order_id = await asyncio.gather(
+        generate_id("invoice", invoice_prefix(data["invoiceType"])),
+        generate_id("order", "ORDER"),
+    )
 
+    data = build_invoice_document(data, invoice_id, order_id)
     result = await collection.insert_one(data)
+    await apply_invoice_change(after=data)
 
     return {
         "success": True,
@@ -58,51 +69,288 @@ async def create_invoice(invoice: InvoiceCreate):
     }
 
 
+async def _read_bulk_payload(request: Request):
+    """Accept a JSON array body or an NDJSON stream (one invoice per line)."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type:
+        items, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(_parse_ndjson_line(line) for line in lines if line.strip())
+            if len(items) > BULK_INVOICE_MAX_ITEMS:
+                break
+        if buffer.strip():
+            items.append(_parse_ndjson_line(buffer))
+        return items
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of invoices")
+    return items
+
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+
+@router.post("/bulk")
+async def create_invoices_bulk(request: Request):
+    items = await _read_bulk_payload(request)
+    if not items:
+        raise HTTPException(status_code=400, detail="No invoices supplied")
+    if len(items) > BULK_INVOICE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_INVOICE_MAX_ITEMS} invoices per request")
+
+    # Validate everything first; only valid items consume sequence numbers.
+    results = [{"index": i, "success": False} for i in range(len(items))]
+    valid = []
+    for i, item in enumerate(items):
+        if isinstance(item, Exception):
+            results[i]["error"] = str(item)
+            continue
+        try:
+            valid.append((i, InvoiceCreate(**item).dict()))
+        except (ValidationError, TypeError) as e:
+            results[i]["error"] = e.errors() if isinstance(e, ValidationError) else str(e)
+
+    if valid:
+        invoice_seqs, order_seqs = await asyncio.gather(
+            allocator.reserve("invoice", len(valid)),
+            allocator.reserve("order", len(valid)),
+        )
+        batch_totals = price_invoices([data for _, data in valid])
+        documents = []
+        for (i, data), totals, invoice_seq, order_seq in zip(valid, batch_totals, invoice_seqs, order_seqs):
+            doc = build_invoice_document(
+                data,
+                format_id(invoice_prefix(data["invoiceType"]), invoice_seq),
+                format_id("ORDER", order_seq),
+                totals,
+            )
+            doc["_id"] = ObjectId()
+            documents.append(doc)
+
+        failed = {}
+        try:
+            await get_database()["invoices"].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+
+        await apply_invoice_changes((None, doc) for pos, doc in enumerate(documents) if pos not in failed)
+
+        for pos, ((i, _), doc) in enumerate(zip(valid, documents)):
+            if pos in failed:
+                results[i]["error"] = failed[pos]
+                continue
+            results[i].update({
+                "success": True,
+                "invoiceId": str(doc["_id"]),
+                "invoiceNumber": doc["invoiceNumber"],
+                "orderId": doc["orderId"],
+            })
+
+    succeeded = sum(1 for r in results if r["success"])
+    return {
+        "success": succeeded == len(results),
+        "inserted": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
 @router.get("/list")
-async def list_invoices():
-    db = get_database()
-    collection = db["invoices"]
-    cursor = collection.find()
-    invoices = await cursor.to_list(length=1000)
-    for inv in invoices:
-        inv["_id"] = str(inv["_id"])
-    return invoices
+async def list_invoices(
+    request: Request,
+    sellerId: Optional[str] = None,
+    buyerId: Optional[str] = None,
+    invoiceType: Optional[str] = None,
+    status: Optional[str] = None,
+    paymentMode: Optional[str] = None,
+    dateFrom: Optional[datetime] = Query(None, description="createdAt >= dateFrom"),
+    dateTo: Optional[datetime] = Query(None, description="createdAt < dateTo"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    view: Literal["summary", "full"] = "summary",
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    filters = build_invoice_filter(
+        seller_id=sellerId,
+        buyer_id=buyerId,
+        invoice_type=invoiceType,
+        status=status,
+        payment_mode=paymentMode,
+        date_from=dateFrom,
+        date_to=dateTo,
+    )
+    invoices, next_cursor = await query_invoices(filters, after=after, limit=limit, full=view == "full")
+    return conditional_json(request, {"invoices": invoices, "next_cursor": next_cursor})
+
+
+@router.get("/export")
+async def export_invoices(
+    dateFrom: datetime = Query(..., description="createdAt >= dateFrom"),
+    dateTo: datetime = Query(..., description="createdAt < dateTo"),
+    format: Literal["csv", "ndjson"] = "csv",
+    sellerId: Optional[str] = None,
+    invoiceType: Optional[str] = None,
+    admin=Depends(get_admin_user),
+):
+    if dateTo <= dateFrom:
+        raise HTTPException(status_code=400, detail="dateTo must be after dateFrom")
+
+    filters = build_invoice_filter(
+        seller_id=sellerId,
+        invoice_type=invoiceType,
+        date_from=dateFrom,
+        date_to=dateTo,
+    )
+    filename = f"invoices-{dateFrom:%Y%m%d}-{dateTo:%Y%m%d}.{format}"
+    return StreamingResponse(
+        encode_stream(iter_invoice_rows(filters), format, EXPORT_COLUMNS),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/analytics/rollups")
+async def get_invoice_analytics(
+    dateFrom: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$", description="First day, YYYY-MM-DD"),
+    dateTo: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$", description="Last day (inclusive), YYYY-MM-DD"),
+    sellerId: Optional[str] = None,
+    paymentMode: Optional[str] = None,
+    groupBy: Literal["day", "seller", "paymentMode"] = "day",
+    admin=Depends(get_admin_user),
+):
+    if dateTo < dateFrom:
+        raise HTTPException(status_code=400, detail="dateTo must not be before dateFrom")
+    return await query_rollups(dateFrom, dateTo, seller_id=sellerId, payment_mode=paymentMode, group_by=groupBy)
 
 
 @router.get("/{invoice_id}")
-async def get_invoice(invoice_id: str):
+async def get_invoice(invoice_id: str, request: Request):
+    if not ObjectId.is_valid(invoice_id):
+        raise HTTPException(status_code=404, detail="Invoice not found")
     db = get_database()
     collection = db["invoices"]
+
+    # Polls are answered from a projected read of updatedAt when possible.
+    meta = await collection.find_one({"_id": ObjectId(invoice_id)}, {"updatedAt": 1})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    if meta.get("updatedAt"):
+        etag = version_etag(invoice_id, meta["updatedAt"])
+        if is_not_modified(request, etag, meta["updatedAt"]):
+            return not_modified(etag, meta["updatedAt"])
+
     invoice = await collection.find_one({"_id": ObjectId(invoice_id)})
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
-    invoice["_id"] = str(invoice["_id"])
-    return invoice
+
+    updated_at = invoice.get("updatedAt")
+    if not updated_at:
+        return conditional_json(request, invoice)
+    return conditional_json(request, invoice, etag=version_etag(invoice_id, updated_at), last_modified=updated_at)
+
+
+@router.get("/{invoice_id}/print")
+async def print_invoice(invoice_id: str, request: Request, format: Literal["html", "pdf"] = "html"):
+    if not ObjectId.is_valid(invoice_id):
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    db = get_database()
+    collection = db["invoices"]
+
+    # Cheap version probe first; the full document is only read on a cache miss.
+    meta = await collection.find_one({"_id": ObjectId(invoice_id)}, {"updatedAt": 1})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    render, media_type = RENDERERS[format]
+    cached = await render_cache.get((invoice_id, meta.get("updatedAt"), format))
+    if cached is None:
+        invoice = await collection.find_one({"_id": ObjectId(invoice_id)})
+        if not invoice:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        cached = await render_cache.put((invoice_id, invoice.get("updatedAt"), format), render(invoice))
+
+    content, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if format == "pdf":
+        headers["Content-Disposition"] = f'inline; filename="{invoice_id}.pdf"'
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def _version_filter(version: int) -> dict:
+    # Invoices created before versioning have no field and count as version 0.
+    return {"version": {"$in": [0, None]}} if version == 0 else {"version": version}
 
 
 @router.patch("/update/{invoice_id}")
-async def update_invoice(invoice_id: str, data: dict):
+async def update_invoice(invoice_id: str, patch: InvoiceUpdate):
+    if not ObjectId.is_valid(invoice_id):
+        raise HTTPException(status_code=404, detail="Invoice not found")
     db = get_database()
     collection = db["invoices"]
 
-    # ✅ Prevent _id update
-    data.pop("_id", None)
+    data = patch.dict(exclude_unset=True)
+    expected_version = data.pop("version")
+    if not data:
+        raise HTTPException(status_code=400, detail="No fields to update")
 
+    # Keep derived totals in step with items / fees
+    if any(field in data for field in PRICING_FIELDS):
+        current = await collection.find_one(
+            {"_id": ObjectId(invoice_id)},
+            {"version": 1, **{field: 1 for field in PRICING_FIELDS}},
+        )
+        if not current:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        if current.get("version", 0) != expected_version:
+            raise HTTPException(status_code=409, detail={"message": "Invoice was modified", "version": current.get("version", 0)})
+        current.update({field: data[field] for field in PRICING_FIELDS if field in data})
+        data.update(price_invoice(current))
+
+    # Compare-and-set: only applies if nobody bumped the version since it was read
     data["updatedAt"] = datetime.utcnow()
-    result = await collection.update_one(
-        {"_id": ObjectId(invoice_id)},
-        {"$set": data}
+    before = await collection.find_one_and_update(
+        {"_id": ObjectId(invoice_id), **_version_filter(expected_version)},
+        {"$set": data, "$inc": {"version": 1}},
+        projection=ROLLUP_FIELDS,
+        return_document=ReturnDocument.BEFORE
     )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="Invoice not updated")
-    return {"success": True}
+    if not before:
+        current = await collection.find_one({"_id": ObjectId(invoice_id)}, {"version": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        raise HTTPException(status_code=409, detail={"message": "Invoice was modified", "version": current.get("version", 0)})
+
+    after = {**before, **data}
+    await apply_invoice_change(before, after)
+    await render_cache.invalidate(invoice_id)
+    return {"success": True, "version": expected_version + 1}
 
 
 @router.delete("/delete/{invoice_id}")
 async def delete_invoice(invoice_id: str):
     db = get_database()
     collection = db["invoices"]
-    result = await collection.delete_one({"_id": ObjectId(invoice_id)})
-    if result.deleted_count == 0:
+    deleted = await collection.find_one_and_delete({"_id": ObjectId(invoice_id)}, projection=ROLLUP_FIELDS)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Invoice not found")
+    await apply_invoice_change(before=deleted)
+    await render_cache.invalidate(invoice_id)
     return {"success": True}
@@ -1,2 +1,120 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pymongo import DESCENDING
+from typing import Optional
+
+from database import get_database
+from models.order import ORDER_STATUSES, OrderCancel, OrderCreate
+from services import order_service
+from services.order_service import NOTIFICATIONS_COLLECTION, ORDERS_COLLECTION
+from utils.auth_dependencies import get_current_user
+from utils.conditional import conditional_json
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
 router = APIRouter()
+
+# Which orders each role sees in listings.
+OWNER_FIELDS = {"garage": "buyerId", "vendor": "vendorId", "delivery": "deliveryPartnerId"}
+
+
+def _can_view(user: dict, order: dict) -> bool:
+    if user.get("role") == "admin":
+        return True
+    field = OWNER_FIELDS.get(user.get("role"))
+    return field is not None and order.get(field) == user.get("user_id")
+
+
+# -------- Place --------
+@router.post("/orders")
+async def place_order(payload: OrderCreate, user=Depends(get_current_user)):
+    if user.get("role") not in ("garage", "admin"):
+        raise HTTPException(status_code=403, detail="Only garages can place orders")
+    try:
+        order = await order_service.place_order(user.get("user_id"), payload.dict())
+    except order_service.OrderError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except order_service.OrderOutOfStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "skus": e.skus})
+    return {
+        "success": True,
+        "orderId": str(order["_id"]),
+        "orderNumber": order["orderNumber"],
+        "status": order["status"],
+        "totalAmount": order.get("totalAmount"),
+    }
+
+
+# -------- List --------
+@router.get("/orders")
+async def list_orders(
+    request: Request,
+    status: Optional[str] = Query(None, description=" / ".join(ORDER_STATUSES)),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_current_user),
+):
+    query = {}
+    if user.get("role") != "admin":
+        field = OWNER_FIELDS.get(user.get("role"))
+        if field is None:
+            raise HTTPException(status_code=403, detail="Not allowed to list orders")
+        query[field] = user.get("user_id")
+    if status:
+        query["status"] = status.upper()
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, keyset_filter("createdAt", *after)]}
+
+    orders = await get_database()[ORDERS_COLLECTION].find(query, {"reservations": 0}).sort(
+        [("createdAt", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_cursor(orders[-1].get("createdAt"), orders[-1]["_id"]) if has_more else None
+    return conditional_json(request, {"orders": orders, "next_cursor": next_cursor})
+
+
+# -------- Notifications (new-order inbox) --------
+@router.get("/notifications")
+async def list_notifications(
+    unread: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_current_user),
+):
+    query = {"userId": user.get("user_id")}
+    if unread:
+        query["read"] = False
+    notifications = await get_database()[NOTIFICATIONS_COLLECTION].find(query).sort(
+        [("createdAt", DESCENDING)]
+    ).limit(limit).to_list(length=limit)
+    return {"notifications": notifications}
+
+
+# -------- Get --------
+@router.get("/orders/{order_id}")
+async def get_order(order_id: str, request: Request, user=Depends(get_current_user)):
+    try:
+        order = await order_service.get_order(order_id)
+    except order_service.OrderNotFound:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if not _can_view(user, order):
+        raise HTTPException(status_code=404, detail="Order not found")
+    order.pop("reservations", None)
+    return conditional_json(request, order)
+
+
+# -------- Cancel --------
+@router.post("/orders/{order_id}/cancel")
+async def cancel_order(order_id: str, payload: OrderCancel, user=Depends(get_current_user)):
+    try:
+        order = await order_service.get_order(order_id)
+        if not _can_view(user, order) or user.get("role") == "delivery":
+            raise HTTPException(status_code=404, detail="Order not found")
+        order = await order_service.cancel_order(order_id, user.get("user_id"), payload.reason)
+    except order_service.OrderNotFound:
+        raise HTTPException(status_code=404, detail="Order not found")
+    except order_service.OrderStateError as e:
+        raise HTTPException(status_code=409, detail=f"Order is already {e}")
+    return {"success": True, "status": order["status"]}
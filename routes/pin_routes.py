@@ -1,48 +1,29 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
-from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Depends
 from models.pin_models import CreatePinModel, VerifyPinModel, ResetPinModel
-from utils.jwt_utils import decode_access_token, create_access_token
+from utils.jwt_utils import create_token_pair
+from utils.auth_dependencies import get_current_user
+from services.user_directory import find_user_by_phone, resolve_role, to_object_id
+from utils.password_utils import hash_pin, verify_pin
 import datetime
 
 router = APIRouter()
 
 # ---------------------------
-# Auth Helper
+# Helper to update user in correct collection
 # ---------------------------
-def get_current_user(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    try:
-        token = authorization.split(" ")[1]
-        return decode_access_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-# ---------------------------
-# Helper to find and update user in correct collection
-# ---------------------------
-async def find_user_by_phone(phone: str):
-    from database import get_database
-    db = get_database()
-
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        user = await db[f"{role}_users"].find_one({"phone": phone})
-        if user:
-            return user, role
-    return None, None
-
 async def update_pin_by_user_id(user_id: str, new_pin: str):
     from database import get_database
     db = get_database()
 
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        result = await db[f"{role}_users"].update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"pin": new_pin, "updated_at": datetime.datetime.utcnow()}}
-        )
-        if result.modified_count > 0:
-            return True
-    return False
+    role = await resolve_role(user_id)
+    if not role:
+        return False
+    pin_hash = await hash_pin(new_pin)
+    result = await db[f"{role}_users"].update_one(
+        {"_id": to_object_id(user_id)},
+        {"$set": {"pin": pin_hash, "updated_at": datetime.datetime.utcnow()}}
+    )
+    return result.modified_count > 0
 
 # ---------------------------
 # Create or Update PIN
@@ -64,21 +45,30 @@ async def create_or_update_pin(payload: CreatePinModel, user=Depends(get_current
 # ---------------------------
 @router.post("/user/verify-pin")
 async def login_with_pin(payload: VerifyPinModel):
-    user, role = await find_user_by_phone(payload.phone)
+    user, role = await find_user_by_phone(payload.phone, {"phone": 1, "pin": 1})
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user.get("pin") != payload.pin:
+    matches, needs_rehash = await verify_pin(payload.pin, user.get("pin"))
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid PIN")
 
+    if needs_rehash:
+        # Upgrade plaintext / outdated hashes; skipped if the PIN changed meanwhile.
+        from database import get_database
+        await get_database()[f"{role}_users"].update_one(
+            {"_id": user["_id"], "pin": user.get("pin")},
+            {"$set": {"pin": await hash_pin(payload.pin)}}
+        )
+
     token_data = {
         "user_id": str(user["_id"]),
         "phone": user["phone"],
         "role": role
     }
 
-    return {"access_token": create_access_token(token_data)}
+    return create_token_pair(token_data)
 
 # ---------------------------
 # Reset PIN via OTP
@@ -88,7 +78,7 @@ async def reset_pin_after_otp(payload: ResetPinModel):
     if payload.new_pin != payload.confirm_pin:
         raise HTTPException(status_code=400, detail="PINs do not match")
 
-    user, role = await find_user_by_phone(payload.phone)
+    user, role = await find_user_by_phone(payload.phone, {"_id": 1})
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -97,8 +87,8 @@ async def reset_pin_after_otp(payload: ResetPinModel):
     db = get_database()
 
     await db[f"{role}_users"].update_one(
-        {"phone": payload.phone},
-        {"$set": {"pin": payload.new_pin, "updated_at": datetime.datetime.utcnow()}}
+        {"_id": user["_id"]},
+        {"$set": {"pin": await hash_pin(payload.new_pin), "updated_at": datetime.datetime.utcnow()}}
     )
 
     return {"message": "PIN reset successfully"}
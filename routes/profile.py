@@ -1,23 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from bson import ObjectId
+import datetime
 from typing import Optional
 from database import get_database
-from utils.jwt_utils import decode_access_token
+from utils.auth_dependencies import get_current_user
 from models.user import UserUpdateModel
+from services.geo import set_geo
+from services.pincodes import PincodeError, normalize_address
+from services.user_directory import PhoneAlreadyRegistered, sync_user_fields
+from utils.password_utils import hash_pin
 
 router = APIRouter()
 
-# ------------------ Auth Dependency ------------------
-
-def get_current_user(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    try:
-        token = authorization.split(" ")[1]
-        return decode_access_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
 # ------------------ Update Profile ------------------
 
 @router.patch("/update-profile")
@@ -31,6 +25,28 @@ async def update_profile(payload: UserUpdateModel, user=Depends(get_current_user
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
 
+    # Fill city / state / coordinates from the pincode before deriving `geo`.
+    try:
+        if (update_data.get("location") or {}).get("pincode"):
+            update_data["location"] = normalize_address(update_data["location"])
+        if update_data.get("addresses"):
+            update_data["addresses"] = [
+                normalize_address(a) if a.get("pincode") else a for a in update_data["addresses"]
+            ]
+    except PincodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if update_data.get("pin"):
+        update_data["pin"] = await hash_pin(str(update_data["pin"]))
+    update_data["updated_at"] = datetime.datetime.utcnow()
+    set_geo(update_data, clear=True)
+
+    # Keep the phone directory in step, or login with the new phone fails.
+    try:
+        await sync_user_fields(user_id, update_data)
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+
     collection_name = f"{role}_users"
     result = await db[collection_name].update_one(
         {"_id": ObjectId(user_id)},
@@ -1,84 +1,134 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional, Literal
 from pymongo.collection import ReturnDocument
-from bson import ObjectId
+import csv
+import datetime
 
 from database import get_database
-from utils.jwt_utils import decode_access_token
-from models.user import (
-    create_user_model,
-    AdminUser,
-    VendorUser,
-    GarageUser,
-    DeliveryUser,
-    AdminUserUpdate,
-    VendorUserUpdate,
-    GarageUserUpdate,
-    DeliveryUserUpdate,
-    UserInDB,
+from utils.auth_dependencies import get_admin_user, get_current_user
+from models.user import create_user_model
+from utils.password_utils import hash_pin
+from utils.pagination import decode_cursor
+from services.user_query import list_users, count_users
+from services.user_import import import_users, parse_csv, parse_ndjson
+from services.geo import nearby_vendors, set_geo
+from config import USER_IMPORT_MAX_ROWS
+from utils.conditional import conditional_json, version_etag
+from utils.json_response import MongoJSONResponse
+from services.user_directory import (
+    PhoneAlreadyRegistered,
+    ReferralCodeTaken,
+    insert_user,
+    resolve_role,
+    to_object_id,
+    sync_user_fields,
+    unregister_user,
 )
 
 router = APIRouter()
 
-# --------------------------
-# Auth Helper for Admin Only
-# --------------------------
-def get_admin_user(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    try:
-        token = authorization.split(" ")[1]
-        payload = decode_access_token(token)
-        if payload.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        return payload
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-
 # --------------------------
 # Create User (Admin only)
 # --------------------------
 @router.post("/admin/create-user")
 async def create_user(user_data: dict, admin=Depends(get_admin_user)):
-    db = get_database()
     try:
         user = create_user_model(user_data)
         role = user.role
-        result = db[f"{role}_users"].insert_one(user.dict())
-        return {"status": "success", "user_id": str(result.inserted_id)}
+        user_doc = user.dict()
+        if user_doc.get("pin"):
+            user_doc["pin"] = await hash_pin(user_doc["pin"])
+        user_id = await insert_user(role, user_doc)
+        return {"status": "success", "user_id": str(user_id)}
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    except ReferralCodeTaken:
+        raise HTTPException(status_code=409, detail="Referral code already in use")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# --------------------------
+# Bulk Import Users (Admin only)
+# --------------------------
+@router.post("/admin/users/import")
+async def import_users_bulk(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    role: Optional[Literal["admin", "vendor", "garage", "delivery"]] = Query(None, description="Role for rows without one"),
+    admin=Depends(get_admin_user),
+):
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    body = await request.body()
+    try:
+        rows = parse_csv(body, role) if format == "csv" else parse_ndjson(body, role)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable {format} body: {e}")
+    if not rows:
+        raise HTTPException(status_code=400, detail="No users supplied")
+    if len(rows) > USER_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {USER_IMPORT_MAX_ROWS} users per import")
+    return await import_users(rows)
+
+
 # --------------------------
 # Get All Users (Admin only)
 # --------------------------
 @router.get("/admin/users")
-async def get_all_users(admin=Depends(get_admin_user)):
-    db = get_database()
-    all_users = []
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        users = list(db[f"{role}_users"].find())
-        for user in users:
-            user["role"] = role
-            user["_id"] = str(user["_id"])
-            all_users.append(user)
-    return {"count": len(all_users), "data": all_users}
+async def get_all_users(
+    request: Request,
+    role: Optional[Literal["admin", "vendor", "garage", "delivery"]] = None,
+    city: Optional[str] = None,
+    kyc_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    admin=Depends(get_admin_user),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    users, next_cursor = await list_users(role, city, kyc_status, after=after, limit=limit)
+    total = await count_users(role, city, kyc_status)
+    return conditional_json(request, {"count": total, "data": users, "next_cursor": next_cursor})
+
+
+# --------------------------
+# Nearby Vendors (any signed-in user)
+# --------------------------
+@router.get("/vendors/nearby")
+async def get_nearby_vendors(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=100),
+    brand: Optional[str] = Query(None, description="Matches brands_carried"),
+    category: Optional[str] = Query(None, description="Matches category_focus"),
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(get_current_user),
+):
+    return await nearby_vendors(lat, lng, radius_km, brand, category, skip=skip, limit=limit)
 
 
 # --------------------------
 # Get Single User by ID
 # --------------------------
 @router.get("/admin/user/{user_id}")
-async def get_user_by_id(user_id: str, admin=Depends(get_admin_user)):
+async def get_user_by_id(user_id: str, request: Request, admin=Depends(get_admin_user)):
     db = get_database()
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        user = db[f"{role}_users"].find_one({"_id": ObjectId(user_id)})
+    role = await resolve_role(user_id)
+    if role:
+        user = await db[f"{role}_users"].find_one({"_id": to_object_id(user_id)}, {"pin": 0})
         if user:
-            user["_id"] = str(user["_id"])
             user["role"] = role
-            return user
+            if user.get("updated_at"):
+                etag = version_etag(user_id, role, user["updated_at"])
+                return conditional_json(request, user, etag=etag, last_modified=user["updated_at"])
+            return conditional_json(request, user)
     raise HTTPException(status_code=404, detail="User not found")
 
 
@@ -88,17 +138,34 @@ async def get_user_by_id(user_id: str, admin=Depends(get_admin_user)):
 @router.patch("/admin/update-user/{user_id}")
 async def update_user_by_id(user_id: str, payload: dict, admin=Depends(get_admin_user)):
     db = get_database()
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        result = db[f"{role}_users"].find_one_and_update(
-            {"_id": ObjectId(user_id)},
-            {"$set": payload},
-            return_document=ReturnDocument.AFTER
-        )
-        if result:
-            result["_id"] = str(result["_id"])
-            result["role"] = role
-            return {"status": "updated", "data": result}
-    raise HTTPException(status_code=404, detail="User not found")
+    payload.pop("_id", None)
+    payload.pop("role", None)
+    role = await resolve_role(user_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if payload.get("pin"):
+        payload["pin"] = await hash_pin(str(payload["pin"]))
+    payload["updated_at"] = datetime.datetime.utcnow()
+    set_geo(payload, clear=True)
+
+    try:
+        await sync_user_fields(user_id, payload)
+    except PhoneAlreadyRegistered:
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    except ReferralCodeTaken:
+        raise HTTPException(status_code=409, detail="Referral code already in use")
+
+    result = await db[f"{role}_users"].find_one_and_update(
+        {"_id": to_object_id(user_id)},
+        {"$set": payload},
+        projection={"pin": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="User not found")
+    result["role"] = role
+    return MongoJSONResponse({"status": "updated", "data": result})
 
 
 # --------------------------
@@ -107,8 +174,10 @@ async def update_user_by_id(user_id: str, payload: dict, admin=Depends(get_admin
 @router.delete("/admin/user/{user_id}")
 async def delete_user(user_id: str, admin=Depends(get_admin_user)):
     db = get_database()
-    for role in ["admin", "vendor", "garage", "delivery"]:
-        deleted = db[f"{role}_users"].delete_one({"_id": ObjectId(user_id)})
+    role = await resolve_role(user_id)
+    if role:
+        deleted = await db[f"{role}_users"].delete_one({"_id": to_object_id(user_id)})
         if deleted.deleted_count > 0:
+            await unregister_user(user_id)
             return {"status": "deleted", "user_id": user_id, "role": role}
     raise HTTPException(status_code=404, detail="User not found")
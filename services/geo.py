@@ -0,0 +1,234 @@
+# services/geo.py
+#
+# User locations as GeoJSON points (`geo`, 2dsphere-indexed) derived from the
+# `location.lat` / `location.lng` fields, and the "vendors near me" query.
+#
+# Nearby results are cached per worker by geohash cell (precision 6 is
+# roughly 1.2 x 0.6 km), so garages a few hundred metres apart share one
+# entry. The cached entry is a candidate set: every vendor within the radius
+# plus the cell's half-diagonal of the cell centre, which contains every
+# vendor within the radius of any point in the cell. Each request then
+# measures true distances from its own point, filters and pages; cells too
+# dense to cache completely are queried from the exact point instead.
+
+import time
+from collections import OrderedDict
+
+from config import GEO_CACHE_CANDIDATES, GEO_CACHE_MAX_ENTRIES, GEO_CACHE_PRECISION, GEO_CACHE_SECONDS
+from database import get_database
+from indexes import ROLE_COLLECTIONS
+from services.pincodes import haversine_km
+
+NEARBY_PROJECTION = {
+    "full_name": 1,
+    "business_name": 1,
+    "phone": 1,
+    "brands_carried": 1,
+    "category_focus": 1,
+    "location": 1,
+    "geo": 1,
+    "distance_m": 1,
+}
+
+
+# -------- GeoJSON --------
+
+def geo_point(location):
+    """GeoJSON point for a location dict, or None without valid coordinates."""
+    if not isinstance(location, dict):
+        return None
+    lat, lng = location.get("lat"), location.get("lng")
+    if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def set_geo(doc: dict, clear: bool = False) -> dict:
+    """
+    Mirror `location` into `geo` on a new document or a $set payload.
+    With `clear`, a location without coordinates nulls out a stale point
+    (2dsphere indexes skip null and missing values alike).
+    """
+    if "location" in doc:
+        point = geo_point(doc["location"])
+        if point is not None:
+            doc["geo"] = point
+        elif clear:
+            doc["geo"] = None
+    return doc
+
+
+async def backfill_geo():
+    """Derive `geo` from location.lat/lng for every user that has coordinates."""
+    db = get_database()
+    has_coords = {
+        "location.lat": {"$type": "number", "$gte": -90, "$lte": 90},
+        "location.lng": {"$type": "number", "$gte": -180, "$lte": 180},
+    }
+    report = {}
+    for name in ROLE_COLLECTIONS:
+        result = await db[name].update_many(
+            has_coords,
+            [{"$set": {"geo": {"type": "Point", "coordinates": ["$location.lng", "$location.lat"]}}}],
+        )
+        report[name] = {"matched": result.matched_count, "modified": result.modified_count}
+    return report
+
+
+# -------- Geohash --------
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int = GEO_CACHE_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(cell: str):
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def geohash_centre(cell: str):
+    """(lat, lng) at the centre of a geohash cell."""
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(cell)
+    return (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+
+
+def cell_radius_km(cell: str) -> float:
+    """Farthest any point of the cell can be from its centre."""
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(cell)
+    centre_lat, centre_lng = geohash_centre(cell)
+    # The corner nearer the equator is the widest.
+    corner_lat = lat_min if abs(lat_min) < abs(lat_max) else lat_max
+    return haversine_km(centre_lat, centre_lng, corner_lat, lng_max)
+
+
+class GeoCache:
+    """Small TTL + LRU map for nearby-vendor candidate sets, keyed by geohash cell and filters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+nearby_cache = GeoCache(GEO_CACHE_MAX_ENTRIES, GEO_CACHE_SECONDS)
+
+
+# -------- Nearby vendors --------
+
+async def _query_nearby(lat: float, lng: float, radius_km: float, brand, category, skip: int, limit: int) -> list:
+    query = {}
+    if brand:
+        query["brands_carried"] = brand
+    if category:
+        query["category_focus"] = category
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "key": "geo",
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+            "query": query,
+        }},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": NEARBY_PROJECTION},
+    ]
+    vendors = await get_database()["vendor_users"].aggregate(pipeline).to_list(length=limit)
+    for vendor in vendors:
+        vendor["_id"] = str(vendor["_id"])
+    return vendors
+
+
+def _page(vendors: list, skip: int, limit: int) -> dict:
+    page = vendors[skip:skip + limit]
+    return {"vendors": page, "next_skip": skip + limit if len(vendors) > skip + limit else None}
+
+
+async def nearby_vendors(lat: float, lng: float, radius_km: float, brand=None, category=None, skip: int = 0, limit: int = 20):
+    """Vendors within `radius_km` of the exact point, nearest first, optionally filtered by brand and category."""
+    cell = geohash(lat, lng)
+    key = (cell, radius_km, brand, category)
+    candidates = nearby_cache.get(key)
+    if candidates is None:
+        centre_lat, centre_lng = geohash_centre(cell)
+        candidates = await _query_nearby(
+            centre_lat, centre_lng, radius_km + cell_radius_km(cell), brand, category, 0, GEO_CACHE_CANDIDATES + 1
+        )
+        # An incomplete candidate set can't answer for every point in the cell.
+        nearby_cache.put(key, candidates if len(candidates) <= GEO_CACHE_CANDIDATES else False)
+
+    if candidates is False:
+        vendors = await _query_nearby(lat, lng, radius_km, brand, category, skip, limit + 1)
+        for vendor in vendors:
+            vendor["distance_km"] = round(vendor.pop("distance_m") / 1000, 2)
+        return {"vendors": vendors[:limit], "next_skip": skip + limit if len(vendors) > limit else None}
+
+    hits = []
+    for vendor in candidates:
+        v_lng, v_lat = vendor["geo"]["coordinates"]
+        distance = haversine_km(lat, lng, v_lat, v_lng)
+        if distance <= radius_km:
+            hits.append((distance, vendor))
+    hits.sort(key=lambda hit: hit[0])
+    vendors = [
+        {**{k: v for k, v in vendor.items() if k != "distance_m"}, "distance_km": round(distance, 2)}
+        for distance, vendor in hits
+    ]
+    return _page(vendors, skip, limit)
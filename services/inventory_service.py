@@ -0,0 +1,290 @@
+# services/inventory_service.py
+#
+# Parts catalog: Mongo is the source of truth (`parts`), and every worker
+# keeps an in-process inverted index over partName, modelNo, brand, category
+# and sku for garage search.
+#
+# The index is refreshed incrementally: a background task pulls parts whose
+# updatedAt is past the last watermark (deletes are soft, so they show up the
+# same way), and catalog writes on this worker are applied immediately.
+#
+# Matching, per query term:
+#   exact token         1.0
+#   token prefix        0.7   (terms of 2+ characters, capped expansions)
+#   one edit away       0.5   (terms of 4+ characters, deletion neighbourhood)
+# A part must match every term. Per term it scores match quality times the
+# weight of the field the token came from, using its most exact matching
+# token; the part's score is the sum over terms. Per-term score maps are
+# built with dict.update and intersected as key views, so the Python-level
+# work is proportional to the parts that match every term.
+
+import asyncio
+import datetime
+import heapq
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import repeat
+from operator import itemgetter, mul
+
+from config import CATALOG_SYNC_SECONDS
+from database import get_database
+
+PARTS_COLLECTION = "parts"
+
+# Overlap each incremental pull a little to tolerate clock skew between workers.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+FIELD_WEIGHTS = {"sku": 4.0, "modelNo": 4.0, "partName": 3.0, "brand": 2.0, "category": 1.0}
+# Folded into every posting weight so that, at equal scores, shorter part names rank first.
+NAME_LENGTH_PENALTY = 1e-5
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+MAX_PREFIX_EXPANSIONS = 64
+# Broad one-word queries ("brake") score tens of thousands of parts; repeats are served from here.
+RESULT_CACHE_SIZE = 512
+
+# What search results carry; the full part is one GET away.
+SUMMARY_FIELDS = ("sku", "partName", "modelNo", "brand", "category", "unitPrice", "gst")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list:
+    return _TOKEN.findall(str(text).lower()) if text else []
+
+
+def _field_tokens(field: str, value) -> set:
+    tokens = set(tokenize(value))
+    if field in ("sku", "modelNo") and len(tokens) > 1:
+        # "BP-1234/A" is also searchable as typed without separators.
+        tokens.add("".join(tokenize(value)))
+    return tokens
+
+
+def _deletes(token: str) -> set:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Levenshtein distance <= 1, plus adjacent transposition."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    return a[i + 1:] == b[i:] if la > lb else a[i:] == b[i + 1:]
+
+
+class PartIndex:
+    def __init__(self):
+        self.parts = {}        # part id -> summary dict
+        self._postings = {}    # token -> {part id: field weight}
+        self._part_tokens = {} # part id -> tokens, for removal
+        self._vocabulary = []  # sorted tokens, for prefix ranges
+        self._new_tokens = []  # merged into _vocabulary on the next search
+        self._deletes = {}     # token with one char deleted -> tokens
+        self._results = OrderedDict()  # recent searches, dropped on any index change
+        self._updated_at = {}  # part id -> updatedAt of the indexed version
+        self.watermark = None
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    # -------- Maintenance --------
+
+    def _add_token(self, token: str):
+        self._new_tokens.append(token)
+        if len(token) >= MIN_FUZZY_LENGTH:
+            for variant in _deletes(token) | {token}:
+                self._deletes.setdefault(variant, set()).add(token)
+
+    def upsert(self, part: dict):
+        part_id = str(part["_id"])
+        if part.get("updatedAt") is not None and self._updated_at.get(part_id) == part["updatedAt"]:
+            # Already indexed (overlapping sync pulls see the same write twice).
+            return
+        self.remove(part_id)
+        if part.get("deleted"):
+            self._updated_at[part_id] = part.get("updatedAt")
+            return
+        weights = {}
+        penalty = NAME_LENGTH_PENALTY * min(len(part.get("partName") or ""), 200)
+        for field, weight in FIELD_WEIGHTS.items():
+            weight -= penalty
+            for token in _field_tokens(field, part.get(field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._add_token(token)
+            posting[part_id] = weight
+        self._part_tokens[part_id] = tuple(weights)
+        self._updated_at[part_id] = part.get("updatedAt")
+        self.parts[part_id] = {"_id": part_id, **{f: part.get(f) for f in SUMMARY_FIELDS}}
+
+    def remove(self, part_id: str):
+        # Emptied tokens stay in the vocabulary; lookups skip them.
+        self._results.clear()
+        self._updated_at.pop(part_id, None)
+        for token in self._part_tokens.pop(part_id, ()):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(part_id, None)
+        self.parts.pop(part_id, None)
+
+    # -------- Search --------
+
+    def _expand(self, term: str) -> dict:
+        """Index tokens a query term matches, with their match quality."""
+        if self._new_tokens:
+            # One sort per batch of new tokens, not an insort per token.
+            self._vocabulary.extend(self._new_tokens)
+            self._vocabulary.sort()
+            self._new_tokens.clear()
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self._vocabulary, term)
+            for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+                if not token.startswith(term):
+                    break
+                matches.setdefault(token, PREFIX)
+        if len(term) >= MIN_FUZZY_LENGTH:
+            candidates = set()
+            for variant in _deletes(term) | {term}:
+                candidates |= self._deletes.get(variant, set())
+            for token in candidates:
+                if token not in matches and _within_one_edit(term, token):
+                    matches[token] = FUZZY
+        return matches
+
+    def _term_scores(self, term: str) -> dict:
+        """
+        part id -> score for one query term. Postings are merged in C from the
+        least to the most exact match, so each part keeps its most exact token.
+        """
+        groups = {}
+        for token, quality in self._expand(term).items():
+            if self._postings[token]:
+                groups.setdefault(quality, []).append(self._postings[token])
+        scores = {}
+        for quality in sorted(groups):
+            postings = groups[quality]
+            merged = postings[0]
+            if len(postings) > 1:
+                # Several tokens at the same quality (e.g. "fil" -> filter, filters): keep the best field.
+                merged = dict(merged)
+                for posting in postings[1:]:
+                    for pid, weight in posting.items():
+                        if weight > merged.get(pid, 0.0):
+                            merged[pid] = weight
+            if quality == EXACT:
+                scores.update(merged)
+            else:
+                scores.update(zip(merged.keys(), map(mul, repeat(quality), merged.values())))
+        return scores
+
+    def search(self, query: str, category: str = None, brand: str = None, limit: int = 20) -> list:
+        key = (query.lower().strip(), category, brand, limit)
+        results = self._results.get(key)
+        if results is None:
+            results = self._results[key] = self._search(*key)
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+        return results
+
+    def _search(self, query: str, category: str, brand: str, limit: int) -> list:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        per_term = sorted((self._term_scores(t) for t in terms), key=len)
+        if not per_term[0]:
+            return []
+
+        if len(per_term) == 1:
+            scores = per_term[0]
+        else:
+            candidates = per_term[0].keys()
+            for term_scores in per_term[1:]:
+                candidates = candidates & term_scores.keys()
+                if not candidates:
+                    return []
+            scores = {pid: sum(term_scores[pid] for term_scores in per_term) for pid in candidates}
+
+        parts = self.parts
+        if category or brand:
+            scores = {
+                pid: score for pid, score in scores.items()
+                if (not category or parts[pid].get("category") == category)
+                and (not brand or parts[pid].get("brand") == brand)
+            }
+        if len(scores) > limit:
+            # Only the parts at or above the limit-th best score are sorted.
+            cutoff = heapq.nlargest(limit, scores.values())[-1]
+            scores = {pid: score for pid, score in scores.items() if score >= cutoff}
+        top = sorted(scores.items(), key=itemgetter(1), reverse=True)[:limit]
+        return [{**parts[pid], "score": round(score, 2)} for pid, score in top]
+
+    def stats(self) -> dict:
+        return {
+            "parts": len(self.parts),
+            "tokens": len(self._postings),
+            "cached_searches": len(self._results),
+            "watermark": self.watermark,
+        }
+
+
+part_index = PartIndex()
+_sync_task = None
+
+
+async def sync_part_index():
+    """Apply every part changed since the watermark (all parts on the first run)."""
+    if part_index.watermark is None:
+        query = {"deleted": {"$ne": True}}
+    else:
+        query = {"updatedAt": {"$gte": part_index.watermark - SYNC_OVERLAP}}
+    projection = {field: 1 for field in (*SUMMARY_FIELDS, "deleted", "updatedAt")}
+    cursor = get_database()[PARTS_COLLECTION].find(query, projection, batch_size=2000)
+    async for part in cursor:
+        part_index.upsert(part)
+        updated_at = part.get("updatedAt")
+        if updated_at and (part_index.watermark is None or updated_at > part_index.watermark):
+            part_index.watermark = updated_at
+    if part_index.watermark is None:
+        part_index.watermark = datetime.datetime.utcnow()
+
+
+async def _sync_forever():
+    while True:
+        await asyncio.sleep(CATALOG_SYNC_SECONDS)
+        try:
+            await sync_part_index()
+        except Exception as e:
+            print(f"⚠️ Parts index sync failed: {e}")
+
+
+async def start_catalog_sync():
+    global _sync_task
+    await sync_part_index()
+    _sync_task = asyncio.create_task(_sync_forever())
+
+
+async def stop_catalog_sync():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        _sync_task = None
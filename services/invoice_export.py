@@ -0,0 +1,77 @@
+# services/invoice_export.py
+#
+# Flattens invoices into one row per line item for GST filing. Rows carry the
+# invoice header, the line's taxable value and GST, and one column per GST
+# slab so accountants can total each slab directly.
+
+from pymongo import ASCENDING
+
+from database import get_database
+from services.pricing import price_line, to_rupees
+
+EXPORT_BATCH_SIZE = 200
+GST_SLABS = (0, 5, 12, 18, 28)
+
+EXPORT_COLUMNS = [
+    "invoiceNumber", "orderId", "invoiceDate", "createdAt", "invoiceType", "paymentMode", "status",
+    "sellerId", "sellerName", "sellerGstin", "buyerId", "buyerName", "buyerGstin",
+    "lineNo", "partName", "modelNo", "category", "quantity", "unitPrice",
+    "grossAmount", "discountAmount", "taxableValue", "gstRate", "gstAmount",
+    *[f"gst{slab}" for slab in GST_SLABS],
+    "lineTotal", "deliveryCharge", "platformFee", "logisticsFee", "invoiceTotal",
+]
+
+
+def flatten_invoice(invoice: dict):
+    seller = invoice.get("seller") or {}
+    buyer = invoice.get("buyer") or {}
+    header = {
+        "invoiceNumber": invoice.get("invoiceNumber"),
+        "orderId": invoice.get("orderId"),
+        "invoiceDate": invoice.get("invoiceDate"),
+        "createdAt": invoice.get("createdAt"),
+        "invoiceType": invoice.get("invoiceType"),
+        "paymentMode": invoice.get("paymentMode"),
+        "status": invoice.get("status"),
+        "sellerId": seller.get("userId"),
+        "sellerName": seller.get("name"),
+        "sellerGstin": seller.get("gstin"),
+        "buyerId": buyer.get("userId"),
+        "buyerName": buyer.get("name"),
+        "buyerGstin": buyer.get("gstin"),
+        "deliveryCharge": invoice.get("deliveryCharge", 0),
+        "platformFee": invoice.get("platformFee", 0),
+        "logisticsFee": invoice.get("logisticsFee", 0),
+        "invoiceTotal": invoice.get("totalAmount"),
+    }
+    for line_no, item in enumerate(invoice.get("items") or [], start=1):
+        line = price_line(item)
+        gst_amount = to_rupees(line["gst"])
+        row = dict(header)
+        row.update({
+            "lineNo": line_no,
+            "partName": item.get("partName"),
+            "modelNo": item.get("modelNo"),
+            "category": item.get("category"),
+            "quantity": item.get("quantity"),
+            "unitPrice": item.get("unitPrice"),
+            "grossAmount": to_rupees(line["gross"]),
+            "discountAmount": to_rupees(line["discount"]),
+            "taxableValue": to_rupees(line["taxable"]),
+            "gstRate": line["gstRate"],
+            "gstAmount": gst_amount,
+            "lineTotal": to_rupees(line["total"]),
+        })
+        for slab in GST_SLABS:
+            row[f"gst{slab}"] = gst_amount if line["gstRate"] == slab else None
+        yield row
+
+
+async def iter_invoice_rows(filters: dict):
+    """Walk matching invoices oldest-first in batches and yield flattened line rows."""
+    cursor = get_database()["invoices"].find(filters, batch_size=EXPORT_BATCH_SIZE).sort(
+        [("createdAt", ASCENDING), ("_id", ASCENDING)]
+    )
+    async for invoice in cursor:
+        for row in flatten_invoice(invoice):
+            yield row
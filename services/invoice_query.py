@@ -0,0 +1,75 @@
+# services/invoice_query.py
+#
+# Filtered, keyset-paginated reads over `invoices`. Every filter combination
+# is backed by a (<filter field>, createdAt, _id) index in indexes.py.
+
+from pymongo import DESCENDING
+
+from database import get_database
+from utils.pagination import encode_cursor, keyset_filter
+
+SORT = [("createdAt", DESCENDING), ("_id", DESCENDING)]
+
+# Slim row for invoice history screens; full line items are fetched per invoice.
+SUMMARY_PROJECTION = {
+    "invoiceNumber": 1,
+    "orderId": 1,
+    "invoiceType": 1,
+    "seller.userId": 1,
+    "seller.name": 1,
+    "buyer.userId": 1,
+    "buyer.name": 1,
+    "paymentMode": 1,
+    "status": 1,
+    "subTotal": 1,
+    "totalTax": 1,
+    "totalAmount": 1,
+    "invoiceDate": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+    "itemCount": {"$size": {"$ifNull": ["$items", []]}},
+}
+
+
+def build_invoice_filter(
+    seller_id: str = None,
+    buyer_id: str = None,
+    invoice_type: str = None,
+    status: str = None,
+    payment_mode: str = None,
+    date_from=None,
+    date_to=None,
+) -> dict:
+    query = {}
+    if seller_id:
+        query["seller.userId"] = seller_id
+    if buyer_id:
+        query["buyer.userId"] = buyer_id
+    if invoice_type:
+        query["invoiceType"] = invoice_type
+    if status:
+        query["status"] = status
+    if payment_mode:
+        query["paymentMode"] = payment_mode
+    if date_from or date_to:
+        query["createdAt"] = {}
+        if date_from:
+            query["createdAt"]["$gte"] = date_from
+        if date_to:
+            query["createdAt"]["$lt"] = date_to
+    return query
+
+
+async def list_invoices(filters: dict, after=None, limit: int = 50, full: bool = False):
+    db = get_database()
+    query = dict(filters)
+    if after:
+        query = {"$and": [query, keyset_filter("createdAt", *after)]} if query else keyset_filter("createdAt", *after)
+
+    projection = None if full else SUMMARY_PROJECTION
+    invoices = await db["invoices"].find(query, projection).sort(SORT).limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(invoices) > limit
+    invoices = invoices[:limit]
+    next_cursor = encode_cursor(invoices[-1].get("createdAt"), invoices[-1]["_id"]) if has_more else None
+    return invoices, next_cursor
@@ -0,0 +1,169 @@
+# services/invoice_render.py
+#
+# Printable invoices: a self-contained HTML page (inline CSS, no external
+# assets) and a plain single-font PDF written by hand, so neither needs an
+# external renderer or service.
+
+from html import escape
+
+from services.pricing import price_invoice, price_line, to_rupees
+
+CSS = """
+body{font-family:Helvetica,Arial,sans-serif;color:#222;margin:32px;font-size:13px}
+h1{font-size:20px;margin:0 0 4px}
+.muted{color:#666}
+.parties{display:flex;justify-content:space-between;margin:24px 0}
+.parties div{width:48%}
+table{width:100%;border-collapse:collapse;margin-top:12px}
+th,td{border-bottom:1px solid #ddd;padding:6px;text-align:left}
+td.num,th.num{text-align:right}
+.totals{width:40%;margin-left:auto}
+.totals td{border:none}
+.grand td{font-weight:bold;border-top:2px solid #222}
+"""
+
+
+def _money(value) -> str:
+    return f"{(value or 0):,.2f}"
+
+
+def _party(party) -> list:
+    party = party or {}
+    lines = [party.get("name"), party.get("address"), party.get("phone"), party.get("email")]
+    if party.get("gstin"):
+        lines.append(f"GSTIN: {party['gstin']}")
+    return [line for line in lines if line]
+
+
+def _summary(invoice: dict) -> dict:
+    # Stored totals are authoritative; older invoices without a breakdown are priced on the fly.
+    if "gstBreakdown" in invoice and "totalAmount" in invoice:
+        return invoice
+    return {**invoice, **price_invoice(invoice)}
+
+
+def render_html(invoice: dict) -> str:
+    summary = _summary(invoice)
+    rows = []
+    for n, item in enumerate(invoice.get("items") or [], start=1):
+        line = price_line(item)
+        rows.append(
+            "<tr>"
+            f"<td>{n}</td>"
+            f"<td>{escape(str(item.get('partName', '')))}<br><span class='muted'>{escape(str(item.get('modelNo', '')))}</span></td>"
+            f"<td class='num'>{item.get('quantity', 0)}</td>"
+            f"<td class='num'>{_money(item.get('unitPrice'))}</td>"
+            f"<td class='num'>{_money(to_rupees(line['discount']))}</td>"
+            f"<td class='num'>{line['gstRate']:g}%</td>"
+            f"<td class='num'>{_money(to_rupees(line['total']))}</td>"
+            "</tr>"
+        )
+    slabs = "".join(
+        f"<tr><td>GST {s['rate']:g}% on {_money(s['taxableValue'])}</td><td class='num'>{_money(s['gstAmount'])}</td></tr>"
+        for s in summary.get("gstBreakdown", [])
+    )
+    fees = "".join(
+        f"<tr><td>{label}</td><td class='num'>{_money(summary.get(field))}</td></tr>"
+        for field, label in (("deliveryCharge", "Delivery"), ("platformFee", "Platform fee"), ("logisticsFee", "Logistics fee"))
+        if summary.get(field)
+    )
+    seller = "<br>".join(escape(str(x)) for x in _party(invoice.get("seller")))
+    buyer = "<br>".join(escape(str(x)) for x in _party(invoice.get("buyer")))
+
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>Invoice {escape(str(invoice.get('invoiceNumber', '')))}</title>"
+        f"<style>{CSS}</style></head><body>"
+        f"<h1>Tax Invoice {escape(str(invoice.get('invoiceNumber', '')))}</h1>"
+        f"<div class='muted'>Order {escape(str(invoice.get('orderId', '')))} &middot; "
+        f"Date {escape(str(invoice.get('invoiceDate', '')))} &middot; "
+        f"Payment {escape(str(invoice.get('paymentMode', '')))} &middot; "
+        f"Status {escape(str(invoice.get('status', '')))}</div>"
+        f"<div class='parties'><div><b>Seller</b><br>{seller}</div><div><b>Buyer</b><br>{buyer}</div></div>"
+        "<table><thead><tr><th>#</th><th>Item</th><th class='num'>Qty</th><th class='num'>Rate</th>"
+        "<th class='num'>Discount</th><th class='num'>GST</th><th class='num'>Amount</th></tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody></table>"
+        "<table class='totals'>"
+        f"<tr><td>Sub-total</td><td class='num'>{_money(summary.get('subTotal'))}</td></tr>"
+        f"{slabs}{fees}"
+        f"<tr class='grand'><td>Total (INR)</td><td class='num'>{_money(summary.get('totalAmount'))}</td></tr>"
+        "</table></body></html>"
+    )
+
+
+# -------- PDF --------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 40
+LINE_HEIGHT = 14
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+
+
+def _pdf_text(text: str) -> str:
+    text = text.replace("₹", "Rs.").encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_lines(invoice: dict) -> list:
+    summary = _summary(invoice)
+    lines = [
+        f"TAX INVOICE {invoice.get('invoiceNumber', '')}",
+        f"Order {invoice.get('orderId', '')}   Date {invoice.get('invoiceDate', '')}   "
+        f"Payment {invoice.get('paymentMode', '')}   Status {invoice.get('status', '')}",
+        "",
+        "Seller: " + ", ".join(str(x) for x in _party(invoice.get("seller"))),
+        "Buyer:  " + ", ".join(str(x) for x in _party(invoice.get("buyer"))),
+        "",
+        f"{'#':<3}{'Item':<38}{'Qty':>5}{'Rate':>12}{'GST':>6}{'Amount':>14}",
+    ]
+    for n, item in enumerate(invoice.get("items") or [], start=1):
+        line = price_line(item)
+        name = f"{item.get('partName', '')} {item.get('modelNo', '')}"[:37]
+        lines.append(
+            f"{n:<3}{name:<38}{item.get('quantity', 0):>5}{_money(item.get('unitPrice')):>12}"
+            f"{line['gstRate']:>5g}%{_money(to_rupees(line['total'])):>14}"
+        )
+    lines += ["", f"{'Sub-total':<50}{_money(summary.get('subTotal')):>28}"]
+    for s in summary.get("gstBreakdown", []):
+        lines.append(f"{'GST %g%% on %s' % (s['rate'], _money(s['taxableValue'])):<50}{_money(s['gstAmount']):>28}")
+    for field, label in (("deliveryCharge", "Delivery"), ("platformFee", "Platform fee"), ("logisticsFee", "Logistics fee")):
+        if summary.get(field):
+            lines.append(f"{label:<50}{_money(summary.get(field)):>28}")
+    lines.append(f"{'TOTAL (INR)':<50}{_money(summary.get('totalAmount')):>28}")
+    return lines
+
+
+def render_pdf(invoice: dict) -> bytes:
+    lines = _text_lines(invoice)
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs.
+    objects = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"}
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_no, content_no = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_no} 0 R")
+        ops = [f"BT /F1 9 Tf {LINE_HEIGHT} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td"]
+        ops += [f"({_pdf_text(text)}) Tj T*" for text in page_lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects[content_no] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_no] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_no} 0 R >>"
+        ).encode()
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    count = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    for number in range(1, count):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref)
+    return bytes(out)
@@ -0,0 +1,185 @@
+# services/invoice_rollups.py
+#
+# Pre-aggregated invoice metrics per (day, seller, paymentMode), kept current
+# with $inc deltas on every invoice create / update / delete so the admin
+# dashboard never scans `invoices`.
+#
+# Amounts are stored as integer paise (services.pricing), so long-lived
+# counters never pick up float drift; queries convert back to rupees.
+#
+# The invoice write and its rollup delta are separate operations; if a worker
+# dies between them the rollups drift until `python manage.py
+# rebuild-invoice-rollups` is run.
+
+from pymongo import UpdateOne
+
+from database import get_database
+from services.pricing import to_paise, to_rupees
+
+ROLLUP_COLLECTION = "invoice_rollups"
+
+# Invoice fields a rollup delta depends on (used as a read projection).
+ROLLUP_FIELDS = {
+    "invoiceDate": 1,
+    "createdAt": 1,
+    "seller.userId": 1,
+    "paymentMode": 1,
+    "subTotal": 1,
+    "totalTax": 1,
+    "totalAmount": 1,
+    "platformFee": 1,
+    "deliveryCharge": 1,
+}
+
+METRICS = ("invoices", "revenue", "subTotal", "gst", "platformFees", "deliveryCharges")
+# Metrics held in paise.
+AMOUNT_METRICS = METRICS[1:]
+
+
+def rollup_day(invoice: dict) -> str:
+    invoice_date = invoice.get("invoiceDate")
+    if isinstance(invoice_date, str) and len(invoice_date) >= 10:
+        return invoice_date[:10]
+    created_at = invoice.get("createdAt")
+    return created_at.strftime("%Y-%m-%d") if created_at else ""
+
+
+def rollup_key(invoice: dict):
+    seller = invoice.get("seller") or {}
+    return rollup_day(invoice), seller.get("userId") or "", invoice.get("paymentMode") or ""
+
+
+def contribution(invoice: dict) -> dict:
+    return {
+        "invoices": 1,
+        "revenue": to_paise(invoice.get("totalAmount")),
+        "subTotal": to_paise(invoice.get("subTotal")),
+        "gst": to_paise(invoice.get("totalTax")),
+        "platformFees": to_paise(invoice.get("platformFee")),
+        "deliveryCharges": to_paise(invoice.get("deliveryCharge")),
+    }
+
+
+async def apply_invoice_changes(changes):
+    """
+    `changes` is an iterable of (before, after) invoice pairs; either side may
+    be None (create / delete). Deltas for the same rollup key are merged, then
+    written with one unordered bulk_write.
+    """
+    deltas = {}
+    for before, after in changes:
+        for invoice, sign in ((before, -1), (after, 1)):
+            if not invoice:
+                continue
+            bucket = deltas.setdefault(rollup_key(invoice), dict.fromkeys(METRICS, 0))
+            for metric, value in contribution(invoice).items():
+                bucket[metric] += sign * value
+
+    operations = []
+    for (day, seller_id, payment_mode), inc in deltas.items():
+        inc = {metric: value for metric, value in inc.items() if value}
+        if not inc:
+            continue
+        operations.append(UpdateOne(
+            {"_id": f"{day}|{seller_id}|{payment_mode}"},
+            {
+                "$inc": inc,
+                "$setOnInsert": {"day": day, "sellerId": seller_id, "paymentMode": payment_mode},
+            },
+            upsert=True,
+        ))
+    if operations:
+        await get_database()[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def apply_invoice_change(before=None, after=None):
+    await apply_invoice_changes([(before, after)])
+
+
+# -------- Rebuild --------
+
+def _paise(field: str) -> dict:
+    # Stored amounts have at most two decimals, so x100 is within float error
+    # of a whole number and $round's half-to-even never comes into play.
+    return {"$toLong": {"$round": [{"$multiply": [{"$ifNull": [field, 0]}, 100]}, 0]}}
+
+
+async def rebuild_invoice_rollups():
+    """
+    Recompute every rollup from `invoices` and atomically replace the
+    collection. Deltas applied while the rebuild runs are lost, so run it
+    when invoice writes are quiet.
+    """
+    day = {
+        "$cond": [
+            {"$and": [
+                {"$eq": [{"$type": "$invoiceDate"}, "string"]},
+                {"$gte": [{"$strLenCP": "$invoiceDate"}, 10]},
+            ]},
+            {"$substrCP": ["$invoiceDate", 0, 10]},
+            {"$ifNull": [{"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}}, ""]},
+        ]
+    }
+    pipeline = [
+        {"$project": {
+            "day": day,
+            "sellerId": {"$ifNull": ["$seller.userId", ""]},
+            "paymentMode": {"$ifNull": ["$paymentMode", ""]},
+            "totalAmount": _paise("$totalAmount"),
+            "subTotal": _paise("$subTotal"),
+            "totalTax": _paise("$totalTax"),
+            "platformFee": _paise("$platformFee"),
+            "deliveryCharge": _paise("$deliveryCharge"),
+        }},
+        {"$group": {
+            "_id": {"$concat": ["$day", "|", "$sellerId", "|", "$paymentMode"]},
+            "day": {"$first": "$day"},
+            "sellerId": {"$first": "$sellerId"},
+            "paymentMode": {"$first": "$paymentMode"},
+            "invoices": {"$sum": 1},
+            "revenue": {"$sum": "$totalAmount"},
+            "subTotal": {"$sum": "$subTotal"},
+            "gst": {"$sum": "$totalTax"},
+            "platformFees": {"$sum": "$platformFee"},
+            "deliveryCharges": {"$sum": "$deliveryCharge"},
+        }},
+        {"$out": ROLLUP_COLLECTION},
+    ]
+    db = get_database()
+    await db["invoices"].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    return {"rollups": await db[ROLLUP_COLLECTION].estimated_document_count()}
+
+
+# -------- Queries --------
+
+GROUPINGS = {
+    "day": "$day",
+    "seller": "$sellerId",
+    "paymentMode": "$paymentMode",
+}
+
+
+async def query_rollups(date_from: str, date_to: str, seller_id: str = None, payment_mode: str = None, group_by: str = "day"):
+    """Aggregate rollup rows (never raw invoices) for an inclusive day range."""
+    match = {"day": {"$gte": date_from, "$lte": date_to}}
+    if seller_id:
+        match["sellerId"] = seller_id
+    if payment_mode:
+        match["paymentMode"] = payment_mode
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": GROUPINGS[group_by], **{m: {"$sum": f"${m}"} for m in METRICS}}},
+        {"$sort": {"_id": 1}},
+    ]
+    rows = await get_database()[ROLLUP_COLLECTION].aggregate(pipeline).to_list(length=None)
+    totals = dict.fromkeys(METRICS, 0)
+    for row in rows:
+        row[group_by] = row.pop("_id")
+        for m in METRICS:
+            totals[m] += row[m]
+        for m in AMOUNT_METRICS:
+            row[m] = to_rupees(row[m])
+    for m in AMOUNT_METRICS:
+        totals[m] = to_rupees(totals[m])
+    return {"rows": rows, "totals": totals}
@@ -0,0 +1,29 @@
+# services/invoice_service.py
+#
+# Invoice document construction, shared by the invoice API and the order
+# pipeline's generate_invoice job.
+
+from datetime import datetime
+
+from services.pricing import price_invoice
+
+
+def invoice_prefix(invoice_type: str) -> str:
+    return f"QIK-{'INV' if invoice_type == 'customer' else 'REV'}"
+
+
+def build_invoice_document(data: dict, invoice_id: str, order_id: str, totals: dict = None) -> dict:
+    # Totals come from the pricing engine; bulk callers price the whole batch up front
+    data.update(totals or price_invoice(data))
+
+    # Final document
+    now = datetime.utcnow()
+    data.update({
+        "invoiceNumber": invoice_id,
+        "orderId": order_id,
+        "status": "paid",
+        "version": 1,
+        "createdAt": now,
+        "updatedAt": now
+    })
+    return data
@@ -0,0 +1,270 @@
+# services/job_queue.py
+#
+# Durable background jobs stored in Mongo (`jobs`), drained by async workers
+# running inside every API process.
+#
+#   {_id, type, payload, key, status, attempts, max_attempts, run_at,
+#    lease, worker, last_error, errors: [...], createdAt, updatedAt, finishedAt}
+#
+# status: queued -> running -> done, or back to queued with a backoff after a
+# failure, or dead once the retry budget is spent (dead letters stay in the
+# collection until retried from the admin API).
+#
+# Leasing: a worker claims a job with one find_one_and_update that flips it
+# to running and pushes run_at out by JOB_LEASE_SECONDS, so run_at doubles as
+# the lease expiry. A job whose worker died is claimable again once its lease
+# runs out; handlers therefore must be idempotent. Each claim carries a fresh
+# lease token and only the holder of the current token can finish the job.
+#
+# Enqueueing with a `key` is idempotent (unique index), which lets callers
+# enqueue before or after their own write without creating duplicates.
+
+import asyncio
+import datetime
+import os
+import random
+import socket
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config import (
+    JOB_BACKOFF_BASE_SECONDS,
+    JOB_BACKOFF_MAX_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_SECONDS,
+    JOB_WORKERS,
+)
+from database import get_database
+
+JOBS_COLLECTION = "jobs"
+# Recent failures kept on the job document for debugging.
+MAX_ERRORS_KEPT = 5
+# Handlers are stopped this long before their lease runs out, so a job is
+# never running on two workers at once.
+LEASE_MARGIN_SECONDS = min(5.0, JOB_LEASE_SECONDS / 10)
+
+HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying can't help; the job is dead-lettered at once."""
+
+
+def job(name: str, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Register an async handler `handler(payload)` for jobs of type `name`."""
+    def register(handler):
+        HANDLERS[name] = (handler, max_attempts)
+        return handler
+    return register
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter: ~base, 2x base, 4x base ... capped."""
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+# -------- Enqueue --------
+
+_wakeup = asyncio.Event()
+
+
+def _job_document(job_type: str, payload: dict, key: str = None, run_at=None) -> dict:
+    if job_type not in HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    now = datetime.datetime.utcnow()
+    doc = {
+        "_id": ObjectId(),
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": HANDLERS[job_type][1],
+        "run_at": run_at or now,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    if key:
+        doc["key"] = key
+    return doc
+
+
+async def enqueue(job_type: str, payload: dict, key: str = None, run_at=None):
+    """Queue one job; returns its id, or None if a job with `key` already exists."""
+    doc = _job_document(job_type, payload, key, run_at)
+    try:
+        await get_database()[JOBS_COLLECTION].insert_one(doc)
+    except DuplicateKeyError:
+        return None
+    _wakeup.set()
+    return doc["_id"]
+
+
+async def enqueue_many(jobs) -> int:
+    """jobs: (type, payload, key) tuples, written in one round trip. Returns how many were new."""
+    docs = [_job_document(job_type, payload, key) for job_type, payload, key in jobs]
+    if not docs:
+        return 0
+    try:
+        result = await get_database()[JOBS_COLLECTION].insert_many(docs, ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        inserted = e.details.get("nInserted", 0)
+    _wakeup.set()
+    return inserted
+
+
+# -------- Leasing and completion --------
+
+async def _lease(worker: str):
+    now = datetime.datetime.utcnow()
+    return await get_database()[JOBS_COLLECTION].find_one_and_update(
+        {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": now}, "type": {"$in": list(HANDLERS)}},
+        {
+            "$set": {
+                "status": "running",
+                "run_at": now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+                "lease": ObjectId(),
+                "worker": worker,
+                "updatedAt": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _finish(leased: dict, update: dict) -> bool:
+    update.setdefault("$set", {})["updatedAt"] = datetime.datetime.utcnow()
+    result = await get_database()[JOBS_COLLECTION].update_one(
+        {"_id": leased["_id"], "lease": leased["lease"]}, update
+    )
+    # False means the lease expired and someone else owns the job now.
+    return result.modified_count == 1
+
+
+async def _complete(leased: dict):
+    now = datetime.datetime.utcnow()
+    await _finish(leased, {"$set": {"status": "done", "finishedAt": now}, "$unset": {"lease": ""}})
+
+
+async def _fail(leased: dict, error: str, permanent: bool = False):
+    now = datetime.datetime.utcnow()
+    entry = {"attempt": leased["attempts"], "error": error[:500], "at": now}
+    if permanent or leased["attempts"] >= leased["max_attempts"]:
+        fields = {"status": "dead", "finishedAt": now, "last_error": entry["error"]}
+    else:
+        retry_at = now + datetime.timedelta(seconds=backoff_seconds(leased["attempts"]))
+        fields = {"status": "queued", "run_at": retry_at, "last_error": entry["error"]}
+    await _finish(leased, {
+        "$set": fields,
+        "$unset": {"lease": ""},
+        "$push": {"errors": {"$each": [entry], "$slice": -MAX_ERRORS_KEPT}},
+    })
+
+
+async def run_one(worker: str = "manual") -> bool:
+    """Lease and run a single due job. Returns False when nothing was due."""
+    leased = await _lease(worker)
+    if leased is None:
+        return False
+    if leased["attempts"] > leased["max_attempts"]:
+        # The final attempt's lease ran out (worker crash or timeout).
+        await _fail(leased, "Lease expired on the final attempt", permanent=True)
+        return True
+    handler, _ = HANDLERS[leased["type"]]
+    # A handler may not outlive its lease, or a second worker could pick the job up.
+    # The lease clock started before the claim's round trip, so budget from run_at.
+    budget = (leased["run_at"] - datetime.datetime.utcnow()).total_seconds() - LEASE_MARGIN_SECONDS
+    if budget <= 0:
+        await _fail(leased, "Lease ran out before the handler started")
+        return True
+    try:
+        await asyncio.wait_for(handler(leased["payload"]), timeout=budget)
+    except PermanentJobError as e:
+        await _fail(leased, str(e) or type(e).__name__, permanent=True)
+    except asyncio.TimeoutError:
+        await _fail(leased, f"Timed out after {budget:.1f}s")
+    except Exception as e:
+        await _fail(leased, f"{type(e).__name__}: {e}")
+    else:
+        await _complete(leased)
+    return True
+
+
+# -------- Workers --------
+
+_workers = []
+
+
+async def _work_forever(worker: str):
+    while True:
+        try:
+            if await run_one(worker):
+                continue
+        except Exception as e:
+            print(f"⚠️ Job worker {worker} failed to lease: {e}")
+        # Idle: sleep until the poll interval passes or this process enqueues something.
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_job_workers(count: int = JOB_WORKERS):
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for n in range(count):
+        _workers.append(asyncio.create_task(_work_forever(f"{prefix}:{n}")))
+
+
+async def stop_job_workers():
+    for task in _workers:
+        task.cancel()
+    _workers.clear()
+
+
+# -------- Admin --------
+
+async def queue_stats() -> dict:
+    rows = await get_database()[JOBS_COLLECTION].aggregate([
+        {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+    stats = {}
+    for row in rows:
+        stats.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+    return {"jobs": stats, "workers": len(_workers)}
+
+
+async def list_dead(job_type: str = None, limit: int = 50) -> list:
+    query = {"status": "dead"}
+    if job_type:
+        query["type"] = job_type
+    return await get_database()[JOBS_COLLECTION].find(query).sort(
+        [("finishedAt", DESCENDING)]
+    ).limit(limit).to_list(length=limit)
+
+
+async def retry_dead(job_id) -> bool:
+    """Give a dead-lettered job a fresh retry budget and queue it now."""
+    now = datetime.datetime.utcnow()
+    result = await get_database()[JOBS_COLLECTION].update_one(
+        {"_id": job_id, "status": "dead"},
+        {"$set": {"status": "queued", "attempts": 0, "run_at": now, "updatedAt": now}, "$unset": {"finishedAt": ""}},
+    )
+    if result.modified_count:
+        _wakeup.set()
+    return result.modified_count == 1
+
+
+async def discard(keys) -> int:
+    """Drop still-queued jobs by key (their triggering write was abandoned)."""
+    result = await get_database()[JOBS_COLLECTION].delete_many({"key": {"$in": list(keys)}, "status": "queued"})
+    return result.deleted_count
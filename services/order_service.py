@@ -0,0 +1,382 @@
+# services/order_service.py
+#
+# Order placement. POST /orders does only the synchronous minimum: validate
+# the buyer, vendor, parts and delivery pincode, reserve stock, queue the
+# follow-up jobs and persist the order as PENDING. Everything downstream runs
+# on the job queue (services/job_queue.py), so placement latency does not
+# depend on it:
+#
+#   notify_vendor     new-order notification in the vendor's inbox
+#   generate_invoice  PENDING -> CONFIRMED, commit the stock reservations,
+#                     write the customer invoice (orderId = the order number)
+#   assign_delivery   nearest delivery partner to the vendor (pickup point)
+#
+# Jobs are queued just before the order is written, keyed per order, so an
+# order can never exist without its jobs; a job that runs before the order
+# lands fails and retries. Handlers are idempotent because an expired lease
+# can run a job twice.
+
+import asyncio
+import datetime
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import DELIVERY_ASSIGN_RADIUS_KM, ORDER_MAX_ITEMS, ORDER_RESERVATION_SECONDS
+from database import get_database
+from models.invoice_model import InvoiceCreate
+from services import job_queue
+from services.geo import geo_point
+from services.inventory_service import PARTS_COLLECTION
+from services.invoice_rollups import apply_invoice_change
+from services.invoice_service import build_invoice_document, invoice_prefix
+from services.job_queue import PermanentJobError, job
+from services.pincodes import PincodeError, normalize_address
+from services.pricing import price_invoice
+from services.stock_service import (
+    InsufficientStock,
+    ReservationClosed,
+    ReservationExpired,
+    ReservationNotFound,
+    adjust_stock,
+    commit_reservation,
+    release_reservation,
+    reserve_stock,
+)
+from services.user_directory import get_user_by_id, to_object_id
+from utils.id_generator import generate_id
+
+ORDERS_COLLECTION = "orders"
+NOTIFICATIONS_COLLECTION = "notifications"
+ORDER_JOBS = ("notify_vendor", "generate_invoice", "assign_delivery")
+
+PARTY_PROJECTION = {
+    "full_name": 1, "garage_name": 1, "business_name": 1, "phone": 1,
+    "email": 1, "gstin": 1, "location": 1, "geo": 1,
+}
+PART_PROJECTION = {"sku": 1, "partName": 1, "modelNo": 1, "category": 1, "unitPrice": 1, "gst": 1}
+
+
+class OrderError(ValueError):
+    pass
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class OrderOutOfStock(Exception):
+    def __init__(self, skus):
+        super().__init__(", ".join(skus))
+        self.skus = skus
+
+
+class OrderStateError(Exception):
+    """The order's current status doesn't allow the change."""
+
+
+def _format_address(location) -> str:
+    location = location or {}
+    return ", ".join(str(location[f]) for f in ("addressLine", "city", "state", "pincode") if location.get(f))
+
+
+def _party(user_id, user: dict, name_field: str, address) -> dict:
+    """Snapshot in the shape of an invoice PartyInfo, frozen at order time."""
+    return {
+        "userId": str(user_id),
+        "name": user.get(name_field) or user.get("full_name") or "",
+        "address": _format_address(address),
+        "phone": user.get("phone") or "",
+        "email": user.get("email") or "",
+        "gstin": user.get("gstin") or "",
+    }
+
+
+def _merge_items(items) -> dict:
+    """sku -> total quantity, keeping first-seen order."""
+    merged = {}
+    for item in items:
+        merged[item["sku"]] = merged.get(item["sku"], 0) + item["quantity"]
+    return merged
+
+
+async def _release(reservation_ids):
+    for rid in reservation_ids:
+        try:
+            await release_reservation(rid)
+        except (ReservationNotFound, ReservationClosed, ReservationExpired):
+            pass
+
+
+# -------- Placement --------
+
+async def place_order(buyer_id: str, payload: dict) -> dict:
+    items = _merge_items(payload["items"])
+    if len(items) > ORDER_MAX_ITEMS:
+        raise OrderError(f"At most {ORDER_MAX_ITEMS} distinct parts per order")
+    try:
+        address = normalize_address(payload["deliveryAddress"])
+    except PincodeError as e:
+        raise OrderError(str(e))
+    # Only an explicit flag blocks the order; pincodes the table doesn't know are None.
+    if address.get("serviceable") is False:
+        raise OrderError("Delivery is not available at this pincode")
+    vendor_oid = to_object_id(payload["vendorId"])
+    if vendor_oid is None:
+        raise OrderError("Unknown vendor")
+
+    db = get_database()
+    (buyer, _), vendor, parts = await asyncio.gather(
+        get_user_by_id(buyer_id, PARTY_PROJECTION),
+        db["vendor_users"].find_one({"_id": vendor_oid}, PARTY_PROJECTION),
+        db[PARTS_COLLECTION].find(
+            {"sku": {"$in": list(items)}, "deleted": {"$ne": True}}, PART_PROJECTION
+        ).to_list(length=None),
+    )
+    if buyer is None:
+        raise OrderError("Unknown buyer")
+    if vendor is None:
+        raise OrderError("Unknown vendor")
+    parts = {part["sku"]: part for part in parts}
+    unknown = [sku for sku in items if sku not in parts]
+    if unknown:
+        raise OrderError(f"Unknown SKUs: {', '.join(unknown)}")
+
+    lines = [
+        {
+            "sku": sku,
+            "partName": parts[sku]["partName"],
+            "modelNo": parts[sku].get("modelNo") or "",
+            "category": parts[sku].get("category") or "",
+            "unitPrice": parts[sku]["unitPrice"],
+            "gst": parts[sku].get("gst", 18.0),
+            "quantity": quantity,
+            "discountAmount": 0.0,
+            "discountPercent": 0.0,
+        }
+        for sku, quantity in items.items()
+    ]
+
+    order_id = ObjectId()
+    vendor_id = str(vendor_oid)
+    order_number, *reserved = await asyncio.gather(
+        generate_id("order", "ORDER"),
+        *(
+            reserve_stock(
+                vendor_id, sku, quantity,
+                ttl_seconds=ORDER_RESERVATION_SECONDS, ref=str(order_id), reserved_by=buyer_id,
+            )
+            for sku, quantity in items.items()
+        ),
+        return_exceptions=True,
+    )
+    reservations = [r["_id"] for r in reserved if isinstance(r, dict)]
+    errors = [e for e in (order_number, *reserved) if isinstance(e, BaseException)]
+    if errors:
+        await _release(reservations)
+        short = [sku for sku, r in zip(items, reserved) if isinstance(r, InsufficientStock)]
+        if len(short) == len(errors):
+            raise OrderOutOfStock(short)
+        raise errors[0]
+
+    now = datetime.datetime.utcnow()
+    order = {
+        "_id": order_id,
+        "orderNumber": order_number,
+        "status": "PENDING",
+        "buyerId": buyer_id,
+        "vendorId": vendor_id,
+        "buyer": _party(buyer_id, buyer, "garage_name", address),
+        "seller": _party(vendor_id, vendor, "business_name", vendor.get("location")),
+        "items": lines,
+        "deliveryAddress": address,
+        "pickup": vendor.get("geo"),
+        "paymentMode": payload.get("paymentMode") or "cod",
+        "notes": payload.get("notes"),
+        "reservations": reservations,
+        **{k: v for k, v in price_invoice({"items": lines}).items() if k in ("subTotal", "totalTax", "totalAmount")},
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    keys = [f"{job_type}:{order_id}" for job_type in ORDER_JOBS]
+    try:
+        await job_queue.enqueue_many(
+            (job_type, {"orderId": str(order_id)}, key) for job_type, key in zip(ORDER_JOBS, keys)
+        )
+        await db[ORDERS_COLLECTION].insert_one(order)
+    except Exception:
+        await job_queue.discard(keys)
+        await _release(reservations)
+        raise
+    return order
+
+
+async def get_order(order_id) -> dict:
+    oid = to_object_id(order_id)
+    order = await get_database()[ORDERS_COLLECTION].find_one({"_id": oid}) if oid else None
+    if order is None:
+        raise OrderNotFound(str(order_id))
+    return order
+
+
+async def cancel_order(order_id, cancelled_by: str, reason: str = None) -> dict:
+    """Cancel a PENDING order and return its stock. Confirmed orders can't be cancelled here."""
+    now = datetime.datetime.utcnow()
+    order = await get_database()[ORDERS_COLLECTION].find_one_and_update(
+        {"_id": to_object_id(order_id), "status": "PENDING"},
+        {"$set": {
+            "status": "CANCELLED",
+            "cancelledAt": now,
+            "cancelledBy": cancelled_by,
+            "cancelReason": reason,
+            "updatedAt": now,
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    if order is None:
+        current = await get_order(order_id)
+        if current["status"] == "CANCELLED":
+            return current
+        raise OrderStateError(current["status"])
+    await _release(order["reservations"])
+    return order
+
+
+# -------- Jobs --------
+
+async def _load(payload: dict) -> dict:
+    # Missing means the order write hasn't landed yet (jobs are queued first); the job retries.
+    return await get_order(payload["orderId"])
+
+
+@job("notify_vendor")
+async def notify_vendor(payload: dict):
+    order = await _load(payload)
+    if order["status"] == "CANCELLED":
+        return
+    db = get_database()
+    now = datetime.datetime.utcnow()
+    await db[NOTIFICATIONS_COLLECTION].update_one(
+        {"_id": f"new_order:{order['_id']}"},
+        {"$setOnInsert": {
+            "userId": order["vendorId"],
+            "type": "new_order",
+            "orderId": str(order["_id"]),
+            "orderNumber": order["orderNumber"],
+            "items": len(order["items"]),
+            "totalAmount": order.get("totalAmount"),
+            "read": False,
+            "createdAt": now,
+        }},
+        upsert=True,
+    )
+    await db[ORDERS_COLLECTION].update_one(
+        {"_id": order["_id"], "vendorNotifiedAt": None},
+        {"$set": {"vendorNotifiedAt": now}},
+    )
+
+
+async def _commit_stock(order: dict):
+    """Commit every reservation; if one can't be, put already-committed units back and give up."""
+    committed = []
+    for rid in order["reservations"]:
+        try:
+            committed.append(await commit_reservation(rid))
+        except (ReservationExpired, ReservationClosed, ReservationNotFound) as e:
+            for reservation in committed:
+                await adjust_stock(reservation["vendorId"], reservation["sku"], reservation["quantity"])
+            await _release(order["reservations"])
+            now = datetime.datetime.utcnow()
+            await get_database()[ORDERS_COLLECTION].update_one(
+                {"_id": order["_id"]},
+                {"$set": {"status": "CANCELLED", "cancelledAt": now, "cancelReason": "Stock hold lapsed before confirmation", "updatedAt": now}},
+            )
+            raise PermanentJobError(f"Reservation {rid} could not be committed: {type(e).__name__}")
+
+
+@job("generate_invoice")
+async def generate_invoice(payload: dict):
+    order = await _load(payload)
+    db = get_database()
+    if order["status"] == "PENDING":
+        now = datetime.datetime.utcnow()
+        # Claiming the order first closes the window for a concurrent cancel.
+        order = await db[ORDERS_COLLECTION].find_one_and_update(
+            {"_id": order["_id"], "status": "PENDING"},
+            {"$set": {"status": "CONFIRMED", "confirmedAt": now, "updatedAt": now}},
+            return_document=ReturnDocument.AFTER,
+        ) or await _load(payload)
+    if order["status"] != "CONFIRMED":
+        return
+    if not order.get("stockCommittedAt"):
+        await _commit_stock(order)
+        await db[ORDERS_COLLECTION].update_one(
+            {"_id": order["_id"]}, {"$set": {"stockCommittedAt": datetime.datetime.utcnow()}}
+        )
+
+    # The invoice shares the order's _id, so a repeated run can't write a second one.
+    invoice = await db["invoices"].find_one({"_id": order["_id"]}, {"invoiceNumber": 1})
+    if invoice is None:
+        data = InvoiceCreate(
+            invoiceType="customer",
+            buyer=order["buyer"],
+            seller=order["seller"],
+            items=order["items"],
+            paymentMode=order["paymentMode"],
+            invoiceDate=order["createdAt"].date().isoformat(),
+        ).dict()
+        invoice = build_invoice_document(
+            data, await generate_id("invoice", invoice_prefix("customer")), order["orderNumber"]
+        )
+        invoice["_id"] = order["_id"]
+        try:
+            await db["invoices"].insert_one(invoice)
+        except DuplicateKeyError:
+            invoice = await db["invoices"].find_one({"_id": order["_id"]}, {"invoiceNumber": 1})
+        else:
+            await apply_invoice_change(after=invoice)
+    await db[ORDERS_COLLECTION].update_one(
+        {"_id": order["_id"]},
+        {"$set": {"invoiceId": str(order["_id"]), "invoiceNumber": invoice["invoiceNumber"]}},
+    )
+
+
+@job("assign_delivery")
+async def assign_delivery(payload: dict):
+    order = await _load(payload)
+    if order["status"] == "CANCELLED" or order.get("deliveryPartnerId"):
+        return
+    point = order.get("pickup") or geo_point(order.get("deliveryAddress"))
+    if point is None:
+        raise PermanentJobError("Order has neither pickup nor delivery coordinates")
+    partners = await get_database()["delivery_users"].aggregate([
+        {"$geoNear": {
+            "near": point,
+            "key": "geo",
+            "distanceField": "distance_m",
+            "maxDistance": DELIVERY_ASSIGN_RADIUS_KM * 1000,
+            "spherical": True,
+        }},
+        {"$limit": 1},
+        {"$project": {"full_name": 1, "phone": 1, "vehicle_type": 1, "distance_m": 1}},
+    ]).to_list(length=1)
+    if not partners:
+        # Retried with backoff; dead-lettered if nobody turns up within the retry budget.
+        raise LookupError(f"No delivery partner within {DELIVERY_ASSIGN_RADIUS_KM:g} km")
+    partner = partners[0]
+    now = datetime.datetime.utcnow()
+    await get_database()[ORDERS_COLLECTION].update_one(
+        {"_id": order["_id"], "deliveryPartnerId": None},
+        {"$set": {
+            "deliveryPartnerId": str(partner["_id"]),
+            "delivery": {
+                "name": partner.get("full_name"),
+                "phone": partner.get("phone"),
+                "vehicleType": partner.get("vehicle_type"),
+                "distanceKm": round(partner["distance_m"] / 1000, 2),
+                "assignedAt": now,
+            },
+            "updatedAt": now,
+        }},
+    )
@@ -0,0 +1,265 @@
+# services/otp_provider.py
+#
+# OTP delivery/verification behind one long-lived, pooled HTTP client.
+# The active provider is chosen by OTP_PROVIDER ("2factor" or "stub").
+
+import asyncio
+import time
+
+import httpx
+
+from config import (
+    OTP_PROVIDER,
+    TWOFACTOR_API_KEY,
+    OTP_TEMPLATE_NAME,
+    OTP_TIMEOUT_SECONDS,
+    OTP_CONNECT_TIMEOUT_SECONDS,
+    OTP_MAX_IN_FLIGHT,
+    OTP_QUEUE_TIMEOUT_SECONDS,
+    OTP_BREAKER_FAILURES,
+    OTP_BREAKER_RESET_SECONDS,
+    OTP_COALESCE_SECONDS,
+    OTP_STUB_CODE,
+    OTP_STUB_LATENCY_MS,
+)
+
+
+class OtpProviderError(Exception):
+    """The provider answered, but not with something we can use."""
+
+
+class OtpProviderUnavailable(OtpProviderError):
+    """The provider could not be reached (circuit open, timeout, overload)."""
+
+
+# -------- Circuit Breaker --------
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        # Half-open lets a single probe through; its outcome closes or re-opens the circuit.
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def release_probe(self):
+        """The call ended without a verdict (queue timeout, cancellation); let another probe in."""
+        self.probing = False
+
+
+# -------- Providers --------
+
+class TwoFactorProvider:
+    name = "2factor"
+
+    def __init__(
+        self,
+        api_key: str,
+        template: str,
+        timeout: float,
+        connect_timeout: float,
+        max_in_flight: int,
+        breaker: CircuitBreaker,
+        queue_timeout: float = OTP_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.template = template
+        self.base_url = f"https://2factor.in/API/V1/{api_key}/SMS"
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        self.breaker = breaker
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self.queue_timeout = queue_timeout
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def _call(self, path: str) -> dict:
+        if not self.breaker.allow():
+            raise OtpProviderUnavailable("OTP gateway circuit is open")
+        probe = self.breaker.probing
+        try:
+            return await self._request(path)
+        finally:
+            if probe and self.breaker.probing:
+                self.breaker.release_probe()
+
+    async def _request(self, path: str) -> dict:
+        # Wait a bounded time for a slot; a backed-up gateway shouldn't pile up requests.
+        try:
+            await asyncio.wait_for(self._in_flight.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OtpProviderUnavailable("OTP gateway is overloaded")
+        try:
+            response = await self._get_client().get(path)
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            raise OtpProviderUnavailable(f"OTP gateway unreachable: {e.__class__.__name__}")
+        finally:
+            self._in_flight.release()
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise OtpProviderUnavailable(f"OTP gateway returned {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError:
+            self.breaker.record_failure()
+            raise OtpProviderError("OTP gateway returned a non-JSON response")
+
+        self.breaker.record_success()
+        if not isinstance(data, dict):
+            raise OtpProviderError("OTP gateway returned an unexpected payload")
+        return data
+
+    async def send_otp(self, phone: str) -> str:
+        data = await self._call(f"/{phone}/AUTOGEN/{self.template}")
+        if data.get("Status") != "Success":
+            raise OtpProviderError("Failed to send OTP: " + str(data.get("Details", "Unknown error")))
+        return data.get("Details")
+
+    async def verify_otp(self, phone: str, otp: str) -> bool:
+        data = await self._call(f"/VERIFY3/{phone}/{otp}")
+        return data.get("Status") == "Success"
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubOtpProvider:
+    """In-process provider for local development and offline load tests."""
+
+    name = "stub"
+
+    def __init__(self, code: str, latency_ms: int = 0):
+        self.code = code
+        self.latency = latency_ms / 1000
+        self.sent = {}
+
+    async def send_otp(self, phone: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        session_id = f"stub-{phone}-{int(time.time())}"
+        self.sent[phone] = session_id
+        return session_id
+
+    async def verify_otp(self, phone: str, otp: str) -> bool:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return otp == self.code
+
+    async def close(self):
+        self.sent.clear()
+
+
+# -------- Service --------
+
+class OtpService:
+    """
+    Front door for OTP calls. Repeated send requests for the same phone inside
+    `coalesce_window` seconds share one gateway call instead of sending a new SMS.
+    """
+
+    def __init__(self, provider, coalesce_window: float):
+        self.provider = provider
+        self.coalesce_window = coalesce_window
+        self._pending = {}
+
+    def _prune(self, now: float):
+        expired = [p for p, (started, _) in self._pending.items() if now - started >= self.coalesce_window]
+        for phone in expired:
+            del self._pending[phone]
+
+    async def send_otp(self, phone: str) -> str:
+        now = time.monotonic()
+        entry = self._pending.get(phone)
+        if entry and now - entry[0] < self.coalesce_window:
+            return await asyncio.shield(entry[1])
+
+        if len(self._pending) > 1000:
+            self._prune(now)
+        task = asyncio.ensure_future(self.provider.send_otp(phone))
+        self._pending[phone] = (now, task)
+
+        def forget_failed(t):
+            # Failed sends must not be replayed to later callers.
+            if (t.cancelled() or t.exception()) and self._pending.get(phone, (None, None))[1] is t:
+                del self._pending[phone]
+
+        task.add_done_callback(forget_failed)
+        return await asyncio.shield(task)
+
+    async def verify_otp(self, phone: str, otp: str) -> bool:
+        verified = await self.provider.verify_otp(phone, otp)
+        if verified:
+            self._pending.pop(phone, None)
+        return verified
+
+    async def close(self):
+        self._pending.clear()
+        await self.provider.close()
+
+
+def build_provider(name: str = OTP_PROVIDER):
+    if name == "stub":
+        return StubOtpProvider(OTP_STUB_CODE, OTP_STUB_LATENCY_MS)
+    if name == "2factor":
+        return TwoFactorProvider(
+            api_key=TWOFACTOR_API_KEY,
+            template=OTP_TEMPLATE_NAME,
+            timeout=OTP_TIMEOUT_SECONDS,
+            connect_timeout=OTP_CONNECT_TIMEOUT_SECONDS,
+            max_in_flight=OTP_MAX_IN_FLIGHT,
+            breaker=CircuitBreaker(OTP_BREAKER_FAILURES, OTP_BREAKER_RESET_SECONDS),
+        )
+    raise ValueError(f"Unknown OTP provider: {name}")
+
+
+_service = None
+
+
+def get_otp_service() -> OtpService:
+    global _service
+    if _service is None:
+        _service = OtpService(build_provider(), OTP_COALESCE_SECONDS)
+    return _service
+
+
+async def close_otp_service():
+    global _service
+    if _service is not None:
+        await _service.close()
+        _service = None
@@ -0,0 +1,277 @@
+# services/pincodes.py
+#
+# Pincode table for address normalization and serviceability, served from a
+# bundled binary file (data/pincodes.bin) with no external calls.
+#
+# The file is a set of parallel little-endian columns, loaded straight into
+# `array` objects (a few bytes per pincode rather than a dict per row):
+#
+#   header   "QPIN", version (u16), count (u32)
+#   pincode  u32 x count, ascending (lookups bisect this column)
+#   lat, lng f32 x count
+#   city     u16 x count, index into the city string table
+#   state    u16 x count, index into the state string table
+#   flags    u8  x count, bit 0 = serviceable
+#   by_lat   u32 x count, row numbers ordered by latitude (radius queries)
+#   cities, states   u32 byte length + newline-joined UTF-8
+#
+# Rebuild it with `python manage.py build-pincodes`. Workers notice a new
+# file by mtime (checked at most every PINCODE_RELOAD_SECONDS) and swap the
+# table in without a restart.
+
+import csv
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from config import PINCODE_FILE, PINCODE_RELOAD_SECONDS
+
+MAGIC = b"QPIN"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")
+_LENGTH = struct.Struct("<I")
+SERVICEABLE = 1
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+class PincodeError(ValueError):
+    pass
+
+
+def parse_pincode(value) -> int:
+    """Indian pincodes are six digits with a non-zero first digit."""
+    text = str(value).strip() if value is not None else ""
+    if len(text) != 6 or not text.isdigit() or text[0] == "0":
+        raise PincodeError(f"Invalid pincode: {value!r}")
+    return int(text)
+
+
+def _column(typecode: str, values=()) -> array:
+    column = array(typecode, values)
+    # Typecode sizes are platform-defined; the file format is not.
+    expected = {"I": 4, "f": 4, "H": 2, "B": 1}[typecode]
+    if column.itemsize != expected:
+        raise RuntimeError(f"array('{typecode}') is {column.itemsize} bytes on this platform, expected {expected}")
+    return column
+
+
+def _to_le(column: array) -> bytes:
+    if sys.byteorder == "big" and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_le(typecode: str, data: memoryview, offset: int, count: int):
+    column = _column(typecode)
+    size = column.itemsize * count
+    column.frombytes(data[offset:offset + size])
+    if sys.byteorder == "big" and column.itemsize > 1:
+        column.byteswap()
+    return column, offset + size
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat, dlng = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class PincodeTable:
+    def __init__(self, pincodes, lats, lngs, cities, states, flags, by_lat, city_names, state_names, mtime=None):
+        self.pincodes = pincodes
+        self.lats = lats
+        self.lngs = lngs
+        self.cities = cities
+        self.states = states
+        self.flags = flags
+        self.by_lat = by_lat
+        self.city_names = city_names
+        self.state_names = state_names
+        self.sorted_lats = _column("f", (lats[row] for row in by_lat))
+        self.mtime = mtime
+
+    def __len__(self):
+        return len(self.pincodes)
+
+    # -------- File format --------
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, mtime=None) -> "PincodeTable":
+        data = memoryview(raw)
+        magic, version, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise PincodeError("Not a pincode table (bad magic or version)")
+        offset = _HEADER.size
+        pincodes, offset = _from_le("I", data, offset, count)
+        lats, offset = _from_le("f", data, offset, count)
+        lngs, offset = _from_le("f", data, offset, count)
+        cities, offset = _from_le("H", data, offset, count)
+        states, offset = _from_le("H", data, offset, count)
+        flags, offset = _from_le("B", data, offset, count)
+        by_lat, offset = _from_le("I", data, offset, count)
+        names = []
+        for _ in range(2):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            blob = bytes(data[offset:offset + length]).decode("utf-8")
+            names.append(blob.split("\n") if blob else [])
+            offset += length
+        return cls(pincodes, lats, lngs, cities, states, flags, by_lat, names[0], names[1], mtime)
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(MAGIC, VERSION, len(self))]
+        for column in (self.pincodes, self.lats, self.lngs, self.cities, self.states, self.flags, self.by_lat):
+            parts.append(_to_le(column))
+        for names in (self.city_names, self.state_names):
+            blob = "\n".join(names).encode("utf-8")
+            parts.append(_LENGTH.pack(len(blob)))
+            parts.append(blob)
+        return b"".join(parts)
+
+    @classmethod
+    def from_rows(cls, rows) -> "PincodeTable":
+        """rows: iterables of (pincode, city, state, lat, lng, serviceable)."""
+        records = {}
+        for pincode, city, state, lat, lng, serviceable in rows:
+            records[parse_pincode(pincode)] = (city.strip(), state.strip(), float(lat), float(lng), bool(serviceable))
+        city_ids, state_ids = {}, {}
+        pincodes, lats, lngs = _column("I"), _column("f"), _column("f")
+        cities, states, flags = _column("H"), _column("H"), _column("B")
+        for pincode in sorted(records):
+            city, state, lat, lng, serviceable = records[pincode]
+            pincodes.append(pincode)
+            lats.append(lat)
+            lngs.append(lng)
+            cities.append(city_ids.setdefault(city, len(city_ids)))
+            states.append(state_ids.setdefault(state, len(state_ids)))
+            flags.append(SERVICEABLE if serviceable else 0)
+        by_lat = _column("I", sorted(range(len(pincodes)), key=lats.__getitem__))
+        return cls(pincodes, lats, lngs, cities, states, flags, by_lat, list(city_ids), list(state_ids))
+
+    # -------- Queries --------
+
+    def _row(self, pincode: int):
+        row = bisect_left(self.pincodes, pincode)
+        if row < len(self.pincodes) and self.pincodes[row] == pincode:
+            return row
+        return None
+
+    def _record(self, row: int) -> dict:
+        return {
+            "pincode": str(self.pincodes[row]),
+            "city": self.city_names[self.cities[row]],
+            "state": self.state_names[self.states[row]],
+            "lat": round(self.lats[row], 5),
+            "lng": round(self.lngs[row], 5),
+            "serviceable": bool(self.flags[row] & SERVICEABLE),
+        }
+
+    def lookup(self, pincode):
+        row = self._row(parse_pincode(pincode))
+        return self._record(row) if row is not None else None
+
+    def is_serviceable(self, pincode) -> Optional[bool]:
+        """None when the pincode isn't in the table: unknown, not unserviceable."""
+        row = self._row(parse_pincode(pincode))
+        return bool(self.flags[row] & SERVICEABLE) if row is not None else None
+
+    def within(self, lat: float, lng: float, radius_km: float, limit: int = 50) -> list:
+        """Pincodes within `radius_km` of a point, nearest first."""
+        band = radius_km / KM_PER_DEGREE_LAT
+        lo = bisect_left(self.sorted_lats, lat - band)
+        hi = bisect_right(self.sorted_lats, lat + band)
+        hits = []
+        for row in self.by_lat[lo:hi]:
+            distance = haversine_km(lat, lng, self.lats[row], self.lngs[row])
+            if distance <= radius_km:
+                hits.append((distance, row))
+        hits.sort()
+        return [{**self._record(row), "distance_km": round(distance, 2)} for distance, row in hits[:limit]]
+
+
+# -------- Build --------
+
+def read_csv(path: str):
+    """CSV columns: pincode, city, state, lat, lng, serviceable (1/0, optional)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield (
+                row["pincode"],
+                row["city"],
+                row["state"],
+                row["lat"],
+                row["lng"],
+                (row.get("serviceable") or "1").strip() not in ("0", "false", "no"),
+            )
+
+
+def build_pincode_file(csv_path: str, out_path: str = PINCODE_FILE) -> dict:
+    table = PincodeTable.from_rows(read_csv(csv_path))
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(table.to_bytes())
+    # Atomic swap so reloading workers never read a half-written file.
+    os.replace(tmp, out_path)
+    return {"pincodes": len(table), "cities": len(table.city_names), "bytes": os.path.getsize(out_path)}
+
+
+# -------- Loaded table --------
+
+_table = None
+_checked_at = 0.0
+
+
+def load_pincodes(path: str = PINCODE_FILE):
+    global _table, _checked_at
+    _checked_at = time.monotonic()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return _table
+    if _table is None or _table.mtime != mtime:
+        with open(path, "rb") as f:
+            _table = PincodeTable.from_bytes(f.read(), mtime)
+    return _table
+
+
+def pincode_table():
+    """The current table, reloaded when the file's mtime changes. None if no file is bundled."""
+    if _table is None or time.monotonic() - _checked_at >= PINCODE_RELOAD_SECONDS:
+        return load_pincodes()
+    return _table
+
+
+def normalize_address(address: dict, coords_key: str = None) -> dict:
+    """
+    Canonicalize city/state from the pincode, fill missing coordinates and
+    record serviceability. Coordinates live on the address itself (`Location`)
+    or in a nested dict named by `coords_key` (`AddAddressModel.location`).
+
+    Raises PincodeError for a malformed pincode. Pincodes missing from the
+    table are kept as given with `serviceable` None (unknown); only a table
+    entry flagged unserviceable sets it to False.
+    """
+    address = dict(address)
+    address["pincode"] = str(parse_pincode(address.get("pincode")))
+    table = pincode_table()
+    record = table.lookup(address["pincode"]) if table is not None else None
+    if record is None:
+        address["serviceable"] = None
+        return address
+    address["city"] = record["city"]
+    address["state"] = record["state"]
+    address["serviceable"] = record["serviceable"]
+    coords = address if coords_key is None else dict(address.get(coords_key) or {})
+    if coords.get("lat") is None or coords.get("lng") is None:
+        coords["lat"], coords["lng"] = record["lat"], record["lng"]
+    if coords_key is not None:
+        address[coords_key] = coords
+    return address
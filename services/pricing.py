@@ -0,0 +1,123 @@
+# services/pricing.py
+#
+# Invoice pricing in integer paise. Amounts are converted once from their
+# decimal string form, every intermediate value stays an int, and results are
+# only turned back into rupees at the end, so totals never pick up float drift.
+#
+# Line rules:
+#   gross    = unitPrice x quantity
+#   discount = discountAmount when > 0, otherwise discountPercent of gross
+#              (capped at gross)
+#   taxable  = gross - discount
+#   gst      = taxable x gst% (rounded half-up to the paisa)
+# Invoice totals add deliveryCharge, platformFee and logisticsFee on top.
+
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+FEE_FIELDS = ("deliveryCharge", "platformFee", "logisticsFee")
+
+# Fields whose change requires totals to be recomputed.
+PRICING_FIELDS = ("items",) + FEE_FIELDS
+
+
+@lru_cache(maxsize=4096)
+def to_paise(value) -> int:
+    if not value:
+        return 0
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@lru_cache(maxsize=256)
+def to_basis_points(rate) -> int:
+    """Percentages as hundredths of a percent (18 -> 1800, 0.25 -> 25)."""
+    if not rate:
+        return 0
+    return int((Decimal(str(rate)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _apply_rate(amount: int, basis_points: int) -> int:
+    # Half-up rounding for non-negative integer amounts.
+    return (amount * basis_points + 5000) // 10000
+
+
+def to_rupees(paise: int) -> float:
+    return paise / 100
+
+
+@lru_cache(maxsize=16384)
+def _amounts(unit_price, quantity, discount_amount, discount_percent, gst_rate):
+    gross = to_paise(unit_price) * int(quantity or 0)
+    discount = to_paise(discount_amount)
+    if discount <= 0:
+        discount = _apply_rate(gross, to_basis_points(discount_percent))
+    discount = min(max(discount, 0), gross)
+    taxable = gross - discount
+    rate_bp = to_basis_points(gst_rate)
+    return gross, discount, taxable, rate_bp, _apply_rate(taxable, rate_bp)
+
+
+def _line_amounts(item: dict):
+    """(gross, discount, taxable, gst rate in basis points, gst) in paise."""
+    # Whole lines repeat a lot (same part, price and quantity), so they are cached too.
+    return _amounts(
+        item.get("unitPrice"), item.get("quantity"), item.get("discountAmount"),
+        item.get("discountPercent"), item.get("gst"),
+    )
+
+
+def price_line(item: dict) -> dict:
+    """Price one line item; all values are integer paise except gstRate."""
+    gross, discount, taxable, rate_bp, gst = _line_amounts(item)
+    return {
+        "gross": gross,
+        "discount": discount,
+        "taxable": taxable,
+        "gstRate": rate_bp / 100,
+        "gst": gst,
+        "total": taxable + gst,
+    }
+
+
+def price_invoice(data: dict) -> dict:
+    """
+    Compute the stored totals for one invoice payload. Returns rupee amounts
+    ready to be $set on the invoice, plus a per-slab GST breakdown.
+    """
+    sub_total = discount_total = tax_total = 0
+    slabs = {}
+    for item in data.get("items") or []:
+        _, discount, taxable, rate_bp, gst = _line_amounts(item)
+        sub_total += taxable
+        discount_total += discount
+        tax_total += gst
+        slab = slabs.get(rate_bp)
+        if slab is None:
+            slab = slabs[rate_bp] = [0, 0]
+        slab[0] += taxable
+        slab[1] += gst
+
+    fees = {field: to_paise(data.get(field)) for field in FEE_FIELDS}
+    total = sub_total + tax_total + sum(fees.values())
+
+    return {
+        "subTotal": to_rupees(sub_total),
+        "totalDiscount": to_rupees(discount_total),
+        "totalTax": to_rupees(tax_total),
+        **{field: to_rupees(amount) for field, amount in fees.items()},
+        "totalAmount": to_rupees(total),
+        "gstBreakdown": [
+            {"rate": rate_bp / 100, "taxableValue": to_rupees(taxable), "gstAmount": to_rupees(gst)}
+            for rate_bp, (taxable, gst) in sorted(slabs.items())
+        ],
+    }
+
+
+def price_invoices(batch) -> list:
+    """
+    Price many invoices; each result equals price_invoice for that payload.
+    Conversions and whole-line amounts come from the module-level lru_caches
+    shared by every call, so repeated lines within and across batches are
+    priced once per worker.
+    """
+    return [price_invoice(data) for data in batch]
@@ -0,0 +1,184 @@
+# services/referral_service.py
+#
+# Referrals are stored as edges (one document per referred user) instead of
+# arrays embedded in the referrer's profile. Per-referrer totals live in
+# `referral_counters` and are maintained with $inc on every new edge.
+
+import datetime
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from database import get_database
+from indexes import ensure_indexes
+from services.user_directory import ROLES, resolve_referral_code, to_object_id
+from utils.pagination import encode_cursor, keyset_filter
+
+REFERRALS_COLLECTION = "referrals"
+COUNTERS_COLLECTION = "referral_counters"
+
+
+async def record_referral(referrer_id, referrer_role: str, referee_id, referee_role: str, referral_code: str, created_at=None):
+    """
+    Store one referrer -> referee edge and bump the referrer's counters.
+    The edge is keyed by the referee, so replays never double count.
+    """
+    db = get_database()
+    now = created_at or datetime.datetime.utcnow()
+    if not await _insert_edge(db, referrer_id, referrer_role, referee_id, referee_role, referral_code, now):
+        return False
+
+    await db[COUNTERS_COLLECTION].update_one(
+        {"_id": referrer_id},
+        {
+            "$inc": {"count": 1},
+            "$set": {"role": referrer_role},
+            "$max": {"last_referral_at": now},
+        },
+        upsert=True,
+    )
+    await db[f"{referrer_role}_users"].update_one(
+        {"_id": referrer_id},
+        {"$inc": {"referral_count": 1}, "$set": {"updated_at": now}},
+    )
+    return True
+
+
+async def list_referrals(referrer_id, limit: int = 20, after=None):
+    """Newest-first page of a referrer's edges; `after` is a decoded (created_at, _id) cursor."""
+    db = get_database()
+    query = {"referrer_id": to_object_id(referrer_id)}
+    if after:
+        query.update(keyset_filter("created_at", *after))
+
+    edges = await db[REFERRALS_COLLECTION].find(query).sort(
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(edges) > limit
+    edges = edges[:limit]
+    names = await _names_for([(e["_id"], e["referee_role"]) for e in edges])
+
+    items = [{
+        "user_id": str(e["_id"]),
+        "role": e["referee_role"],
+        "full_name": names.get(e["_id"]),
+        "created_at": e["created_at"],
+    } for e in edges]
+    next_cursor = encode_cursor(edges[-1]["created_at"], edges[-1]["_id"]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def leaderboard(limit: int = 20, skip: int = 0):
+    db = get_database()
+    rows = await db[COUNTERS_COLLECTION].find({}).sort(
+        [("count", DESCENDING), ("_id", ASCENDING)]
+    ).skip(skip).limit(limit).to_list(length=limit)
+    names = await _names_for([(r["_id"], r.get("role")) for r in rows])
+    return [{
+        "rank": skip + i + 1,
+        "user_id": str(r["_id"]),
+        "role": r.get("role"),
+        "full_name": names.get(r["_id"]),
+        "referral_count": r["count"],
+        "last_referral_at": r.get("last_referral_at"),
+    } for i, r in enumerate(rows)]
+
+
+async def _names_for(users):
+    """Fetch display names with one $in query per role present in `users`."""
+    db = get_database()
+    by_role = {}
+    for user_id, role in users:
+        if role in ROLES:
+            by_role.setdefault(role, []).append(user_id)
+    names = {}
+    for role, ids in by_role.items():
+        async for u in db[f"{role}_users"].find({"_id": {"$in": ids}}, {"full_name": 1}):
+            names[u["_id"]] = u.get("full_name")
+    return names
+
+
+# -------- Migration --------
+
+async def migrate_embedded_referrals():
+    """
+    Drain the legacy embedded data into the edge collection:
+    - every user with `referred_by` gets an edge to the referrer it names;
+    - `referral_users` entries pointing at other users become edges too;
+    then counters are rebuilt from the edges and `referral_users` is unset.
+    """
+    db = get_database()
+    await ensure_indexes(db, [REFERRALS_COLLECTION, COUNTERS_COLLECTION])
+    stats = {"edges_created": 0, "unresolved": 0}
+
+    for role in ROLES:
+        cursor = db[f"{role}_users"].find(
+            {"$or": [{"referred_by": {"$nin": [None, ""]}}, {"referral_users.0": {"$exists": True}}]},
+            {"referred_by": 1, "referral_users": 1, "created_at": 1},
+        )
+        async for user in cursor:
+            if user.get("referred_by"):
+                referrer_id, referrer_role = await resolve_referral_code(user["referred_by"])
+                if referrer_id and referrer_id != user["_id"]:
+                    created = await _insert_edge(db, referrer_id, referrer_role, user["_id"], role, user["referred_by"], user.get("created_at"))
+                    stats["edges_created"] += int(created)
+                else:
+                    stats["unresolved"] += 1
+
+            for referee in user.get("referral_users") or []:
+                referee_id = to_object_id(referee)
+                if not referee_id or referee_id == user["_id"]:
+                    continue
+                entry = await db["user_directory"].find_one({"_id": referee_id}, {"role": 1})
+                if not entry:
+                    stats["unresolved"] += 1
+                    continue
+                created = await _insert_edge(db, user["_id"], role, referee_id, entry["role"], None, None)
+                stats["edges_created"] += int(created)
+
+    stats["counters"] = await rebuild_referral_counters()
+    for role in ROLES:
+        await db[f"{role}_users"].update_many(
+            {"referral_users": {"$exists": True}},
+            {"$unset": {"referral_users": ""}},
+        )
+    return stats
+
+
+async def _insert_edge(db, referrer_id, referrer_role, referee_id, referee_role, referral_code, created_at):
+    try:
+        await db[REFERRALS_COLLECTION].insert_one({
+            "_id": referee_id,
+            "referrer_id": referrer_id,
+            "referrer_role": referrer_role,
+            "referee_role": referee_role,
+            "referral_code": referral_code,
+            "created_at": created_at or datetime.datetime.utcnow(),
+        })
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def rebuild_referral_counters():
+    """Recompute referral_counters and each user's referral_count from the edges."""
+    db = get_database()
+    await db[REFERRALS_COLLECTION].aggregate([
+        {"$group": {
+            "_id": "$referrer_id",
+            "role": {"$first": "$referrer_role"},
+            "count": {"$sum": 1},
+            "last_referral_at": {"$max": "$created_at"},
+        }},
+        {"$out": COUNTERS_COLLECTION},
+    ]).to_list(length=None)
+    await ensure_indexes(db, [COUNTERS_COLLECTION])
+
+    updated = 0
+    for role in ROLES:
+        await db[f"{role}_users"].update_many({}, {"$set": {"referral_count": 0}})
+        async for counter in db[COUNTERS_COLLECTION].find({"role": role}):
+            await db[f"{role}_users"].update_one({"_id": counter["_id"]}, {"$set": {"referral_count": counter["count"]}})
+            updated += 1
+    return {"referrers": updated}
@@ -0,0 +1,444 @@
+# services/stock_service.py
+#
+# Stock ledger per (vendor, SKU). Available units live in one or more shard
+# documents so a hot SKU's reserve/release traffic is spread over several
+# documents instead of serializing on one:
+#
+#   stock_items        {_id: "vendor|sku", vendorId, sku, shards: k}
+#   stock_shards       {_id: "vendor|sku|n", vendorId, sku, shard: n, available,
+#                       holds: [{rid, qty, expires_at, transfer_to?}], transfers_in: [tid]}
+#   stock_reservations {_id: rid, vendorId, sku, quantity, takes: [{shard, qty}],
+#                       status, ref, createdAt, expires_at}
+#
+# A reservation takes units with a conditional update per shard
+# ({available: {$gte: qty}} + $inc -qty), recording the hold on the shard in
+# the same write, so stock can never go negative and a hold can never exist
+# without its units having been taken. Releasing returns units only while the
+# hold is still there, which makes release, commit and expiry idempotent.
+#
+# Holds past their expiry (plus a grace period that lets in-flight commits
+# finish) are returned by a background sweeper. Reservation records are
+# purged later by a TTL index; the shard holds are the source of truth.
+
+import asyncio
+import datetime
+import random
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from config import (
+    STOCK_MAX_SHARDS,
+    STOCK_RESERVATION_SECONDS,
+    STOCK_SWEEP_GRACE_SECONDS,
+    STOCK_SWEEP_SECONDS,
+)
+from database import get_database
+
+ITEMS_COLLECTION = "stock_items"
+SHARDS_COLLECTION = "stock_shards"
+RESERVATIONS_COLLECTION = "stock_reservations"
+
+# Transfers between shards during a rebalance hold the moved units this long.
+TRANSFER_HOLD = datetime.timedelta(minutes=5)
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+class ReservationExpired(Exception):
+    pass
+
+
+class ReservationClosed(Exception):
+    """Already committed or released the other way."""
+
+
+def item_key(vendor_id: str, sku: str) -> str:
+    return f"{vendor_id}|{sku}"
+
+
+def shard_key(vendor_id: str, sku: str, shard: int) -> str:
+    return f"{vendor_id}|{sku}|{shard}"
+
+
+async def _shard_count(vendor_id: str, sku: str) -> int:
+    item = await get_database()[ITEMS_COLLECTION].find_one({"_id": item_key(vendor_id, sku)}, {"shards": 1})
+    return item["shards"] if item else 1
+
+
+async def _take(shard_id: str, qty: int, hold: dict = None) -> bool:
+    """Atomically take `qty` units from one shard if it has them, optionally recording a hold."""
+    update = {"$inc": {"available": -qty}, "$set": {"updatedAt": datetime.datetime.utcnow()}}
+    if hold is not None:
+        update["$push"] = {"holds": {**hold, "qty": qty}}
+    result = await get_database()[SHARDS_COLLECTION].update_one(
+        {"_id": shard_id, "available": {"$gte": qty}}, update
+    )
+    return result.modified_count == 1
+
+
+async def _drop_hold(shard_id: str, rid, qty: int, restore: bool, hold_filter: dict = None) -> bool:
+    """Remove one hold; with `restore` its units go back to `available`. No-op if already gone."""
+    update = {"$pull": {"holds": {"rid": rid}}, "$set": {"updatedAt": datetime.datetime.utcnow()}}
+    if restore:
+        update["$inc"] = {"available": qty}
+    match = hold_filter or {"rid": rid}
+    result = await get_database()[SHARDS_COLLECTION].update_one(
+        {"_id": shard_id, "holds": {"$elemMatch": match}}, update
+    )
+    return result.modified_count == 1
+
+
+# -------- Stock levels --------
+
+async def adjust_stock(vendor_id: str, sku: str, delta: int) -> dict:
+    """
+    Add (restock) or remove units. Additions are spread evenly over the
+    shards in one bulk write; removals take from shards like a reservation.
+    """
+    db = get_database()
+    now = datetime.datetime.utcnow()
+    await db[ITEMS_COLLECTION].update_one(
+        {"_id": item_key(vendor_id, sku)},
+        {"$setOnInsert": {"vendorId": vendor_id, "sku": sku, "shards": 1, "createdAt": now}, "$set": {"updatedAt": now}},
+        upsert=True,
+    )
+    shards = await _shard_count(vendor_id, sku)
+    if delta > 0:
+        base, extra = divmod(delta, shards)
+        operations = [
+            UpdateOne(
+                {"_id": shard_key(vendor_id, sku, n)},
+                {
+                    "$inc": {"available": base + (1 if n < extra else 0)},
+                    "$set": {"updatedAt": now},
+                    "$setOnInsert": {"vendorId": vendor_id, "sku": sku, "shard": n, "holds": [], "transfers_in": []},
+                },
+                upsert=True,
+            )
+            for n in range(shards)
+        ]
+        await db[SHARDS_COLLECTION].bulk_write(operations, ordered=False)
+    elif delta < 0:
+        takes = await _take_across_shards(vendor_id, sku, -delta, shards, hold=None)
+        if takes is None:
+            raise InsufficientStock(sku)
+    return await get_stock(vendor_id, sku)
+
+
+async def get_stock(vendor_id: str, sku: str) -> dict:
+    shards = await get_database()[SHARDS_COLLECTION].find(
+        {"vendorId": vendor_id, "sku": sku}, {"shard": 1, "available": 1, "holds.qty": 1}
+    ).to_list(length=None)
+    shards.sort(key=lambda s: s["shard"])
+    return {
+        "vendorId": vendor_id,
+        "sku": sku,
+        "available": sum(s["available"] for s in shards),
+        "held": sum(h["qty"] for s in shards for h in s.get("holds", [])),
+        "shards": [{"shard": s["shard"], "available": s["available"]} for s in shards],
+    }
+
+
+# -------- Reservations --------
+
+async def _take_across_shards(vendor_id: str, sku: str, qty: int, shards: int, hold: dict = None):
+    """
+    Take `qty` units, preferring a single shard (random start spreads load).
+    Falls back to partial takes from several shards; returns the takes, or
+    None (with anything taken put back) when the shards can't cover it.
+    """
+    start = random.randrange(shards)
+    order = [(start + i) % shards for i in range(shards)]
+    for n in order:
+        if await _take(shard_key(vendor_id, sku, n), qty, hold):
+            return [{"shard": n, "qty": qty}]
+    if shards == 1:
+        return None
+
+    levels = await get_database()[SHARDS_COLLECTION].find(
+        {"vendorId": vendor_id, "sku": sku, "available": {"$gt": 0}}, {"shard": 1, "available": 1}
+    ).to_list(length=None)
+    takes, remaining = [], qty
+    for level in sorted(levels, key=lambda s: -s["available"]):
+        amount = min(level["available"], remaining)
+        if await _take(level["_id"], amount, hold):
+            takes.append({"shard": level["shard"], "qty": amount})
+            remaining -= amount
+            if not remaining:
+                # Needing several shards means they have drifted apart.
+                schedule_rebalance(vendor_id, sku)
+                return takes
+
+    for take in takes:
+        shard_id = shard_key(vendor_id, sku, take["shard"])
+        if hold is None:
+            await get_database()[SHARDS_COLLECTION].update_one({"_id": shard_id}, {"$inc": {"available": take["qty"]}})
+        else:
+            await _drop_hold(shard_id, hold["rid"], take["qty"], restore=True)
+    return None
+
+
+async def reserve_stock(
+    vendor_id: str,
+    sku: str,
+    qty: int,
+    ttl_seconds: int = STOCK_RESERVATION_SECONDS,
+    ref: str = None,
+    reserved_by: str = None,
+) -> dict:
+    now = datetime.datetime.utcnow()
+    rid = ObjectId()
+    expires_at = now + datetime.timedelta(seconds=ttl_seconds)
+    shards = await _shard_count(vendor_id, sku)
+    takes = await _take_across_shards(vendor_id, sku, qty, shards, hold={"rid": rid, "expires_at": expires_at})
+    if takes is None:
+        raise InsufficientStock(sku)
+
+    reservation = {
+        "_id": rid,
+        "vendorId": vendor_id,
+        "sku": sku,
+        "quantity": qty,
+        "takes": takes,
+        "status": "held",
+        "ref": ref,
+        "reservedBy": reserved_by,
+        "createdAt": now,
+        "expires_at": expires_at,
+    }
+    await get_database()[RESERVATIONS_COLLECTION].insert_one(reservation)
+    return reservation
+
+
+async def get_reservation(rid):
+    if not isinstance(rid, ObjectId):
+        if not ObjectId.is_valid(rid):
+            return None
+        rid = ObjectId(rid)
+    return await get_database()[RESERVATIONS_COLLECTION].find_one({"_id": rid})
+
+
+async def _finish(rid, status: str, restore: bool) -> dict:
+    """
+    Close a held reservation. The status flips from "held" with a
+    compare-and-set before any shard is touched, so of a racing commit and
+    release only the winner acts on the holds.
+    """
+    db = get_database()
+    reservation = await get_reservation(rid)
+    if not reservation:
+        raise ReservationNotFound(str(rid))
+    rid = reservation["_id"]
+    now = datetime.datetime.utcnow()
+    claim = {"_id": rid, "status": "held"}
+    if not restore:
+        claim["expires_at"] = {"$gt": now}
+    won = await db[RESERVATIONS_COLLECTION].find_one_and_update(
+        claim,
+        {"$set": {"status": status, f"{status}At": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if won is None:
+        current = (await get_reservation(rid) or reservation)["status"]
+        # Repeats are no-ops; releasing an expired hold is too (its units are already back).
+        if current == status or (restore and current == "expired"):
+            return {**reservation, "status": current}
+        if current in ("held", "expired"):
+            raise ReservationExpired(str(rid))
+        raise ReservationClosed(current)
+
+    dropped = []
+    for take in won["takes"]:
+        shard_id = shard_key(won["vendorId"], won["sku"], take["shard"])
+        if await _drop_hold(shard_id, rid, take["qty"], restore=restore):
+            dropped.append(shard_id)
+        elif not restore:
+            break
+    else:
+        return won
+
+    # A commit found a hold already swept (its units are back on sale):
+    # put back what this commit took and report the reservation expired.
+    for shard_id, take in zip(dropped, won["takes"]):
+        await db[SHARDS_COLLECTION].update_one({"_id": shard_id}, {"$inc": {"available": take["qty"]}})
+    await db[RESERVATIONS_COLLECTION].update_one(
+        {"_id": rid, "status": status},
+        {"$set": {"status": "expired", "expiredAt": datetime.datetime.utcnow()}},
+    )
+    raise ReservationExpired(str(rid))
+
+
+async def release_reservation(rid) -> dict:
+    """Return held units to stock (cancelled order, abandoned cart)."""
+    return await _finish(rid, "released", restore=True)
+
+
+async def commit_reservation(rid) -> dict:
+    """Make a reservation permanent: the units leave stock for good."""
+    return await _finish(rid, "committed", restore=False)
+
+
+# -------- Expiry sweeper --------
+
+async def sweep_expired_holds() -> dict:
+    """Return units for holds past expiry + grace; transfers that already landed are just dropped."""
+    db = get_database()
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=STOCK_SWEEP_GRACE_SECONDS)
+    released, expired_rids = 0, set()
+    cursor = db[SHARDS_COLLECTION].find(
+        {"holds.expires_at": {"$lt": cutoff}}, {"vendorId": 1, "sku": 1, "holds": 1}
+    )
+    async for shard in cursor:
+        for hold in shard.get("holds", []):
+            if hold["expires_at"] >= cutoff:
+                continue
+            restore = True
+            if hold.get("transfer_to") is not None:
+                target = shard_key(shard["vendorId"], shard["sku"], hold["transfer_to"])
+                restore = not await db[SHARDS_COLLECTION].count_documents({"_id": target, "transfers_in": hold["rid"]}, limit=1)
+            match = {"rid": hold["rid"], "expires_at": {"$lt": cutoff}}
+            if await _drop_hold(shard["_id"], hold["rid"], hold["qty"], restore=restore, hold_filter=match):
+                released += hold["qty"] if restore else 0
+                expired_rids.add(hold["rid"])
+    if expired_rids:
+        await db[RESERVATIONS_COLLECTION].update_many(
+            {"_id": {"$in": list(expired_rids)}, "status": "held"},
+            {"$set": {"status": "expired", "expiredAt": datetime.datetime.utcnow()}},
+        )
+    return {"holds": len(expired_rids), "units_released": released}
+
+
+_sweep_task = None
+
+
+async def _sweep_forever():
+    while True:
+        await asyncio.sleep(STOCK_SWEEP_SECONDS)
+        try:
+            await sweep_expired_holds()
+        except Exception as e:
+            print(f"⚠️ Stock hold sweep failed: {e}")
+
+
+async def start_stock_sweeper():
+    global _sweep_task
+    _sweep_task = asyncio.create_task(_sweep_forever())
+
+
+async def stop_stock_sweeper():
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        _sweep_task = None
+
+
+# -------- Sharding --------
+
+async def _transfer(vendor_id: str, sku: str, source: int, target: int, qty: int) -> bool:
+    """
+    Move units between shards. The source holds them first (so a crash can
+    never create or destroy stock: the sweeper either returns them or sees
+    the transfer landed), then the target is credited exactly once.
+    """
+    db = get_database()
+    tid = ObjectId()
+    source_id, target_id = shard_key(vendor_id, sku, source), shard_key(vendor_id, sku, target)
+    hold = {"rid": tid, "expires_at": datetime.datetime.utcnow() + TRANSFER_HOLD, "transfer_to": target}
+    if not await _take(source_id, qty, hold):
+        return False
+    await db[SHARDS_COLLECTION].update_one(
+        {"_id": target_id, "transfers_in": {"$ne": tid}},
+        {"$inc": {"available": qty}, "$push": {"transfers_in": tid}},
+    )
+    await _drop_hold(source_id, tid, qty, restore=False)
+    await db[SHARDS_COLLECTION].update_one({"_id": target_id}, {"$pull": {"transfers_in": tid}})
+    return True
+
+
+async def rebalance_stock(vendor_id: str, sku: str) -> dict:
+    """Even out available units across the SKU's shards."""
+    shards = await get_database()[SHARDS_COLLECTION].find(
+        {"vendorId": vendor_id, "sku": sku}, {"shard": 1, "available": 1}
+    ).to_list(length=None)
+    if len(shards) < 2:
+        return await get_stock(vendor_id, sku)
+    total = sum(s["available"] for s in shards)
+    base, extra = divmod(total, len(shards))
+    shards.sort(key=lambda s: -s["available"])
+    targets = {s["shard"]: base + (1 if i < extra else 0) for i, s in enumerate(shards)}
+    surplus = [[s["shard"], s["available"] - targets[s["shard"]]] for s in shards if s["available"] > targets[s["shard"]]]
+    deficit = [[s["shard"], targets[s["shard"]] - s["available"]] for s in shards if s["available"] < targets[s["shard"]]]
+    while surplus and deficit:
+        amount = min(surplus[0][1], deficit[0][1])
+        # Levels may have moved since the read; a failed take just skips this pair.
+        await _transfer(vendor_id, sku, surplus[0][0], deficit[0][0], amount)
+        surplus[0][1] -= amount
+        deficit[0][1] -= amount
+        if not surplus[0][1]:
+            surplus.pop(0)
+        if not deficit[0][1]:
+            deficit.pop(0)
+    return await get_stock(vendor_id, sku)
+
+
+async def split_stock(vendor_id: str, sku: str, shards: int) -> dict:
+    """Raise a SKU's shard count (never lowered) and spread its stock over the new shards."""
+    shards = max(1, min(shards, STOCK_MAX_SHARDS))
+    db = get_database()
+    now = datetime.datetime.utcnow()
+    current = await _shard_count(vendor_id, sku)
+    if shards > current:
+        await db[SHARDS_COLLECTION].bulk_write([
+            UpdateOne(
+                {"_id": shard_key(vendor_id, sku, n)},
+                {"$setOnInsert": {
+                    "vendorId": vendor_id, "sku": sku, "shard": n,
+                    "available": 0, "holds": [], "transfers_in": [], "updatedAt": now,
+                }},
+                upsert=True,
+            )
+            for n in range(shards)
+        ], ordered=False)
+        # New shards exist before reservations can pick them.
+        await db[ITEMS_COLLECTION].update_one(
+            {"_id": item_key(vendor_id, sku)},
+            {
+                "$max": {"shards": shards},
+                "$set": {"updatedAt": now},
+                "$setOnInsert": {"vendorId": vendor_id, "sku": sku, "createdAt": now},
+            },
+            upsert=True,
+        )
+    return await rebalance_stock(vendor_id, sku)
+
+
+_rebalancing = set()
+# The event loop only keeps weak references to tasks; hold them until they finish.
+_rebalance_tasks = set()
+
+
+def schedule_rebalance(vendor_id: str, sku: str):
+    """Fire-and-forget rebalance, at most one in flight per SKU per worker."""
+    key = item_key(vendor_id, sku)
+    if key in _rebalancing:
+        return
+    _rebalancing.add(key)
+
+    async def run():
+        try:
+            await rebalance_stock(vendor_id, sku)
+        except Exception as e:
+            print(f"⚠️ Stock rebalance failed for {key}: {e}")
+        finally:
+            _rebalancing.discard(key)
+
+    task = asyncio.create_task(run())
+    _rebalance_tasks.add(task)
+    task.add_done_callback(_rebalance_tasks.discard)
@@ -0,0 +1,116 @@
+# services/token_revocation.py
+#
+# Revoked token ids (jti) are persisted in `revoked_tokens` and mirrored into
+# each worker's memory, so the per-request check is a set lookup with no I/O.
+# A background task pulls revocations made by other workers incrementally.
+
+import asyncio
+import datetime
+import heapq
+
+from config import REVOCATION_SYNC_SECONDS
+from database import get_database
+
+REVOKED_COLLECTION = "revoked_tokens"
+
+# Overlap each incremental pull a little to tolerate clock skew between workers.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+
+class RevocationSet:
+    def __init__(self):
+        self._jtis = set()
+        self._expiry_heap = []
+        self.watermark = None
+
+    def __contains__(self, jti) -> bool:
+        return jti in self._jtis
+
+    def __len__(self) -> int:
+        return len(self._jtis)
+
+    def add(self, jti: str, expires_at: datetime.datetime):
+        if jti not in self._jtis:
+            self._jtis.add(jti)
+            heapq.heappush(self._expiry_heap, (expires_at, jti))
+
+    def prune(self, now: datetime.datetime):
+        # Expired tokens fail signature checks anyway, so their jti can go.
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            self._jtis.discard(jti)
+
+
+revoked = RevocationSet()
+_sync_task = None
+
+
+def is_revoked(jti) -> bool:
+    return bool(jti) and jti in revoked
+
+
+def _expiry(exp) -> datetime.datetime:
+    if isinstance(exp, datetime.datetime):
+        return exp
+    return datetime.datetime.utcfromtimestamp(exp)
+
+
+async def revoke_token(payload: dict):
+    """
+    Revoke a decoded token (access or refresh) by its jti until it expires.
+    Returns True only for the call that actually revoked it.
+    """
+    jti = payload.get("jti")
+    if not jti:
+        return False
+    expires_at = _expiry(payload["exp"])
+    result = await get_database()[REVOKED_COLLECTION].update_one(
+        {"_id": jti},
+        {"$setOnInsert": {
+            "expires_at": expires_at,
+            "revoked_at": datetime.datetime.utcnow(),
+            "user_id": payload.get("user_id"),
+            "type": payload.get("type"),
+        }},
+        upsert=True,
+    )
+    revoked.add(jti, expires_at)
+    return result.upserted_id is not None
+
+
+async def sync_revocations():
+    now = datetime.datetime.utcnow()
+    query = {"expires_at": {"$gt": now}}
+    if revoked.watermark is not None:
+        query["revoked_at"] = {"$gte": revoked.watermark - SYNC_OVERLAP}
+
+    cursor = get_database()[REVOKED_COLLECTION].find(query, {"expires_at": 1, "revoked_at": 1})
+    async for doc in cursor:
+        revoked.add(doc["_id"], doc["expires_at"])
+        if revoked.watermark is None or doc["revoked_at"] > revoked.watermark:
+            revoked.watermark = doc["revoked_at"]
+    if revoked.watermark is None:
+        revoked.watermark = now
+    revoked.prune(now)
+
+
+async def _sync_forever():
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await sync_revocations()
+        except Exception as e:
+            print(f"⚠️ Token revocation sync failed: {e}")
+
+
+async def start_revocation_sync():
+    global _sync_task
+    await sync_revocations()
+    _sync_task = asyncio.create_task(_sync_forever())
+
+
+async def stop_revocation_sync():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        _sync_task = None
@@ -0,0 +1,165 @@
+# services/user_directory.py
+#
+# One small collection that maps every phone number to the role collection
+# (and _id) holding that user, so lookups cost a single indexed query instead
+# of probing admin_users, vendor_users, garage_users and delivery_users in turn.
+#
+# Document shape: {"_id": <user ObjectId>, "phone": str, "role": str, "referral_code": str}
+# "_id" doubles as the id -> role map; "phone" and "referral_code" carry unique indexes.
+
+import datetime
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+from indexes import ensure_indexes
+from services.geo import set_geo
+
+ROLES = ["admin", "vendor", "garage", "delivery"]
+DIRECTORY_COLLECTION = "user_directory"
+
+
+class PhoneAlreadyRegistered(Exception):
+    pass
+
+
+class ReferralCodeTaken(Exception):
+    pass
+
+
+def _directory():
+    return get_database()[DIRECTORY_COLLECTION]
+
+
+def to_object_id(user_id):
+    if isinstance(user_id, ObjectId):
+        return user_id
+    if not user_id or not ObjectId.is_valid(user_id):
+        return None
+    return ObjectId(user_id)
+
+
+def _duplicate_error(error: DuplicateKeyError, phone, referral_code):
+    if "referral_code" in str(error):
+        return ReferralCodeTaken(referral_code)
+    return PhoneAlreadyRegistered(phone)
+
+
+# -------- Lookups --------
+
+async def resolve_phone(phone: str):
+    entry = await _directory().find_one({"phone": phone}, {"role": 1})
+    if not entry:
+        return None, None
+    return entry["_id"], entry["role"]
+
+
+async def resolve_role(user_id):
+    oid = to_object_id(user_id)
+    if oid is None:
+        return None
+    entry = await _directory().find_one({"_id": oid}, {"role": 1})
+    return entry["role"] if entry else None
+
+
+async def find_user_by_phone(phone: str, projection=None):
+    user_id, role = await resolve_phone(phone)
+    if not role:
+        return None, None
+    user = await get_database()[f"{role}_users"].find_one({"_id": user_id}, projection)
+    return (user, role) if user else (None, None)
+
+
+async def resolve_referral_code(code: str):
+    """Referral codes are matched first; a referrer's phone number is accepted too."""
+    entry = await _directory().find_one({"referral_code": code}, {"role": 1})
+    if not entry:
+        entry = await _directory().find_one({"phone": code}, {"role": 1})
+    if not entry:
+        return None, None
+    return entry["_id"], entry["role"]
+
+
+async def get_user_by_id(user_id, projection=None):
+    oid = to_object_id(user_id)
+    role = await resolve_role(oid)
+    if not role:
+        return None, None
+    user = await get_database()[f"{role}_users"].find_one({"_id": oid}, projection)
+    return (user, role) if user else (None, None)
+
+
+# -------- Write paths --------
+
+async def register_user(user_id, phone: str, role: str, referral_code: str = None):
+    """Claim `phone` (and `referral_code`) for a user before its role document is written."""
+    entry = {"_id": to_object_id(user_id), "phone": phone, "role": role}
+    if referral_code:
+        entry["referral_code"] = referral_code
+    try:
+        await _directory().insert_one(entry)
+    except DuplicateKeyError as e:
+        raise _duplicate_error(e, phone, referral_code)
+
+
+async def sync_user_fields(user_id, updates: dict):
+    """Mirror phone / referral_code changes from a role-collection update."""
+    changes = {k: updates[k] for k in ("phone", "referral_code") if updates.get(k)}
+    if not changes:
+        return
+    try:
+        await _directory().update_one({"_id": to_object_id(user_id)}, {"$set": changes})
+    except DuplicateKeyError as e:
+        raise _duplicate_error(e, changes.get("phone"), changes.get("referral_code"))
+
+
+async def unregister_user(user_id):
+    await _directory().delete_one({"_id": to_object_id(user_id)})
+
+
+async def insert_user(role: str, user_doc: dict):
+    """
+    Insert a user into its role collection and the directory.
+    The directory entry is written first so a duplicate phone is rejected
+    before the user document exists.
+    """
+    db = get_database()
+    user_doc = set_geo(dict(user_doc))
+    user_doc.setdefault("_id", ObjectId())
+    # Listings page on created_at; models default it to None.
+    now = datetime.datetime.utcnow()
+    user_doc["created_at"] = user_doc.get("created_at") or now
+    user_doc["updated_at"] = user_doc.get("updated_at") or now
+    await register_user(user_doc["_id"], user_doc["phone"], role, user_doc.get("referral_code"))
+    try:
+        await db[f"{role}_users"].insert_one(user_doc)
+    except Exception:
+        await unregister_user(user_doc["_id"])
+        raise
+    return user_doc["_id"]
+
+
+# -------- Backfill --------
+
+async def backfill_user_directory():
+    """Rebuild directory entries for every user already stored in the role collections."""
+    db = get_database()
+    await ensure_indexes(db, [DIRECTORY_COLLECTION])
+    stats = {"upserted": 0, "conflicts": []}
+    for role in ROLES:
+        async for user in db[f"{role}_users"].find({}, {"phone": 1, "referral_code": 1}):
+            if not user.get("phone"):
+                continue
+            entry = {"phone": user["phone"], "role": role}
+            if user.get("referral_code"):
+                entry["referral_code"] = user["referral_code"]
+            try:
+                result = await _directory().update_one(
+                    {"_id": user["_id"]},
+                    {"$set": entry},
+                    upsert=True,
+                )
+                stats["upserted"] += 1 if result.upserted_id else 0
+            except DuplicateKeyError:
+                stats["conflicts"].append({"phone": user["phone"], "role": role, "user_id": str(user["_id"])})
+    return stats
@@ -0,0 +1,180 @@
+# services/user_import.py
+#
+# Bulk onboarding from spreadsheets (CSV) or NDJSON. Rows are validated with
+# the shared discriminated-union adapter, de-duplicated against the file
+# itself and against user_directory with batched $in queries, then written
+# with insert_many: directory entries first (the unique indexes arbitrate any
+# concurrent registration), then the role documents for the entries that won.
+#
+# CSV columns use the export layout: dotted paths for nested fields
+# ("location.city") and "|" between list values ("brands_carried").
+# PINs are not imported; users set one on first login.
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from config import USER_IMPORT_BATCH_SIZE
+from database import get_database
+from models.user import USER_ADAPTER
+from services.geo import set_geo
+from services.user_directory import DIRECTORY_COLLECTION
+
+CSV_LIST_FIELDS = {"brands_carried", "brands_served", "category_focus", "vehicle_types"}
+IGNORED_FIELDS = {"_id", "pin", "referral_count", "created_at", "updated_at"}
+
+
+def _csv_row(row: dict, default_role: str = None) -> dict:
+    doc = {}
+    for column, value in row.items():
+        if column is None or value is None:
+            continue
+        value = value.strip()
+        if not value:
+            continue
+        *parents, leaf = column.strip().split(".")
+        target = doc
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = [v.strip() for v in value.split("|") if v.strip()] if leaf in CSV_LIST_FIELDS else value
+    if default_role:
+        doc.setdefault("role", default_role)
+    return doc
+
+
+def parse_csv(body: bytes, default_role: str = None) -> list:
+    reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+    return [_csv_row(row, default_role) for row in reader]
+
+
+def parse_ndjson(body: bytes, default_role: str = None) -> list:
+    rows = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = ValueError(f"Invalid JSON: {e}")
+        if default_role and isinstance(row, dict):
+            row.setdefault("role", default_role)
+        rows.append(row)
+    return rows
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _existing(field: str, values) -> set:
+    found = set()
+    for batch in _batches(list(values), USER_IMPORT_BATCH_SIZE):
+        cursor = get_database()[DIRECTORY_COLLECTION].find({field: {"$in": batch}}, {field: 1, "_id": 0})
+        found.update(entry[field] async for entry in cursor)
+    return found
+
+
+def _validate(rows: list, errors: dict) -> list:
+    """Returns (index, role, document) for rows that pass validation and in-file dedupe."""
+    valid, phones, codes = [], set(), set()
+    for i, row in enumerate(rows):
+        if isinstance(row, Exception):
+            errors[i] = str(row)
+            continue
+        if not isinstance(row, dict):
+            errors[i] = "Row must be an object"
+            continue
+        try:
+            user = USER_ADAPTER.validate_python({k: v for k, v in row.items() if k not in IGNORED_FIELDS})
+        except ValidationError as e:
+            errors[i] = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            continue
+        doc = user.dict()
+        if doc["phone"] in phones:
+            errors[i] = "Duplicate phone in file"
+            continue
+        if doc.get("referral_code") and doc["referral_code"] in codes:
+            errors[i] = "Duplicate referral code in file"
+            continue
+        phones.add(doc["phone"])
+        if doc.get("referral_code"):
+            codes.add(doc["referral_code"])
+        valid.append((i, user.role, doc))
+    return valid
+
+
+async def _insert_batch(batch: list, errors: dict, now: datetime) -> int:
+    db = get_database()
+    entries = []
+    for _, role, doc in batch:
+        doc["_id"] = ObjectId()
+        doc["created_at"] = doc["updated_at"] = now
+        set_geo(doc)
+        entry = {"_id": doc["_id"], "phone": doc["phone"], "role": role}
+        if doc.get("referral_code"):
+            entry["referral_code"] = doc["referral_code"]
+        entries.append(entry)
+
+    failed = set()
+    try:
+        await db[DIRECTORY_COLLECTION].insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            errors[batch[err["index"]][0]] = (
+                "Referral code already in use" if "referral_code" in err.get("errmsg", "") else "Phone already registered"
+            )
+
+    by_role = {}
+    for pos, (i, role, doc) in enumerate(batch):
+        if pos not in failed:
+            by_role.setdefault(role, []).append((i, doc))
+
+    inserted = 0
+    for role, members in by_role.items():
+        docs = [doc for _, doc in members]
+        try:
+            await db[f"{role}_users"].insert_many(docs, ordered=False)
+            inserted += len(docs)
+        except BulkWriteError as e:
+            lost = {err["index"] for err in e.details.get("writeErrors", [])}
+            for pos in lost:
+                errors[members[pos][0]] = "Write failed"
+            await db[DIRECTORY_COLLECTION].delete_many({"_id": {"$in": [docs[pos]["_id"] for pos in lost]}})
+            inserted += len(docs) - len(lost)
+    return inserted
+
+
+async def import_users(rows: list) -> dict:
+    """Validate, de-duplicate and insert parsed rows; errors are keyed by row index."""
+    errors = {}
+    valid = _validate(rows, errors)
+
+    taken_phones = await _existing("phone", {doc["phone"] for _, _, doc in valid})
+    taken_codes = await _existing("referral_code", {doc["referral_code"] for _, _, doc in valid if doc.get("referral_code")})
+    pending = []
+    for i, role, doc in valid:
+        if doc["phone"] in taken_phones:
+            errors[i] = "Phone already registered"
+        elif doc.get("referral_code") in taken_codes:
+            errors[i] = "Referral code already in use"
+        else:
+            pending.append((i, role, doc))
+
+    inserted = 0
+    now = datetime.utcnow()
+    for batch in _batches(pending, USER_IMPORT_BATCH_SIZE):
+        inserted += await _insert_batch(batch, errors, now)
+
+    return {
+        "received": len(rows),
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": [{"index": i, "error": errors[i]} for i in sorted(errors)],
+    }
@@ -0,0 +1,136 @@
+# services/user_query.py
+#
+# Admin-side user listing across the four role collections. One aggregation
+# $unionWith's the collections; every branch applies the filters, keyset
+# position, sort and limit itself, so each collection contributes at most
+# one page from its (created_at, _id) index before the final merge.
+
+import time
+
+from pymongo import DESCENDING
+
+from config import USER_COUNT_CACHE_SECONDS
+from database import get_database
+from services.user_directory import ROLES
+from utils.pagination import encode_cursor, keyset_filter
+
+# Columns shown in the admin user table.
+LIST_PROJECTION = {
+    "full_name": 1,
+    "phone": 1,
+    "email": 1,
+    "role": 1,
+    "business_name": 1,
+    "garage_name": 1,
+    "kyc_status": 1,
+    "location.city": 1,
+    "location.state": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+SORT = {"created_at": DESCENDING, "_id": DESCENDING}
+
+# Fields an admin export may select; secrets such as `pin` are never exportable.
+EXPORT_COLUMNS = [
+    "_id", "role", "full_name", "phone", "email",
+    "business_name", "business_type", "garage_name", "garage_size", "distributor_size",
+    "gstin", "pan_number", "kyc_status",
+    "brands_carried", "brands_served", "category_focus", "vehicle_types",
+    "vehicle_type", "vehicle_number", "warehouse_assigned",
+    "location.addressLine", "location.city", "location.state", "location.pincode",
+    "location.lat", "location.lng",
+    "referral_code", "referred_by", "referral_count",
+    "created_at", "updated_at",
+]
+DEFAULT_EXPORT_COLUMNS = ["_id", "role", "full_name", "phone", "email", "kyc_status", "location.city", "created_at"]
+EXPORT_BATCH_SIZE = 1000
+
+_count_cache = {}
+
+
+def build_user_filter(city: str = None, kyc_status: str = None) -> dict:
+    query = {}
+    if city:
+        query["location.city"] = city
+    if kyc_status:
+        query["kyc_status"] = kyc_status
+    return query
+
+
+def _branch(role: str, match: dict, limit: int, projection: dict):
+    return [
+        {"$match": match},
+        {"$sort": SORT},
+        {"$limit": limit},
+        {"$project": projection},
+        {"$addFields": {"role": role}},
+    ]
+
+
+def build_list_pipeline(roles, match: dict, limit: int, projection: dict = LIST_PROJECTION):
+    """Returns (base_collection, pipeline) for one page of users across `roles`."""
+    first, *rest = roles
+    pipeline = _branch(first, match, limit, projection)
+    for role in rest:
+        pipeline.append({"$unionWith": {"coll": f"{role}_users", "pipeline": _branch(role, match, limit, projection)}})
+    pipeline += [{"$sort": SORT}, {"$limit": limit}]
+    return f"{first}_users", pipeline
+
+
+async def list_users(role: str = None, city: str = None, kyc_status: str = None, after=None, limit: int = 50):
+    db = get_database()
+    roles = [role] if role else ROLES
+    match = build_user_filter(city, kyc_status)
+    if after:
+        match = {"$and": [match, keyset_filter("created_at", *after)]} if match else keyset_filter("created_at", *after)
+
+    collection, pipeline = build_list_pipeline(roles, match, limit + 1)
+    users = await db[collection].aggregate(pipeline).to_list(length=limit + 1)
+
+    has_more = len(users) > limit
+    users = users[:limit]
+    next_cursor = encode_cursor(users[-1].get("created_at"), users[-1]["_id"]) if has_more else None
+    return users, next_cursor
+
+
+async def count_users(role: str = None, city: str = None, kyc_status: str = None) -> int:
+    """
+    Total for the list header. Unfiltered totals use collection metadata
+    (estimated_document_count); filtered totals are counted. Both are cached
+    for USER_COUNT_CACHE_SECONDS, so the number can briefly lag writes.
+    """
+    key = (role, city, kyc_status)
+    cached = _count_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[1] > now:
+        return cached[0]
+
+    db = get_database()
+    roles = [role] if role else ROLES
+    match = build_user_filter(city, kyc_status)
+    total = 0
+    for r in roles:
+        if match:
+            total += await db[f"{r}_users"].count_documents(match)
+        else:
+            total += await db[f"{r}_users"].estimated_document_count()
+
+    if len(_count_cache) > 1000:
+        _count_cache.clear()
+    _count_cache[key] = (total, now + USER_COUNT_CACHE_SECONDS)
+    return total
+
+
+async def iter_users(columns, role: str = None, city: str = None, kyc_status: str = None):
+    """Yield users one by one from batched cursors, reading only `columns`."""
+    db = get_database()
+    roles = [role] if role else ROLES
+    match = build_user_filter(city, kyc_status)
+    projection = {c: 1 for c in columns if c not in ("_id", "role")}
+    projection["_id"] = 1
+    for r in roles:
+        cursor = db[f"{r}_users"].find(match, projection, batch_size=EXPORT_BATCH_SIZE)
+        async for user in cursor:
+            user["role"] = r
+            yield user
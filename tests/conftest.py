@@ -0,0 +1,116 @@
+# tests/conftest.py
+#
+# The services talk to Mongo through motor; the tests swap `database.db` for
+# an in-memory mongomock database behind a thin async adapter with the same
+# surface (awaitable collection methods, chainable cursors with to_list and
+# async iteration). Every call yields to the event loop first, so concurrent
+# tasks interleave between Mongo operations just as they would against a
+# real server, while each single operation stays atomic.
+
+import asyncio
+import os
+import sys
+from collections import Counter
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._iter = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        docs = []
+        for doc in self._cursor:
+            docs.append(doc)
+            if length is not None and len(docs) >= length:
+                break
+        return docs
+
+    def __aiter__(self):
+        self._iter = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """
+    Writes addressed to a single `_id` are counted per document in `writes`,
+    the unit a server serializes on, so tests can measure hot-document
+    contention without timing anything.
+    """
+
+    def __init__(self, collection, writes: Counter):
+        self._collection = collection
+        self._writes = writes
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(iter(self._collection.aggregate(pipeline)))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            if name.startswith(("update", "find_one_and")) and args and isinstance(args[0], dict):
+                doc_id = args[0].get("_id")
+                if doc_id is not None and not isinstance(doc_id, dict):
+                    self._writes[(self._collection.name, doc_id)] += 1
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.writes = Counter()
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._db[name], self.writes)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+def make_database() -> AsyncDatabase:
+    return AsyncDatabase(mongomock.MongoClient()["qikspare"])
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    db = make_database()
+    monkeypatch.setattr(database, "db", db)
+    return db
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import admin
+from utils.auth_dependencies import get_admin_user, get_current_user
+
+
+@pytest.fixture
+def client(mongo_db):
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "garage-caller", "role": "garage"}
+    app.dependency_overrides[get_admin_user] = lambda: {"user_id": "admin-caller", "role": "admin"}
+    return TestClient(app)
+
+
+def _role_doc(mongo_db, role, phone):
+    return mongo_db[f"{role}_users"]._collection.find_one({"phone": phone})
+
+
+def test_app_cannot_register_admins(client, mongo_db):
+    response = client.post("/api/auth/register-user", json={"phone": "9000000001", "role": "admin"})
+    assert response.status_code == 403
+    assert _role_doc(mongo_db, "admin", "9000000001") is None
+    assert mongo_db["user_directory"]._collection.count_documents({}) == 0
+
+
+def test_app_registration_drops_protected_fields(client, mongo_db):
+    response = client.post("/api/auth/register-user", json={
+        "phone": "9000000002",
+        "role": "garage",
+        "full_name": "Sai Motors",
+        "password_hash": "x",
+        "referral_count": 500,
+        "referred_by": "someone",
+    })
+    assert response.status_code == 200
+    assert "password_hash" not in response.json()["user"]
+    stored = _role_doc(mongo_db, "garage", "9000000002")
+    assert not {"password_hash", "referral_count", "referred_by"} & set(stored)
+
+
+def test_admin_update_ignores_nulls_and_rejects_null_phone(client, mongo_db):
+    created = client.post("/api/admin/create-user", json={
+        "phone": "9000000003", "role": "vendor", "full_name": "Kumar Auto", "password_hash": "secret",
+    })
+    assert created.status_code == 200
+    assert "password_hash" not in created.json()["user"]
+    user_id = created.json()["user"]["_id"]
+
+    response = client.patch(f"/api/admin/update-user/{user_id}", json={"phone": None})
+    assert response.status_code == 400
+
+    response = client.patch(f"/api/admin/update-user/{user_id}", json={"full_name": "Kumar Autos", "email": None})
+    assert response.status_code == 200
+    stored = _role_doc(mongo_db, "vendor", "9000000003")
+    assert stored["full_name"] == "Kumar Autos"
+    assert "email" not in stored
+    assert mongo_db["user_directory"]._collection.find_one({"_id": stored["_id"]})["phone"] == "9000000003"
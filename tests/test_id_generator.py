@@ -0,0 +1,44 @@
+import asyncio
+import random
+
+from utils.id_generator import SequenceAllocator, format_id
+
+
+def test_ids_are_unique_across_workers(mongo_db):
+    """Several allocators (one per API worker) drawing blocks from the same counter."""
+    workers = [SequenceAllocator(block_size=size) for size in (1, 7, 20, 20, 50)]
+
+    async def issue(allocator: SequenceAllocator, count: int):
+        ids = []
+        for _ in range(count):
+            ids.append(await allocator.next("invoice"))
+            if random.random() < 0.2:
+                await asyncio.sleep(0)
+        return ids
+
+    async def run():
+        # Each worker also serves concurrent requests of its own.
+        batches = await asyncio.gather(*(
+            issue(allocator, 150) for allocator in workers for _ in range(4)
+        ))
+        bulk = await asyncio.gather(*(workers[n % len(workers)].reserve("invoice", 25) for n in range(10)))
+        return [seq for batch in batches for seq in batch] + [seq for block in bulk for seq in block]
+
+    issued = asyncio.run(run())
+    assert len(issued) == 5 * 4 * 150 + 10 * 25
+    assert len(set(issued)) == len(issued)
+    assert len({format_id("QIK-INV", seq) for seq in issued}) == len(issued)
+    # Blocks never overlap, so nothing is issued past what the counter handed out.
+    counter = mongo_db["counters"]._collection.find_one({"_id": "invoice"})
+    assert max(issued) <= counter["seq"]
+
+
+def test_sequences_are_independent_per_key(mongo_db):
+    allocator = SequenceAllocator(block_size=10)
+
+    async def run():
+        return [await allocator.next("invoice") for _ in range(3)], [await allocator.next("order") for _ in range(3)]
+
+    invoices, orders = asyncio.run(run())
+    assert invoices == [1, 2, 3]
+    assert orders == [1, 2, 3]
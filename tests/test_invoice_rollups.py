@@ -0,0 +1,39 @@
+import asyncio
+import datetime
+
+from services.invoice_rollups import ROLLUP_COLLECTION, apply_invoice_change, apply_invoice_changes, query_rollups
+
+
+def _invoice(amount: float, tax: float = 0.0) -> dict:
+    return {
+        "invoiceDate": "2025-03-01",
+        "createdAt": datetime.datetime(2025, 3, 1),
+        "seller": {"userId": "vendor-1"},
+        "paymentMode": "upi",
+        "subTotal": amount,
+        "totalTax": tax,
+        "totalAmount": round(amount + tax, 2),
+        "platformFee": 0.1,
+    }
+
+
+def test_rollups_are_exact_paise_counters(mongo_db):
+    async def run():
+        invoices = [_invoice(0.1, 0.02) for _ in range(1000)]
+        await apply_invoice_changes([(None, invoice) for invoice in invoices])
+        first = await query_rollups("2025-03-01", "2025-03-31")
+        # Edit and delete everything again; the counters must land exactly on zero.
+        for invoice in invoices[:500]:
+            edited = {**invoice, "subTotal": 0.3, "totalAmount": 0.33, "totalTax": 0.03}
+            await apply_invoice_change(invoice, edited)
+            await apply_invoice_change(edited, None)
+        await apply_invoice_changes([(invoice, None) for invoice in invoices[500:]])
+        return first, mongo_db[ROLLUP_COLLECTION]._collection.find_one()
+
+    first, stored = asyncio.run(run())
+    assert first["totals"] == {
+        "invoices": 1000, "revenue": 120.0, "subTotal": 100.0, "gst": 20.0, "platformFees": 100.0, "deliveryCharges": 0.0,
+    }
+    assert first["rows"][0]["day"] == "2025-03-01"
+    assert stored["revenue"] == 0 and isinstance(stored["revenue"], int)
+    assert stored["subTotal"] == stored["gst"] == stored["platformFees"] == stored["invoices"] == 0
@@ -0,0 +1,45 @@
+import asyncio
+import datetime
+
+from services import job_queue
+
+
+def test_handler_is_stopped_before_its_lease_expires(mongo_db, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 1)
+    monkeypatch.setattr(job_queue, "LEASE_MARGIN_SECONDS", 0.2)
+    stopped, leases = [], []
+
+    @job_queue.job("test_stuck")
+    async def stuck(payload):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stopped.append(datetime.datetime.utcnow())
+            raise
+
+    real_lease = job_queue._lease
+
+    async def slow_lease(worker):
+        leased = await real_lease(worker)
+        leases.append(leased["run_at"])
+        # A slow claim round trip eats into the lease.
+        await asyncio.sleep(0.3)
+        return leased
+
+    monkeypatch.setattr(job_queue, "_lease", slow_lease)
+
+    async def run():
+        job_id = await job_queue.enqueue("test_stuck", {})
+        assert await job_queue.run_one("w1")
+        return mongo_db[job_queue.JOBS_COLLECTION]._collection.find_one({"_id": job_id})
+
+    try:
+        doc = asyncio.run(run())
+    finally:
+        job_queue.HANDLERS.pop("test_stuck", None)
+
+    assert doc["status"] == "queued"
+    assert "Timed out" in doc["last_error"]
+    assert len(stopped) == 1
+    # Cancelled with the margin still left on the lease.
+    assert (leases[0] - stopped[0]).total_seconds() >= 0.15
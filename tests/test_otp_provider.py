@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.otp_provider import CircuitBreaker, OtpProviderUnavailable, TwoFactorProvider
+
+
+def make_provider(handler, max_in_flight=10, failures=1, reset=0.05, queue_timeout=0.05):
+    provider = TwoFactorProvider(
+        api_key="test",
+        template="TEST",
+        timeout=1,
+        connect_timeout=1,
+        max_in_flight=max_in_flight,
+        breaker=CircuitBreaker(failures, reset),
+        queue_timeout=queue_timeout,
+    )
+    provider._client = httpx.AsyncClient(base_url=provider.base_url, transport=httpx.MockTransport(handler))
+    return provider
+
+
+def slow(status=200, delay=0.2, calls=None):
+    async def handler(request):
+        if calls is not None:
+            calls.append(request.url.path)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json={"Status": "Success", "Details": "session"})
+    return handler
+
+
+def test_waiting_for_a_slot_times_out():
+    async def run():
+        provider = make_provider(slow(delay=0.3), max_in_flight=1, queue_timeout=0.05)
+        started = time.monotonic()
+        results = await asyncio.gather(
+            provider.send_otp("9000000001"), provider.send_otp("9000000002"), return_exceptions=True
+        )
+        return results, time.monotonic() - started, provider
+
+    results, elapsed, provider = asyncio.run(run())
+    assert results[0] == "session"
+    assert isinstance(results[1], OtpProviderUnavailable)
+    assert "overloaded" in str(results[1])
+    # A queue timeout says nothing about the gateway's health.
+    assert provider.breaker.state == "closed"
+    assert elapsed < 0.5
+
+
+def test_half_open_lets_a_single_probe_through():
+    calls = []
+
+    async def run():
+        provider = make_provider(slow(status=500, delay=0), failures=1, reset=0.05)
+        with pytest.raises(OtpProviderUnavailable):
+            await provider.send_otp("9000000001")
+        assert provider.breaker.state == "open"
+        with pytest.raises(OtpProviderUnavailable, match="circuit is open"):
+            await provider.send_otp("9000000001")
+
+        await asyncio.sleep(0.06)
+        provider._client = httpx.AsyncClient(base_url=provider.base_url, transport=httpx.MockTransport(slow(delay=0.1, calls=calls)))
+        results = await asyncio.gather(*(provider.send_otp(f"90000000{n:02d}") for n in range(5)), return_exceptions=True)
+        return results, provider
+
+    results, provider = asyncio.run(run())
+    assert len(calls) == 1
+    assert results.count("session") == 1
+    assert all(isinstance(r, OtpProviderUnavailable) for r in results if r != "session")
+    assert provider.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_and_cancelled_probe_is_released():
+    async def run():
+        provider = make_provider(slow(status=500, delay=0), failures=1, reset=0.05)
+        with pytest.raises(OtpProviderUnavailable):
+            await provider.send_otp("9000000001")
+        await asyncio.sleep(0.06)
+        with pytest.raises(OtpProviderUnavailable, match="returned 500"):
+            await provider.send_otp("9000000001")
+        assert provider.breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        provider._client = httpx.AsyncClient(base_url=provider.base_url, transport=httpx.MockTransport(slow(delay=1)))
+        probe = asyncio.ensure_future(provider.send_otp("9000000001"))
+        await asyncio.sleep(0.01)
+        assert provider.breaker.probing
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        # The caller went away without a verdict; the next call may probe.
+        assert provider.breaker.allow()
+
+    asyncio.run(run())
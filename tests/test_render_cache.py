@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+from utils.render_cache import RenderCache
+
+
+def test_disk_tier_survives_restart_and_invalidates_per_document(tmp_path):
+    async def run():
+        cache = RenderCache(1024, str(tmp_path))
+        await cache.put(("inv-1", "v1", "html"), b"<p>one</p>")
+        await cache.put(("inv-1", "v1", "pdf"), b"%PDF one")
+        await cache.put(("inv-2", "v1", "html"), b"<p>two</p>")
+
+        # A fresh worker reads the disk tier.
+        restarted = RenderCache(1024, str(tmp_path))
+        assert (await restarted.get(("inv-1", "v1", "pdf")))[0] == b"%PDF one"
+        assert await restarted.get(("inv-1", "v2", "pdf")) is None
+
+        await restarted.invalidate("inv-1")
+        assert await restarted.get(("inv-1", "v1", "pdf")) is None
+        assert await RenderCache(1024, str(tmp_path)).get(("inv-1", "v1", "html")) is None
+        assert (await RenderCache(1024, str(tmp_path)).get(("inv-2", "v1", "html")))[0] == b"<p>two</p>"
+
+    asyncio.run(run())
+    # One directory per document remains (inv-2); nothing is left at the top level.
+    assert all(os.path.isdir(tmp_path / name) for name in os.listdir(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
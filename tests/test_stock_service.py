@@ -0,0 +1,127 @@
+import asyncio
+import random
+
+import database
+from services import stock_service
+from services.stock_service import InsufficientStock
+
+from conftest import make_database
+
+VENDOR, SKU = "vendor-1", "BRAKE-PAD"
+
+
+async def _drain_rebalances():
+    while stock_service._rebalance_tasks:
+        await asyncio.gather(*list(stock_service._rebalance_tasks))
+
+
+async def _stress(stock: int, shards: int, workers: int, seed: int):
+    """Concurrent reserve / release / commit traffic until the SKU sells out."""
+    rng = random.Random(seed)
+    await stock_service.adjust_stock(VENDOR, SKU, stock)
+    await stock_service.split_stock(VENDOR, SKU, shards)
+    counts = {"committed": 0, "held": 0, "rejected": 0}
+
+    async def worker():
+        # Bounded, so a regression that never rejects fails instead of hanging.
+        for _ in range(50):
+            if counts["rejected"] >= workers * 3:
+                return
+            qty = rng.randint(1, 7)
+            try:
+                reservation = await stock_service.reserve_stock(VENDOR, SKU, qty, reserved_by="test")
+            except InsufficientStock:
+                counts["rejected"] += 1
+                continue
+            roll = rng.random()
+            if roll < 0.3:
+                await stock_service.release_reservation(reservation["_id"])
+            elif roll < 0.8:
+                await stock_service.commit_reservation(reservation["_id"])
+                counts["committed"] += qty
+            else:
+                counts["held"] += qty
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    await _drain_rebalances()
+    return counts, await stock_service.get_stock(VENDOR, SKU)
+
+
+def test_concurrent_reservations_never_oversell(mongo_db):
+    for seed, shards in enumerate((1, 4, 8)):
+        database.db = make_database()
+        counts, level = asyncio.run(_stress(stock=600, shards=shards, workers=40, seed=seed))
+
+        assert all(shard["available"] >= 0 for shard in level["shards"])
+        # Every unit is either still available, held by a live reservation, or sold.
+        assert level["held"] == counts["held"]
+        assert level["available"] + counts["held"] + counts["committed"] == 600
+        # Rejections only start once the SKU is nearly sold out (qty <= 7 each).
+        assert level["available"] < 7 * shards
+
+
+def test_shards_spread_reservation_writes(mongo_db):
+    """
+    A server serializes writes to one document, so the busiest shard's write
+    count bounds reservation throughput; more shards should cut it.
+    """
+    random.seed(11)
+
+    async def run(shards: int) -> int:
+        database.db = make_database()
+        await stock_service.adjust_stock(VENDOR, SKU, 100000)
+        await stock_service.split_stock(VENDOR, SKU, shards)
+        database.db.writes.clear()
+        await asyncio.gather(*(stock_service.reserve_stock(VENDOR, SKU, 1) for _ in range(200)))
+        await _drain_rebalances()
+        return max(n for (collection, _), n in database.db.writes.items() if collection == stock_service.SHARDS_COLLECTION)
+
+    hottest = {shards: asyncio.run(run(shards)) for shards in (1, 2, 4, 8)}
+    assert hottest[1] == 200
+    assert hottest[4] <= 200 / 4 * 1.6
+    assert hottest[8] < hottest[2] < hottest[1]
+
+
+def test_racing_commit_and_release_settle_once(mongo_db):
+    async def run():
+        await stock_service.adjust_stock(VENDOR, SKU, 1000)
+        await stock_service.split_stock(VENDOR, SKU, 4)
+        outcomes = {"committed": 0, "released": 0}
+        for _ in range(50):
+            reservation = await stock_service.reserve_stock(VENDOR, SKU, 5)
+            results = await asyncio.gather(
+                stock_service.commit_reservation(reservation["_id"]),
+                stock_service.release_reservation(reservation["_id"]),
+                return_exceptions=True,
+            )
+            settled = [r for r in results if isinstance(r, dict)]
+            assert len(settled) == 1 and settled[0]["status"] in outcomes
+            outcomes[settled[0]["status"]] += 1
+        await _drain_rebalances()
+        return outcomes, await stock_service.get_stock(VENDOR, SKU)
+
+    outcomes, level = asyncio.run(run())
+    assert level["held"] == 0
+    assert level["available"] + 5 * outcomes["committed"] == 1000
+
+
+def test_commit_after_the_sweeper_returned_a_hold_fails(mongo_db):
+    async def run():
+        await stock_service.adjust_stock(VENDOR, SKU, 10)
+        reservation = await stock_service.reserve_stock(VENDOR, SKU, 4)
+        # The sweeper (running late against a lagging clock) returned the hold.
+        take = reservation["takes"][0]
+        await stock_service._drop_hold(
+            stock_service.shard_key(VENDOR, SKU, take["shard"]), reservation["_id"], take["qty"], restore=True
+        )
+        try:
+            await stock_service.commit_reservation(reservation["_id"])
+        except stock_service.ReservationExpired:
+            pass
+        else:
+            raise AssertionError("commit succeeded without its hold")
+        return await stock_service.get_stock(VENDOR, SKU), await stock_service.get_reservation(reservation["_id"])
+
+    level, reservation = asyncio.run(run())
+    assert level["available"] == 10
+    assert reservation["status"] == "expired"
@@ -0,0 +1,39 @@
+import asyncio
+import csv
+import datetime
+import io
+
+from utils.streaming import csv_stream
+
+
+async def _rows(rows):
+    for row in rows:
+        yield row
+
+
+def _export(rows, columns):
+    async def run():
+        return b"".join([chunk async for chunk in csv_stream(_rows(rows), columns)])
+    return list(csv.reader(io.StringIO(asyncio.run(run()).decode())))
+
+
+def test_csv_neutralises_formula_cells():
+    columns = ["full_name", "business_name", "location.city", "brands_served", "referral_count", "created_at"]
+    rows = [{
+        "full_name": '=HYPERLINK("http://evil.example","click")',
+        "business_name": "+91 Motors",
+        "location": {"city": "@SUM(A1:A9)"},
+        "brands_served": ["-Tata", "Maruti"],
+        "referral_count": -3,
+        "created_at": datetime.datetime(2025, 1, 1),
+    }, {
+        "full_name": "\tTabbed", "business_name": "\rReturn", "location": {"city": "Pune"},
+        "brands_served": [], "referral_count": 0, "created_at": None,
+    }]
+    header, first, second = _export(rows, columns)
+    assert header == columns
+    assert first == [
+        '\'=HYPERLINK("http://evil.example","click")', "'+91 Motors", "'@SUM(A1:A9)", "'-Tata|Maruti", "-3",
+        "2025-01-01T00:00:00",
+    ]
+    assert second[:3] == ["'\tTabbed", "'\rReturn", "Pune"]
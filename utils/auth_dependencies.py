@@ -0,0 +1,105 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from fastapi import Header, HTTPException
+
+from config import TOKEN_CACHE_SIZE
+from utils.jwt_utils import decode_access_token
+from services.token_revocation import is_revoked
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of JWT payloads that already passed signature verification.
+    Keys are SHA-256 digests of the raw token; an entry is dropped as soon as
+    the token's `exp` claim passes, so a cached hit never outlives the token.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = (payload, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+
+def verify_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        token_cache.put(token, payload)
+    return payload
+
+
+def _bearer_token(authorization) -> str:
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    parts = authorization.split(" ")
+    if len(parts) != 2 or not parts[1]:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return parts[1]
+
+
+# -------- Dependencies --------
+
+async def get_current_user(authorization: str = Header(None)):
+    token = _bearer_token(authorization)
+    try:
+        payload = verify_token(token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if is_revoked(payload.get("jti")):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
+
+
+async def get_admin_user(authorization: str = Header(None)):
+    payload = await get_current_user(authorization)
+    if payload.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access only")
+    return payload
@@ -1,13 +1,65 @@
+import asyncio
+from pymongo import ReturnDocument
+from config import ID_BLOCK_SIZE
 from database import get_database
 
-async def generate_id(key: str, prefix: str):
-    db = get_database()
-    counters = db["counters"]
-    result = await counters.find_one_and_update(
-        {"_id": key},
-        {"$inc": {"seq": 1}},
-        upsert=True,
-        return_document=True
-    )
-    seq = result["seq"]
+
+class SequenceAllocator:
+    """
+    Hands out sequence numbers from blocks reserved with a single atomic
+    `$inc` on the `counters` document, instead of one round trip per number.
+
+    Gap semantics:
+    - Numbers are unique across all workers, because every block comes from
+      an atomic `$inc`.
+    - They are not strictly time-ordered across workers: worker A may issue
+      41 after worker B has issued 61.
+    - Numbers left in a block when a worker stops are never issued, which
+      leaves gaps. Set ID_BLOCK_SIZE=1 where a gap-free series is required.
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        self._blocks = {}
+        self._locks = {}
+
+    async def _reserve(self, key: str, count: int) -> range:
+        result = await get_database()["counters"].find_one_and_update(
+            {"_id": key},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = result["seq"]
+        return range(end - count + 1, end + 1)
+
+    async def next(self, key: str) -> int:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            seq = next(self._blocks.get(key, iter(())), None)
+            if seq is None:
+                block = iter(await self._reserve(key, self.block_size))
+                self._blocks[key] = block
+                seq = next(block)
+            return seq
+
+    async def reserve(self, key: str, count: int) -> range:
+        """Reserve `count` consecutive numbers in one update (used by bulk writes)."""
+        if count <= 0:
+            return range(0)
+        return await self._reserve(key, count)
+
+
+allocator = SequenceAllocator()
+
+
+def format_id(prefix: str, seq: int) -> str:
     return f"{prefix}-{str(seq).zfill(5)}"
+
+
+async def generate_id(key: str, prefix: str):
+    return format_id(prefix, await allocator.next(key))
+
+
+async def generate_ids(key: str, prefix: str, count: int):
+    return [format_id(prefix, seq) for seq in await allocator.reserve(key, count)]
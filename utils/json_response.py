@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.encoders import ENCODERS_BY_TYPE
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+
+def bson_default(value):
+    """Encode the BSON types Mongo hands back; anything else is a bug in the caller."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        # Exact decimal string, never a float.
+        return _decimal128(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decimal128(value: Decimal128) -> str:
+    return str(value.to_decimal())
+
+
+# Plain dict returns pass through jsonable_encoder before any response class
+# runs; teach it the BSON types too, so raw documents are safe either way.
+ENCODERS_BY_TYPE[ObjectId] = str
+ENCODERS_BY_TYPE[Decimal128] = _decimal128
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=bson_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    Serializes raw Mongo documents (ObjectId, datetime, Decimal128) in a single
+    pass. Return it directly from a route to skip FastAPI's jsonable_encoder walk.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
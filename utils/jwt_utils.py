@@ -1,14 +1,37 @@
-from jose import jwt
-from config import JWT_SECRET, JWT_ALGORITHM
+import uuid
+from jose import jwt, JWTError
+from config import JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_MINUTES, REFRESH_TOKEN_DAYS
 from datetime import datetime, timedelta
 
-def create_access_token(data: dict, expires_delta: int = 1440):
+def _encode(data: dict, token_type: str, expires: timedelta):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=expires_delta)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    return encoded_jwt
+    expire = datetime.utcnow() + expires
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": token_type})
+    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def create_access_token(data: dict, expires_delta: int = ACCESS_TOKEN_MINUTES):
+    return _encode(data, "access", timedelta(minutes=expires_delta))
+
+def create_refresh_token(data: dict, expires_days: int = REFRESH_TOKEN_DAYS):
+    return _encode(data, "refresh", timedelta(days=expires_days))
+
+def create_token_pair(data: dict):
+    return {
+        "access_token": create_access_token(data),
+        "refresh_token": create_refresh_token(data),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_MINUTES * 60,
+    }
 
 def decode_access_token(token: str):
     payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    # Tokens issued before refresh tokens existed carry no "type" and are access tokens.
+    if payload.get("type", "access") != "access":
+        raise JWTError("Not an access token")
+    return payload
+
+def decode_refresh_token(token: str):
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    if payload.get("type") != "refresh":
+        raise JWTError("Not a refresh token")
     return payload
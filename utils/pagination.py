@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+
+def encode_cursor(created_at: datetime, _id: ObjectId) -> str:
+    """Opaque keyset cursor for the (created_at, _id) position of the last item served."""
+    raw = json.dumps([created_at.isoformat() if created_at else None, str(_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, _id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(created_at) if created_at else None), ObjectId(_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(field: str, created_at, _id: ObjectId, descending: bool = True) -> dict:
+    """
+    Match documents strictly after (created_at, _id) in a (field, _id) sort.
+    Null / missing values sort below every date, so they come last in a
+    descending walk and first in an ascending one.
+    """
+    op = "$lt" if descending else "$gt"
+    if created_at is None:
+        if descending:
+            return {field: None, "_id": {op: _id}}
+        return {"$or": [{field: None, "_id": {op: _id}}, {field: {"$ne": None}}]}
+    branches = [
+        {field: {op: created_at}},
+        {field: created_at, "_id": {op: _id}},
+    ]
+    if descending:
+        branches.append({field: None})
+    return {"$or": branches}
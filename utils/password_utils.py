@@ -0,0 +1,83 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PIN_HASH_N, PIN_HASH_R, PIN_HASH_P, PIN_HASH_WORKERS
+
+# Stored format: scrypt$<n>$<r>$<p>$<salt>$<hash>  (salt/hash urlsafe base64)
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # hashlib.scrypt releases the GIL, so a small thread pool keeps the
+    # event loop free while bounding how many hashes run at once.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PIN_HASH_WORKERS, thread_name_prefix="pin-hash")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(pin: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(pin.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2), dklen=HASH_BYTES)
+
+
+def hash_pin_sync(pin: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(pin, salt, PIN_HASH_N, PIN_HASH_R, PIN_HASH_P)
+    return f"{SCHEME}${PIN_HASH_N}${PIN_HASH_R}${PIN_HASH_P}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored) -> bool:
+    return isinstance(stored, str) and stored.startswith(SCHEME + "$")
+
+
+def verify_pin_sync(pin: str, stored):
+    """
+    Returns (matches, needs_rehash). Legacy plaintext PINs still verify but
+    always ask for a rehash, as do hashes made with older cost parameters.
+    """
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        return hmac.compare_digest(str(stored).encode(), pin.encode()), True
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = _unb64(digest)
+        actual = _scrypt(pin, _unb64(salt), n, r, p)
+    except (ValueError, TypeError):
+        return False, False
+    matches = hmac.compare_digest(actual, expected)
+    return matches, (n, r, p) != (PIN_HASH_N, PIN_HASH_R, PIN_HASH_P)
+
+
+async def hash_pin(pin: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_pin_sync, pin)
+
+
+async def verify_pin(pin: str, stored):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_pin_sync, pin, stored)
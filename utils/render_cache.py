@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+
+
+def strong_etag(content: bytes) -> str:
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+class RenderCache:
+    """
+    Byte-bounded LRU of rendered documents, keyed by (doc_id, version, format)
+    where `version` is the document's updatedAt. An optional directory acts as
+    a second tier that survives restarts and is shared by workers on one host.
+
+    Because the version is part of the key, an edit naturally stops old
+    entries from being served; `invalidate()` just frees their space early.
+
+    Disk files live in one directory per document, so invalidation removes a
+    single directory instead of scanning the cache. All disk I/O runs in a
+    worker thread; the memory tier is served inline.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _doc_dir(self, doc_id) -> str:
+        # Hashed so a document id can never name a path outside the cache.
+        return os.path.join(self.disk_dir, hashlib.sha1(str(doc_id).encode()).hexdigest()[:20])
+
+    def _disk_path(self, key) -> str:
+        doc_id, version, fmt = key
+        digest = hashlib.sha1(str(version).encode()).hexdigest()[:16]
+        return os.path.join(self._doc_dir(doc_id), f"{digest}.{fmt}")
+
+    @staticmethod
+    def _read(path: str):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write(path: str, content: bytes):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    async def get(self, key):
+        """Returns (content, etag) or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if self.disk_dir:
+            content = await asyncio.to_thread(self._read, self._disk_path(key))
+            if content is not None:
+                self.hits += 1
+                return self._remember(key, content)
+        self.misses += 1
+        return None
+
+    async def put(self, key, content: bytes):
+        entry = self._remember(key, content)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write, self._disk_path(key), content)
+        return entry
+
+    def _remember(self, key, content: bytes):
+        entry = (content, strong_etag(content))
+        if len(content) > self.max_bytes:
+            return entry
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[0])
+        self._entries[key] = entry
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        return entry
+
+    async def invalidate(self, doc_id: str):
+        for key in [k for k in self._entries if k[0] == doc_id]:
+            content, _ = self._entries.pop(key)
+            self.size -= len(content)
+        if self.disk_dir:
+            await asyncio.to_thread(shutil.rmtree, self._doc_dir(doc_id), True)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
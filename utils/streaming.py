@@ -0,0 +1,80 @@
+import csv
+import io
+
+from utils.json_response import dumps
+
+# Rows are grouped before being handed to the response so each chunk is a
+# reasonable write size; memory stays bounded by one chunk plus one cursor batch.
+ROWS_PER_CHUNK = 500
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def get_path(doc: dict, path: str):
+    """Read a dotted field path ("location.city") from a nested document."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+# Spreadsheets run cells starting with these as formulas (CSV injection).
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        text = "|".join(str(v) for v in value)
+    else:
+        text = str(value)
+    # A leading quote makes Excel / Sheets show user-entered text as text.
+    return "'" + text if text.startswith(FORMULA_PREFIXES) else text
+
+
+async def ndjson_stream(rows, columns=None):
+    """Encode an async iterable of dicts as newline-delimited JSON chunks."""
+    buffer = []
+    async for row in rows:
+        if columns:
+            row = {c: get_path(row, c) for c in columns}
+        buffer.append(dumps(row))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield b"\n".join(buffer) + b"\n"
+            buffer.clear()
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+
+async def csv_stream(rows, columns):
+    """Encode an async iterable of dicts as CSV chunks with a header row."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    pending = 1
+    async for row in rows:
+        writer.writerow([_cell(get_path(row, c)) for c in columns])
+        pending += 1
+        if pending >= ROWS_PER_CHUNK:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+            pending = 0
+    if pending:
+        yield out.getvalue().encode()
+
+
+def encode_stream(rows, fmt: str, columns):
+    if fmt == "csv":
+        return csv_stream(rows, columns)
+    return ndjson_stream(rows, columns)